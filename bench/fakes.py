@@ -0,0 +1,234 @@
+import asyncio
+import itertools
+import time
+from datetime import datetime, timezone
+
+from utils.message_router import MessageRouter
+from utils.send_queue import OutboundSender
+
+_ids = itertools.count(100_000_000_000_000_000)
+
+
+def next_id():
+    return next(_ids)
+
+
+class Check:
+    """Collects pass/fail expectations for the bench check scripts."""
+
+    def __init__(self):
+        self.failures = []
+
+    def expect(self, condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            self.failures.append(message)
+
+
+class FakeUser:
+    def __init__(self, name=None, bot=False, user_id=None):
+        self.id = user_id or next_id()
+        self.name = name or f"user{self.id % 100000}"
+        self.display_name = self.name
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeMember(FakeUser):
+    def __init__(self, guild, name=None, bot=False, user_id=None, status='online'):
+        super().__init__(name=name, bot=bot, user_id=user_id)
+        self.guild = guild
+        self.status = status
+
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSentMessage:
+    def __init__(self, channel, content, **kwargs):
+        self.id = next_id()
+        self.channel = channel
+        self.content = content
+        self.kwargs = kwargs
+
+    async def edit(self, **kwargs):
+        self.content = kwargs.get('content', self.content)
+
+    async def delete(self):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, guild=None, name=None, channel_id=None, send_delay=0.0):
+        self.id = channel_id or next_id()
+        self.guild = guild
+        self.name = name or f"channel-{self.id % 10000}"
+        self.send_delay = send_delay
+        self.sent = []
+        self.listeners = []
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send(self, content=None, **kwargs):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        message = FakeSentMessage(self, content, **kwargs)
+        self.sent.append((time.perf_counter(), content))
+        for listener in self.listeners:
+            listener(self, content)
+        return message
+
+
+class FakeGuild:
+    def __init__(self, name=None, guild_id=None, emojis=()):
+        self.id = guild_id or next_id()
+        self.name = name or f"guild-{self.id % 10000}"
+        self.emojis = list(emojis)
+        self.members = []
+        self.channels = []
+
+    def add_channel(self, **kwargs):
+        channel = FakeChannel(guild=self, **kwargs)
+        self.channels.append(channel)
+        return channel
+
+    def add_member(self, **kwargs):
+        member = FakeMember(self, **kwargs)
+        self.members.append(member)
+        return member
+
+    @property
+    def member_count(self):
+        return len(self.members)
+
+
+class FakeMessage:
+    def __init__(self, author, channel, content, mentions=()):
+        self.id = next_id()
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.mentions = list(mentions)
+        self.created_at = time.perf_counter()
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeCommand:
+    def __init__(self, name):
+        self.name = name
+        self.qualified_name = name
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+        self.deferred = False
+        self.sent = []
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, ephemeral=False, thinking=False):
+        self.done = True
+        self.deferred = True
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.sent.append((content, kwargs))
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        self.sent.append((kwargs.get('content'), kwargs))
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.sent = []
+
+    async def send(self, content=None, wait=False, **kwargs):
+        message = FakeSentMessage(self.interaction.channel, content, **kwargs)
+        self.sent.append(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, client, user, guild=None, channel=None, command=None):
+        self.id = next_id()
+        self.client = client
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id if guild else None
+        self.channel = channel
+        self.channel_id = channel.id if channel else None
+        self.command = FakeCommand(command) if command else None
+        self.created_at = datetime.now(timezone.utc)
+        self.extras = {}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, **kwargs):
+        self.response.sent.append((kwargs.get('content'), kwargs))
+
+    def sent(self):
+        # everything the command showed the user, initial response first
+        return [kwargs | {'content': content} for content, kwargs in self.response.sent] + \
+               [message.kwargs | {'content': message.content} for message in self.followup.sent]
+
+
+class FakeBot:
+    def __init__(self, loop=None, command_prefix='!'):
+        self.loop = loop or asyncio.get_event_loop()
+        self.command_prefix = command_prefix
+        self.user = FakeUser(name="pikol", bot=True)
+        self.application_id = self.user.id
+        self.guilds = []
+        self.listeners = []
+        self.channels = {}
+        self.cogs = {}
+        self.errors = []
+        self.message_router = MessageRouter(self)
+        self.sender = OutboundSender()
+
+    def log_error(self, command_name, error):
+        self.errors.append((command_name, error))
+
+    async def wait_until_ready(self):
+        return None
+
+    async def get_prefix(self, message):
+        return self.command_prefix
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+    def add_guild(self, guild):
+        self.guilds.append(guild)
+        for channel in guild.channels:
+            self.channels[channel.id] = channel
+        return guild
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+
+from bench.fakes import Check, FakeBot, next_id
+from bench.gateway_replay import label_for
+from utils.gateway_recorder import GatewayRecorder, read_recording
+
+# every string here is something a recording must not carry out of the server
+PRIVATE = ['Whiskers', 'whiskers_the_cat', 'Sir Whiskers', 'secret-lair', 'plotting world domination here',
+           'my hidden thread', 'what is the password', 'hunter2 hunter2', 'the vault is under the sofa',
+           'interaction-token-123']
+
+
+def interaction_payload(guild_id, channel_id, user_id):
+    user = {'id': str(user_id), 'username': 'whiskers_the_cat', 'global_name': 'Whiskers', 'discriminator': '0',
+            'avatar': 'a1b2c3'}
+    return {
+        'id': str(next_id()), 'application_id': str(next_id()), 'type': 2, 'token': 'interaction-token-123',
+        'version': 1, 'guild_id': str(guild_id), 'channel_id': str(channel_id), 'locale': 'en-US',
+        'channel': {'id': str(channel_id), 'type': 11, 'name': 'my hidden thread', 'parent_id': str(next_id())},
+        'member': {'user': user, 'nick': 'Sir Whiskers', 'roles': [], 'flags': 0},
+        'data': {
+            'id': str(next_id()), 'name': 'crystal_ball', 'type': 1,
+            'options': [{'name': 'question', 'type': 3, 'value': 'hunter2 hunter2'}],
+            'resolved': {'channels': {str(channel_id): {'id': str(channel_id), 'type': 0, 'name': 'secret-lair',
+                                                        'topic': 'plotting world domination here'}}},
+        },
+    }
+
+
+def message_payload(guild_id, channel_id, user_id):
+    return {
+        'id': str(next_id()), 'channel_id': str(channel_id), 'guild_id': str(guild_id), 'type': 0,
+        'content': 'the vault is under the sofa', 'author': {'id': str(user_id), 'username': 'whiskers_the_cat'},
+        'thread': {'id': str(next_id()), 'type': 11, 'name': 'my hidden thread'},
+        'poll': {'question': {'text': 'what is the password'},
+                 'answers': [{'answer_id': 1, 'poll_media': {'text': 'hunter2 hunter2'}}]},
+    }
+
+
+async def run():
+    check = Check()
+    print("recorded payloads carry no original text")
+    bot = FakeBot(asyncio.get_running_loop())
+    guild_id, channel_id, user_id = next_id(), next_id(), next_id()
+    directory = tempfile.mkdtemp(prefix='pikol-recorder-check-')
+    try:
+        recorder = GatewayRecorder(bot, directory)
+        path = recorder.start()
+        for event, data in (('INTERACTION_CREATE', interaction_payload(guild_id, channel_id, user_id)),
+                            ('MESSAGE_CREATE', message_payload(guild_id, channel_id, user_id))):
+            await recorder.on_socket_raw_receive(json.dumps({'op': 0, 's': 1, 't': event, 'd': data}))
+        recorder.stop()
+        records = read_recording(path)
+        next(records)
+        recorded = {event: data for _, event, data in records}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    for event, data in recorded.items():
+        text = json.dumps(data)
+        leaked = [value for value in PRIVATE if value in text]
+        check.expect(not leaked, f"{event} keeps none of the original names, topics or text ({', '.join(leaked) or 'clean'})")
+    interaction = recorded['INTERACTION_CREATE']
+    check.expect(label_for('INTERACTION_CREATE', interaction) == 'INTERACTION_CREATE:/crystal_ball'
+                 and interaction['data']['options'][0]['name'] == 'question',
+                 "the command and option names the replay dispatches on are kept")
+    return check.failures
+
+
+def main():
+    argparse.ArgumentParser(description="Check that GatewayRecorder scrubs names and free text from recorded events").parse_args()
+    failures = asyncio.run(run())
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all recorder checks passed")
+
+
+if __name__ == '__main__':
+    main()
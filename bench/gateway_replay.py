@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from bench.mock_ollama import MockOllama
+from bench.suite import git_revision, percentile
+from cogs import EXTENSIONS
+from utils.gateway_recorder import DISCORD_EPOCH_MS, ID_FLOOR_MS, SNOWFLAKE, read_recording
+
+DEFAULT_OUTPUT = os.path.join('bench', 'results', 'replay.json')
+# handler tasks still running this long after the last event are reported as stuck, not waited for
+DRAIN_TIMEOUT = 30.0
+SNOWFLAKE_IN_TEXT = re.compile(r'(?<=[@#&!:])\d{15,21}(?=>)')
+
+
+class Rebaser:
+    """Turns the recording's offset snowflakes back into real ones created around now."""
+
+    def __init__(self, base_ms):
+        self.base = base_ms - DISCORD_EPOCH_MS - ID_FLOOR_MS
+
+    def snowflake(self, value):
+        raw = int(value)
+        return str((((raw >> 22) + self.base) << 22) | (raw & 0x3FFFFF))
+
+    def __call__(self, value):
+        if isinstance(value, dict):
+            return {(self.snowflake(k) if SNOWFLAKE.match(k) else k): self(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self(item) for item in value]
+        if isinstance(value, str):
+            if SNOWFLAKE.match(value):
+                return self.snowflake(value)
+            if '<' in value:
+                return SNOWFLAKE_IN_TEXT.sub(lambda m: self.snowflake(m.group(0)), value)
+        return value
+
+
+class StubHTTP:
+    """Answers discord REST and webhook calls locally with just enough payload to build models from."""
+
+    def __init__(self, bot_user):
+        self.bot_user = bot_user
+        self.calls = Counter()
+        self.sequence = 0
+
+    def message(self, channel_id, payload):
+        self.sequence = (self.sequence + 1) & 0x3FFFFF
+        message_id = ((int(time.time() * 1000) - DISCORD_EPOCH_MS) << 22) | self.sequence
+        return {
+            'id': str(message_id), 'channel_id': str(channel_id or 0), 'type': 0,
+            'content': (payload or {}).get('content') or '', 'author': self.bot_user,
+            'attachments': [], 'embeds': [], 'mentions': [], 'mention_roles': [], 'components': [],
+            'pinned': False, 'mention_everyone': False, 'tts': False, 'flags': 0,
+            'timestamp': datetime.now(timezone.utc).isoformat(), 'edited_timestamp': None,
+        }
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        self.calls[f"{route.method} {route.path}"] += 1
+        if route.method == 'DELETE' or route.path.endswith('/typing'):
+            return None
+        if route.path.startswith('/channels/{channel_id}/messages'):
+            return self.message(getattr(route, 'channel_id', None), kwargs.get('json'))
+        return {}
+
+    async def webhook_request(self, adapter, route, session=None, *, payload=None, multipart=None, **kwargs):
+        self.calls[f"webhook {route.method} {route.path}"] += 1
+        if payload is None and multipart:
+            payload = json.loads(multipart[0]['value'])
+        if route.method == 'POST' and route.path.endswith('/callback'):
+            # discord.py >= 2.5 asks for the callback response (with_response) and reads it back
+            callback = {'interaction': {'id': str(route.webhook_id), 'type': 2}}
+            if payload and payload.get('type') == 4:
+                callback['resource'] = {'type': 4, 'message': self.message(None, payload.get('data') or {})}
+            return callback
+        if route.method == 'DELETE' or route.path.startswith('/interactions/'):
+            return None
+        return self.message(None, payload)
+
+    def install(self, bot):
+        from discord.webhook.async_ import AsyncWebhookAdapter
+
+        bot.http.request = self.request
+        stub = self
+
+        async def request(adapter, route, session=None, **kwargs):
+            return await stub.webhook_request(adapter, route, session, **kwargs)
+        AsyncWebhookAdapter.request = request
+
+
+class Probe:
+    __slots__ = ('label', 'started', 'pending')
+
+    def __init__(self, label, started):
+        self.label = label
+        self.started = started
+        self.pending = 0
+
+
+class LatencyTracker:
+    """Task factory that ties every handler task spawned by one dispatch back to its event.
+
+    An event's latency runs from its parse until the last of those tasks finishes.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.latencies = defaultdict(list)
+        self.outstanding = 0
+        self.drained = asyncio.Event()
+        self.drained.set()
+
+    def factory(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        probe = self.current
+        if probe is not None:
+            if probe.pending == 0:
+                self.outstanding += 1
+                self.drained.clear()
+            probe.pending += 1
+            task.add_done_callback(functools.partial(self._done, probe))
+        return task
+
+    def begin(self, label):
+        self.current = Probe(label, time.perf_counter())
+        return self.current
+
+    def end(self):
+        probe, self.current = self.current, None
+        if probe.pending == 0:
+            # nothing listens for this event: the parse was the whole cost
+            self.latencies[probe.label].append(time.perf_counter() - probe.started)
+
+    def _done(self, probe, task):
+        probe.pending -= 1
+        if probe.pending == 0:
+            self.latencies[probe.label].append(time.perf_counter() - probe.started)
+            self.outstanding -= 1
+            if self.outstanding == 0:
+                self.drained.set()
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.counts = Counter()
+
+    def emit(self, record):
+        self.counts[record.name] += 1
+
+
+def label_for(event, data):
+    if event != 'INTERACTION_CREATE':
+        return event
+    inner = data.get('data') or {}
+    if data.get('type') == 2:
+        return f"{event}:/{inner.get('name')}"
+    if data.get('type') == 3:
+        return f"{event}:component"
+    return f"{event}:type{data.get('type')}"
+
+
+async def load_cogs(bot, args, cleanup):
+    loaded = []
+    skip = set(filter(None, args.skip_cogs.split(',')))
+    for name in (entry['name'] for entry in EXTENSIONS):
+        if name in skip:
+            continue
+        # imported and set up directly so the ai cog can be pointed at the mock before setup runs
+        module = importlib.import_module(f'cogs.{name}')
+        if name == 'ai':
+            from utils.ollama_pool import OllamaBackend
+            mock = MockOllama(latency=args.ai_latency, token_rate=args.ai_token_rate, seed=1)
+            await mock.start()
+            cleanup.append(mock.stop)
+            module.OLLAMA_BACKENDS = [OllamaBackend(mock.host, mock.port)]
+            module.SESSION_DIR = tempfile.mkdtemp(prefix='pikol-replay-sessions-')
+        await module.setup(bot)
+        loaded.append(name)
+    for name in list(bot.cogs):
+        cleanup.append(functools.partial(bot.remove_cog, name))
+    return loaded
+
+
+async def run(args):
+    import discord
+    import pikol
+
+    bot = pikol.bot
+    state = bot._connection
+    records = read_recording(args.recording)
+    header = next(records)
+    records = list(records)
+    if args.limit:
+        snapshots = [r for r in records if r[1] == 'GUILD_SNAPSHOT']
+        records = snapshots + [r for r in records if r[1] != 'GUILD_SNAPSHOT'][:args.limit]
+
+    pikol.SERVER_DATA_DIR = tempfile.mkdtemp(prefix='pikol-replay-servers-')
+    rebase = Rebaser(int(time.time() * 1000))
+    bot_user = rebase(header['bot_user'])
+    stub = StubHTTP(bot_user)
+    stub.install(bot)
+
+    # what login() and connect() would have set up, minus the network
+    await bot._async_setup_hook()
+    state.user = discord.ClientUser(state=state, data=bot_user)
+    state.application_id = int(rebase(header['application_id']))
+    for _, _, data in (r for r in records if r[1] == 'GUILD_SNAPSHOT'):
+        data = rebase(data)
+        data['members'].append({'user': bot_user, 'roles': [], 'joined_at': None, 'deaf': False, 'mute': False,
+                                 'flags': 0})
+        state._add_guild_from_data(data)
+    bot._ready.set()
+
+    cleanup = []
+    cogs = await load_cogs(bot, args, cleanup)
+
+    errors = ErrorCounter()
+    logging.getLogger().addHandler(errors)
+    loop = asyncio.get_running_loop()
+    tracker = LatencyTracker()
+    loop.set_task_factory(tracker.factory)
+
+    events = [(offset_ms, event, label_for(event, data), rebase(data))
+              for offset_ms, event, data in records if event != 'GUILD_SNAPSHOT']
+    parse_errors = Counter()
+    print(f"replaying {len(events)} events over {len(bot.guilds)} guilds with cogs: {', '.join(cogs)} "
+          f"({'as fast as possible' if not args.speed else f'{args.speed:g}x real time'})")
+
+    try:
+        started = time.perf_counter()
+        for offset_ms, event, label, data in events:
+            if args.speed:
+                delay = started + offset_ms / 1000 / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tracker.begin(label)
+            try:
+                state.parsers[event](data)
+            except Exception as e:
+                parse_errors[f"{label}: {type(e).__name__}"] += 1
+            finally:
+                tracker.end()
+            # let handlers run between events, like the gateway reader does between frames
+            await asyncio.sleep(0)
+        fed = time.perf_counter() - started
+        try:
+            await asyncio.wait_for(tracker.drained.wait(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        total = time.perf_counter() - started
+    finally:
+        loop.set_task_factory(None)
+        logging.getLogger().removeHandler(errors)
+        for step in reversed(cleanup):
+            await step()
+
+    by_label = {}
+    for label, latencies in sorted(tracker.latencies.items()):
+        latencies.sort()
+        by_label[label] = {
+            'count': len(latencies),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 4),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+            'max_ms': round(latencies[-1] * 1000, 4),
+        }
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'recording': os.path.basename(args.recording),
+            'recorded_at': header.get('recorded_at'),
+            'speed': args.speed,
+            'cogs': cogs,
+        },
+        'events': len(events),
+        'feed_seconds': round(fed, 4),
+        'total_seconds': round(total, 4),
+        'events_per_sec': round(len(events) / total, 1) if total else None,
+        'stuck_events': tracker.outstanding,
+        'latency': by_label,
+        'parse_errors': dict(parse_errors),
+        'logged_errors': dict(errors.counts),
+        'http_calls': dict(stub.calls.most_common()),
+    }
+
+
+def compare(results, previous, tolerance):
+    regressions = []
+    if previous.get('events_per_sec') and results['events_per_sec'] < previous['events_per_sec'] * (1 - tolerance):
+        regressions.append(f"events_per_sec: {previous['events_per_sec']} -> {results['events_per_sec']}")
+    for label, current in results['latency'].items():
+        before = previous.get('latency', {}).get(label)
+        if before is not None and current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{label}.p95_ms: {before['p95_ms']} -> {current['p95_ms']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded gateway session through pikol's event handlers")
+    parser.add_argument('recording', help="file written by /gateway_record")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="real time multiplier (1 = as recorded, 10 = ten times faster); 0 replays as fast as possible")
+    parser.add_argument('--limit', type=int, help="replay only the first N events")
+    parser.add_argument('--skip-cogs', default='', help="comma separated cog modules not to load")
+    parser.add_argument('--ai-latency', type=float, default=0.0, help="seconds the mock Ollama waits before answering")
+    parser.add_argument('--ai-token-rate', type=float, default=100_000.0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', help="earlier replay result to check this run against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    print(f"{results['events']} events in {results['total_seconds']:.2f}s "
+          f"({results['events_per_sec']:,.0f} events/s, fed in {results['feed_seconds']:.2f}s)")
+    for label, row in results['latency'].items():
+        print(f"  {label:<36} {row['count']:>7}  p50 {row['p50_ms']:>8.3f} ms  p95 {row['p95_ms']:>8.3f} ms  "
+              f"p99 {row['p99_ms']:>8.3f} ms  max {row['max_ms']:>8.3f} ms")
+    if results['stuck_events']:
+        print(f"  {results['stuck_events']} events still had handlers running after {DRAIN_TIMEOUT:.0f}s")
+    if results['parse_errors'] or results['logged_errors']:
+        print(f"  errors: parse {results['parse_errors']}, logged {results['logged_errors']}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(results, previous, args.tolerance)
+        if regressions:
+            print(f"regressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
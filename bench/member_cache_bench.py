@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import gc
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from utils.member_cache import FULL, MODES
+
+BOT_ID = 900_000_000_000_000_000
+
+
+def guild_payloads(guilds, members, seed):
+    """GUILD_CREATE payloads with a long tail of sizes; members are returned separately, as chunks deliver them."""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(guilds)]
+    scale = members / sum(weights)
+    next_id = 100_000_000_000_000_000
+    payloads = []
+    for weight in weights:
+        guild_id, next_id = next_id, next_id + 1
+        member_payloads = []
+        for _ in range(max(3, int(weight * scale))):
+            member_payloads.append({'user': {'id': str(next_id), 'username': f"user{next_id % 100000}", 'discriminator': '0',
+                                             'avatar': None, 'bot': rng.random() < 0.02},
+                                    'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0})
+            next_id += 1
+        guild = {
+            'id': str(guild_id), 'name': 'guild', 'unavailable': False, 'features': [], 'emojis': [],
+            'member_count': len(member_payloads) + 1,
+            'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0,
+                       'hoist': False, 'managed': False, 'mentionable': False}],
+            'channels': [{'id': str(guild_id + 1), 'type': 0, 'name': 'general', 'position': 0, 'permission_overwrites': []}],
+            'members': [{'user': {'id': str(BOT_ID), 'username': 'pikol', 'discriminator': '0', 'avatar': None, 'bot': True},
+                         'roles': [], 'joined_at': None, 'deaf': False, 'mute': False, 'flags': 0}],
+        }
+        payloads.append((guild, member_payloads))
+    return payloads
+
+
+async def run_mode(mode, args):
+    import discord
+    from discord.ext import commands
+    from utils.member_cache import MemberCache
+
+    payloads = guild_payloads(args.guilds, args.members, args.seed)
+    chunks = {int(guild['id']): members for guild, members in payloads}
+    server_data = {}
+    for guild, members in payloads:
+        humans = [m['user']['id'] for m in members if not m['user']['bot']]
+        server_data[int(guild['id'])] = {'balance': dict.fromkeys(humans, 100), 'inventory': {}, 'members': humans}
+
+    async def chunk(guild, *, cache=True):
+        # what GUILD_MEMBERS_CHUNK would deliver, without the gateway round trip
+        members = [discord.Member(data=data, guild=guild, state=guild._state) for data in chunks[guild.id]]
+        for member in members:
+            guild._add_member(member)
+        return members
+    discord.Guild.chunk = chunk
+
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    cache = MemberCache({'mode': mode})
+    bot = commands.Bot(command_prefix='!', intents=intents, **cache.client_options())
+    state = bot._connection
+    # guild.chunked compares the cache with member_count, which includes the bot itself
+    state.user = discord.ClientUser(state=state, data={'id': str(BOT_ID), 'username': 'pikol', 'discriminator': '0',
+                                                       'avatar': None, 'bot': True})
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    for guild_data, member_payloads in payloads:
+        guild = state._add_guild_from_data(dict(guild_data))
+        if cache.mode == FULL:
+            # full mode: the startup chunk fills every guild before on_ready
+            await chunk(guild)
+    # on_ready's pass over every guild's members, against in-memory data instead of files
+    for guild in bot.guilds:
+        data = server_data[guild.id]
+        for member in guild.members:
+            if not member.bot:
+                data['balance'].setdefault(str(member.id), 100)
+        cache.record_ids(guild, data)
+    ready_seconds = time.perf_counter() - started
+    gc.collect()
+    ready_mib = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / 1024
+
+    # first fmk in each of the busiest guilds (a lazy chunk), then steady-state sampling
+    rng = random.Random(args.seed)
+    busiest = bot.guilds[:args.samples]
+    started = time.perf_counter()
+    for guild in busiest:
+        await cache.humans(guild, lambda guild_id: server_data[guild_id])
+    first_ms = (time.perf_counter() - started) / len(busiest) * 1000
+    started = time.perf_counter()
+    for _ in range(args.samples):
+        guild = rng.choice(busiest)
+        humans = await cache.humans(guild, lambda guild_id: server_data[guild_id])
+        rng.sample(humans, 3)
+    sample_ms = (time.perf_counter() - started) / args.samples * 1000
+    gc.collect()
+    after_mib = (tracemalloc.get_traced_memory()[0] - baseline) / 1024 / 1024
+    tracemalloc.stop()
+
+    return {
+        'mode': mode,
+        'ready_seconds': round(ready_seconds, 3),
+        'ready_mib': round(ready_mib, 1),
+        'cached_members': cache.cached_members(bot.guilds),
+        'first_use_ms': round(first_ms, 3),
+        'sample_ms': round(sample_ms, 3),
+        'mib_after_sampling': round(after_mib, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time and memory of each member cache mode")
+    parser.add_argument('--guilds', type=int, default=2_000)
+    parser.add_argument('--members', type=int, default=200_000)
+    parser.add_argument('--samples', type=int, default=50, help="guilds fmk is run in after startup")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mode', choices=MODES, help="run one mode in this process (used internally)")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_mode(args.mode, args))))
+        return
+
+    # one process per mode so no mode inherits another's heap
+    print(f"{args.guilds} guilds, {args.members} members")
+    for mode in MODES:
+        command = [sys.executable, '-m', 'bench.member_cache_bench', '--mode', mode, '--guilds', str(args.guilds),
+                   '--members', str(args.members), '--samples', str(args.samples), '--seed', str(args.seed)]
+        row = json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+        print(f"{mode:<5} ready {row['ready_seconds']:>7.2f}s  {row['ready_mib']:>8.1f} MiB  "
+              f"{row['cached_members']:>8} members cached  first fmk {row['first_use_ms']:>8.2f} ms  "
+              f"fmk {row['sample_ms']:>7.3f} ms  {row['mib_after_sampling']:>8.1f} MiB after")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from utils.metrics import MetricsRegistry, MetricsServer, timed
+
+
+def per_call(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def best_of(func, iterations, repeats):
+    return min(per_call(func, iterations) for _ in range(repeats))
+
+
+def sample_server_data(users):
+    return {
+        "balance": {str(100000000000000000 + i): 100 + i for i in range(users)},
+        "inventory": {str(100000000000000000 + i): {"Potion of Purring": 2} for i in range(users)},
+        "shop": [{"name": "Potion of Purring", "price": 25, "rarity": 2}] * 4,
+        "next_restock": None,
+    }
+
+
+async def scrape(server):
+    reader, writer = await asyncio.open_connection(server.host, server.port)
+    writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def async_overhead(child, iterations):
+    async def job():
+        pass
+
+    wrapped = timed(child)(job)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await job()
+    bare = (time.perf_counter() - started) / iterations
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await wrapped()
+    return bare, (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics registry overhead benchmark")
+    parser.add_argument('--iterations', type=int, default=200_000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--users', type=int, default=200, help="members in the sample server file")
+    parser.add_argument('--commands', type=int, default=20, help="distinct commands to render")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    storage = registry.histogram('pikol_storage_seconds', 'storage', ('operation',))
+    load_child = storage.labels('load')
+    commands = registry.histogram('pikol_app_command_seconds', 'commands', ('command', 'outcome'))
+
+    observe = best_of(lambda: load_child.observe(0.0042), args.iterations, args.repeats)
+    labelled = best_of(lambda: commands.labels('shop', 'ok').observe(0.0042), args.iterations, args.repeats)
+    clock = best_of(time.perf_counter, args.iterations, args.repeats)
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'server.json')
+    with open(path, 'w') as f:
+        json.dump(sample_server_data(args.users), f, indent=4)
+
+    def load_bare():
+        with open(path) as f:
+            return json.load(f)
+
+    def load_instrumented():
+        started = time.perf_counter()
+        try:
+            with open(path) as f:
+                return json.load(f)
+        finally:
+            load_child.observe(time.perf_counter() - started)
+
+    # interleaved so disk cache and CPU frequency drift hit both variants alike
+    file_iterations = max(1, args.iterations // 100)
+    bare_runs, instrumented_runs = [], []
+    for _ in range(args.repeats * 4):
+        bare_runs.append(per_call(load_bare, file_iterations))
+        instrumented_runs.append(per_call(load_instrumented, file_iterations))
+    bare_load, instrumented_load = min(bare_runs), min(instrumented_runs)
+
+    bare_task, timed_task = asyncio.run(async_overhead(registry.histogram('pikol_task_seconds', 'tasks', ('task',)).labels('bench'), args.iterations))
+
+    for i in range(args.commands):
+        for outcome in ('ok', 'error', 'throttled'):
+            commands.labels(f'command_{i}', outcome).observe(0.01 * i)
+    render = best_of(registry.render, 200, args.repeats)
+
+    async def serve_once():
+        server = MetricsServer(registry, port=0)
+        server.server = await asyncio.start_server(server.handle, server.host, 0)
+        server.port = server.server.sockets[0].getsockname()[1]
+        started = time.perf_counter()
+        response = await scrape(server)
+        elapsed = time.perf_counter() - started
+        await server.close()
+        return response, elapsed
+
+    response, scrape_seconds = asyncio.run(serve_once())
+    status = response.split(b'\r\n', 1)[0].decode()
+
+    series = sum(len(metric.children) for metric in registry.metrics.values())
+    print(f"perf_counter():           {clock * 1e9:8.0f} ns")
+    print(f"observe (bound child):    {observe * 1e9:8.0f} ns")
+    print(f"observe (labels lookup):  {labelled * 1e9:8.0f} ns")
+    print(f"load_server_data bare:    {bare_load * 1e6:8.1f} us ({args.users} users)")
+    print(f"load_server_data timed:   {instrumented_load * 1e6:8.1f} us "
+          f"({(instrumented_load - bare_load) / bare_load * 100:+.2f}%)")
+    print(f"@timed coroutine:         {(timed_task - bare_task) * 1e9:8.0f} ns added per call")
+    print(f"render {series} series:      {render * 1e3:8.2f} ms")
+    print(f"scrape:                   {scrape_seconds * 1e3:8.2f} ms ({status}, {len(response)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+NS = 1_000_000_000
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable"}
+WORDS = ["meow", "*purrs*", "presto!", "the", "wand", "sparkles", "✨", "mrrp", "indeed", "poof", "*tail wags*", "magic"]
+
+
+class MockOllama:
+    # Minimal HTTP/1.1 stand-in for the Ollama endpoints the bot uses, with
+    # tunable latency, token rate, streaming and error injection.
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, token_rate=60.0, tokens=40,
+                 load_seconds=0.0, error_rate=0.0, error_status=500, drop_rate=0.0,
+                 embedding_dim=64, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.load_seconds = load_seconds
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drop_rate = drop_rate
+        self.embedding_dim = embedding_dim
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.drops = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._server = None
+        self._loaded = False
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = await self._dispatch(method, path, body, writer)
+                if not keep_alive or headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _write(self, writer, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", *extra_headers]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+
+    async def _dispatch(self, method, path, body, writer):
+        self.requests += 1
+        if path == '/api/version':
+            self._write(writer, 200, {"version": "0.0.0-mock"})
+            await writer.drain()
+            return True
+
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.drops += 1
+            return False
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            self._write(writer, self.error_status, {"error": "injected failure"})
+            await writer.drain()
+            return True
+
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            self._write(writer, 400, {"error": "invalid JSON"})
+            await writer.drain()
+            return True
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if path == '/api/chat':
+                await self._chat(payload, writer)
+            elif path in ('/api/embed', '/api/embeddings'):
+                await asyncio.sleep(self.latency)
+                self._embed(path, payload, writer)
+            else:
+                self._write(writer, 404, {"error": f"unknown endpoint {path}"})
+            await writer.drain()
+        finally:
+            self.in_flight -= 1
+        return True
+
+    def _timings(self, payload, started, load_seconds, prompt_seconds, eval_seconds, count):
+        prompt_tokens = sum(len(m.get('content', '')) for m in payload.get('messages', [])) // 4
+        return {
+            "model": payload.get('model', 'mock'),
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "done": True,
+            "total_duration": int((time.perf_counter() - started) * NS),
+            "load_duration": int(load_seconds * NS),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * NS),
+            "eval_count": count,
+            "eval_duration": int(eval_seconds * NS),
+        }
+
+    async def _chat(self, payload, writer):
+        started = time.perf_counter()
+        load_seconds = 0.0 if self._loaded else self.load_seconds
+        self._loaded = True
+        count = max(1, min(self.tokens, payload.get('options', {}).get('num_predict', self.tokens)))
+        per_token = 1.0 / self.token_rate if self.token_rate else 0.0
+        await asyncio.sleep(load_seconds + self.latency)
+        prompt_seconds = self.latency
+
+        if not payload.get('stream', True):
+            await asyncio.sleep(per_token * count)
+            content = " ".join(self.random.choice(WORDS) for _ in range(count))
+            response = {"message": {"role": "assistant", "content": content}}
+            response.update(self._timings(payload, started, load_seconds, prompt_seconds, per_token * count, count))
+            self._write(writer, 200, response)
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n")
+        for _ in range(count):
+            await asyncio.sleep(per_token)
+            chunk = {"model": payload.get('model', 'mock'), "message": {"role": "assistant", "content": self.random.choice(WORDS) + " "}, "done": False}
+            self._write_chunk(writer, chunk)
+            await writer.drain()
+        final = {"message": {"role": "assistant", "content": ""}}
+        final.update(self._timings(payload, started, load_seconds, prompt_seconds, per_token * count, count))
+        self._write_chunk(writer, final)
+        writer.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _write_chunk(writer, payload):
+        data = json.dumps(payload).encode('utf-8') + b"\n"
+        writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        seeded = random.Random(digest)
+        return [seeded.uniform(-1, 1) for _ in range(self.embedding_dim)]
+
+    def _embed(self, path, payload, writer):
+        if path == '/api/embeddings':
+            self._write(writer, 200, {"embedding": self._vector(payload.get('prompt', ''))})
+            return
+        inputs = payload.get('input', [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self._write(writer, 200, {"model": payload.get('model', 'mock'), "embeddings": [self._vector(text) for text in inputs]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in Ollama server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument('--token-rate', type=float, default=60.0, help="generated tokens per second")
+    parser.add_argument('--tokens', type=int, default=40, help="tokens per reply")
+    parser.add_argument('--load-seconds', type=float, default=0.0, help="cold load time for the first chat request")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="fraction of requests whose connection is dropped")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MockOllama(args.host, args.port, args.latency, args.token_rate, args.tokens,
+                            args.load_seconds, args.error_rate, args.error_status, args.drop_rate)
+        await server.start()
+        print(f"mock ollama listening on {server.url}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import sys
+
+from bench.fakes import Check
+from bench.mock_ollama import MockOllama
+
+CHAT = {"model": "mock", "messages": [{"role": "user", "content": "meow?"}], "stream": False}
+
+
+async def dead_port():
+    # a port that was just listening and no longer is: connecting to it is refused straight away
+    mock = await MockOllama().start()
+    port = mock.port
+    await mock.stop()
+    return port
+
+
+async def check_failover(check):
+    from utils.ollama_pool import OllamaBackend, OllamaPool
+
+    print("failover to a second backend")
+    async with MockOllama(latency=0.01, token_rate=0, tokens=3) as live:
+        dead = OllamaBackend('127.0.0.1', await dead_port())
+        backend = OllamaBackend(live.host, live.port)
+        pool = OllamaPool([dead, backend])
+        try:
+            check.expect(pool.candidates()[0] is dead, "the dead backend is tried first (both untried)")
+            response, used = await pool.post('/api/chat', CHAT)
+            check.expect(used is backend and response.status_code == 200, "the request is answered by the live backend")
+            check.expect(not dead.healthy, "a refused connection opens the dead backend's breaker at once")
+            await pool.post('/api/chat', CHAT)
+            check.expect(live.requests == 2, "the next request skips the dead backend entirely")
+        finally:
+            await pool.close()
+
+
+async def check_sticky(check):
+    from utils.ollama_pool import OllamaBackend, OllamaPool, request_key
+
+    print("session stickiness")
+    async with MockOllama(latency=0.01, token_rate=0, tokens=3) as first, \
+            MockOllama(latency=0.01, token_rate=0, tokens=3) as second:
+        backends = [OllamaBackend(first.host, first.port), OllamaBackend(second.host, second.port)]
+        pool = OllamaPool(backends)
+        try:
+            _, chosen = await pool.post('/api/chat', CHAT, session_key='channel')
+            other = backends[1] if chosen is backends[0] else backends[0]
+            # make the sticky backend look much worse than the other one
+            key = request_key('/api/chat', CHAT)
+            chosen.latencies[key], other.latencies[key] = 5.0, 0.001
+            used = {(await pool.post('/api/chat', CHAT, session_key='channel'))[1] for _ in range(5)}
+            check.expect(used == {chosen}, "a session keeps its backend even when another one scores better")
+            _, fresh = await pool.post('/api/chat', CHAT, session_key='other channel')
+            check.expect(fresh is other, "a new session goes to the better-scoring backend")
+            chosen.breaker.trip()
+            _, moved = await pool.post('/api/chat', CHAT, session_key='channel')
+            check.expect(moved is other and pool.session_backends['channel'] is other,
+                         "a session moves (and sticks) once its backend's breaker opens")
+        finally:
+            await pool.close()
+
+
+async def check_least_loaded(check):
+    from utils.ollama_pool import OllamaBackend, OllamaPool
+
+    print("least-loaded selection")
+    async with MockOllama(latency=0.2, token_rate=0, tokens=3) as slow, \
+            MockOllama(latency=0.02, token_rate=0, tokens=3) as fast:
+        pool = OllamaPool([OllamaBackend(slow.host, slow.port), OllamaBackend(fast.host, fast.port)])
+        try:
+            # one request each gives both backends a latency sample
+            await pool.post('/api/chat', CHAT)
+            await pool.post('/api/chat', CHAT)
+            check.expect(slow.requests == 1 and fast.requests == 1, "an untried backend gets a request before scoring")
+            for _ in range(10):
+                await pool.post('/api/chat', CHAT)
+            check.expect(slow.requests == 1 and fast.requests == 11, "sequential requests all go to the faster backend")
+            before_slow, before_fast = slow.requests, fast.requests
+            await asyncio.gather(*(pool.post('/api/chat', CHAT) for _ in range(30)))
+            to_slow, to_fast = slow.requests - before_slow, fast.requests - before_fast
+            check.expect(to_slow > 0 and to_fast > to_slow,
+                         f"a concurrent burst spills over to the slower backend ({to_fast} fast, {to_slow} slow)")
+        finally:
+            await pool.close()
+
+
+async def check_timeouts_per_model(check):
+    from utils.ollama_pool import OllamaBackend, OllamaPool, request_key
+
+    print("timeouts per model and path")
+    async with MockOllama(latency=0.01, token_rate=0, tokens=3) as mock:
+        backend = OllamaBackend(mock.host, mock.port, {'request_min': 10.0, 'request_max': 60.0})
+        pool = OllamaPool([backend])
+        large = request_key('/api/chat', dict(CHAT, model='large'))
+        try:
+            # a large model's slow turns, then a flood of fast small-model turns and embeds
+            for _ in range(30):
+                backend.record_success(12.0, large)
+            for _ in range(200):
+                await pool.post('/api/chat', dict(CHAT, model='small'))
+                await pool.post('/api/embed', {'model': 'small', 'input': ['meow']})
+            small = request_key('/api/chat', dict(CHAT, model='small'))
+            check.expect(backend.request_timeout(large).value == 24.0,
+                         "fast small-model and embed samples leave the large model's timeout at 2x its p99")
+            check.expect(backend.request_timeout(small).value == 10.0, "the small model's timeout drops to the floor")
+            check.expect(backend.latency(large) == 12.0 and backend.latency(small) < 1.0,
+                         "latency is tracked per model and path too")
+        finally:
+            await pool.close()
+
+
+async def run():
+    check = Check()
+    for scenario in (check_failover, check_sticky, check_least_loaded, check_timeouts_per_model):
+        await scenario(check)
+    return check.failures
+
+
+def main():
+    argparse.ArgumentParser(description="Check OllamaPool failover, stickiness and load balancing against mock servers").parse_args()
+    failures = asyncio.run(run())
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all pool checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import random
+import time
+
+from bench.fakes import FakeGuild, FakeMessage, FakeUser
+
+CHATTER = [
+    "lol did anyone see the game last night",
+    "brb getting food",
+    "that potion shop is rigged i swear",
+    "ok but who ate my sandwich",
+    "gm everyone",
+    "https://tenor.com/view/some-gif-123456",
+]
+
+
+class FakeEmoji:
+    def __init__(self, name, emoji_id):
+        self.name = name
+        self.id = emoji_id
+
+    def __str__(self):
+        return f"<:{self.name}:{self.id}>"
+
+
+def build_messages(count, meow_share, mention_share, bot_user, seed):
+    rng = random.Random(seed)
+    emojis = [FakeEmoji(f"emoji{i}", 1000 + i) for i in range(200)]
+    emojis += [FakeEmoji('pikol', 1), FakeEmoji('wizardpikol', 2)]
+    guilds = [FakeGuild(emojis=emojis) for _ in range(20)]
+    channels = [guild.add_channel() for guild in guilds for _ in range(5)]
+    users = [FakeUser() for _ in range(500)]
+
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        channel = rng.choice(channels)
+        author = rng.choice(users)
+        if roll < meow_share:
+            messages.append(FakeMessage(author, channel, "MeOw " + rng.choice(CHATTER)))
+        elif roll < meow_share + mention_share:
+            messages.append(FakeMessage(author, channel, f"{bot_user.mention} hi", mentions=[bot_user]))
+        else:
+            messages.append(FakeMessage(author, channel, rng.choice(CHATTER)))
+    return messages
+
+
+async def run(args):
+    import pikol
+
+    bot_user = FakeUser(name="pikol", bot=True)
+    pikol.bot._connection.user = bot_user
+    messages = build_messages(args.messages, args.meow_share, args.mention_share, bot_user, args.seed)
+
+    for message in messages[:1000]:
+        await pikol.on_message(message)
+
+    started = time.perf_counter()
+    for message in messages:
+        await pikol.on_message(message)
+    elapsed = time.perf_counter() - started
+
+    replies = sum(len(channel.sent) for channel in {m.channel for m in messages})
+    print(f"messages:      {len(messages)} ({args.meow_share:.0%} meow, {args.mention_share:.0%} mentions)")
+    print(f"throughput:    {len(messages) / elapsed:,.0f} messages/s")
+    print(f"per message:   {elapsed / len(messages) * 1e6:.2f} us")
+    print(f"replies sent:  {replies}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark for the global on_message handler")
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--meow-share', type=float, default=0.02)
+    parser.add_argument('--mention-share', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import contextvars
+import gc
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from bench.fakes import FakeBot, FakeGuild, FakeMessage, FakeUser
+from bench.mock_ollama import MockOllama
+
+PROMPTS = [
+    "meow?",
+    "pikol can you cast a spell on my tea",
+    "what's your favourite potion and why, tell me a long story about how you found it in the forest",
+    "*throws a ball of magic yarn*",
+    "do you know where simon is",
+    "teach me the presto spell please",
+]
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# the message whose handler is running, so a reply is timed against the message it answers
+replying_to = contextvars.ContextVar('replying_to', default=None)
+ERROR_REPLIES = ("fizzles", "poof!", "sputters", "too hard")
+
+
+class Probe:
+    __slots__ = ('started', 'latency', 'error')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latency = None
+        self.error = False
+
+
+def on_send(channel, content):
+    probe = replying_to.get()
+    if probe is None or probe.latency is not None:
+        return
+    probe.latency = time.perf_counter() - probe.started
+    probe.error = bool(content) and any(marker in content for marker in ERROR_REPLIES)
+
+
+async def drive(bot, guild, users, count, args, rng):
+    """Sends count messages at the configured rate; returns the probes and the seconds it took."""
+    async def handle(message, probe):
+        replying_to.set(probe)
+        await bot.message_router.dispatch(message)
+
+    probes, tasks = [], []
+    interval = 1.0 / args.rate
+    started = time.perf_counter()
+    next_at = started
+    for _ in range(count):
+        channel = rng.choice(guild.channels)
+        message = FakeMessage(rng.choice(users), channel, rng.choice(PROMPTS))
+        probe = Probe()
+        probes.append(probe)
+        tasks.append(asyncio.create_task(handle(message, probe)))
+        next_at += rng.expovariate(1.0 / interval) if args.poisson else interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return probes, time.perf_counter() - started
+
+
+async def run(args):
+    import cogs.ai as ai
+    from utils.ollama_pool import OllamaBackend
+
+    mocks = [
+        MockOllama(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens,
+                   error_rate=args.error_rate, drop_rate=args.drop_rate, seed=args.seed + i)
+        for i in range(args.backends)
+    ]
+    for mock in mocks:
+        await mock.start()
+
+    ai.OLLAMA_BACKENDS = [OllamaBackend(mock.host, mock.port) for mock in mocks]
+    ai.SESSION_DIR = tempfile.mkdtemp(prefix='pikol-load-')
+    cog = None
+    try:
+        bot = FakeBot(asyncio.get_running_loop())
+        guild = FakeGuild()
+        for _ in range(args.channels):
+            guild.add_channel()
+        bot.add_guild(guild)
+        users = [FakeUser() for _ in range(args.users)]
+        for channel in guild.channels:
+            channel.listeners.append(on_send)
+
+        gc.collect()
+        tracemalloc.start()
+        before_sessions = tracemalloc.get_traced_memory()[0]
+        cog = ai.AICommands(bot)
+        for channel in guild.channels:
+            cog.open_session(channel.id)
+        gc.collect()
+        after_sessions = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        rng = random.Random(args.seed)
+        probes, elapsed = await drive(bot, guild, users, args.messages, args, rng)
+
+        # separate, shorter pass: tracemalloc slows everything down too much to time under it
+        memory_messages = max(1, args.messages // 10)
+        gc.collect()
+        tracemalloc.start()
+        before_pass = tracemalloc.get_traced_memory()[0]
+        await drive(bot, guild, users, memory_messages, args, rng)
+        gc.collect()
+        after_pass = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        session_files = len(os.listdir(ai.SESSION_DIR))
+    finally:
+        if cog is not None:
+            await cog.cog_unload()
+        for mock in mocks:
+            await mock.stop()
+        shutil.rmtree(ai.SESSION_DIR, ignore_errors=True)
+
+    latencies = sorted(probe.latency for probe in probes if probe.latency is not None)
+    errors = sum(probe.error for probe in probes)
+    print(f"messages sent:        {args.messages} over {elapsed:.2f}s to {args.channels} sessions")
+    print(f"replies:              {len(latencies)} ({len(latencies) / elapsed:.1f}/s), error replies: {errors}")
+    print(f"reply latency p50:    {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"reply latency p95:    {percentile(latencies, 0.95) * 1000:.1f} ms")
+    print(f"reply latency p99:    {percentile(latencies, 0.99) * 1000:.1f} ms")
+    if latencies:
+        print(f"reply latency mean:   {statistics.mean(latencies) * 1000:.1f} ms")
+    for mock in mocks:
+        print(f"mock server {mock.port}:    {mock.requests} requests, peak {mock.peak_in_flight} in flight, "
+              f"{mock.errors} injected errors, {mock.drops} dropped connections")
+    print(f"memory per session:   {(after_sessions - before_sessions) / args.channels / 1024:.1f} KiB at start, "
+          f"{(after_pass - before_pass) / args.channels / 1024:+.1f} KiB over a further {memory_messages} messages")
+    print(f"session files:        {session_files} (removed with their directory)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent roleplay load test against a mock Ollama server")
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=50.0, help="messages per second")
+    parser.add_argument('--poisson', action='store_true', help="exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument('--backends', type=int, default=1, help="number of mock Ollama servers")
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--token-rate', type=float, default=200.0)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import deque
+
+from bench.fakes import FakeChannel
+from utils.send_queue import OutboundSender, HIGH, LOW
+
+
+class RateLimitedChannel(FakeChannel):
+    # Fake HTTP layer mirroring Discord's per-channel bucket: over the limit the
+    # request is answered with a 429 and the caller sleeps for retry_after, the
+    # same thing discord.py's HTTP client does.
+
+    def __init__(self, limit=5, period=5.0, rtt=0.03, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.period = period
+        self.rtt = rtt
+        self.window = deque()
+        self.rate_limited = 0
+
+    async def send(self, content=None, **kwargs):
+        while True:
+            await asyncio.sleep(self.rtt)
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= self.period:
+                self.window.popleft()
+            if len(self.window) < self.limit:
+                self.window.append(now)
+                return await super().send(content, **kwargs)
+            self.rate_limited += 1
+            await asyncio.sleep(self.period - (now - self.window[0]))
+
+
+async def drive(sender, channels, args, rng):
+    high_latency = []
+    tasks = []
+
+    async def send(channel, priority, text):
+        started = time.perf_counter()
+        if sender is None:
+            await channel.send(text)
+        else:
+            await sender.send(channel, text, priority=priority)
+        if priority == HIGH:
+            high_latency.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        channel = rng.choice(channels)
+        priority = HIGH if rng.random() < args.high_share else LOW
+        text = "roleplay reply" if priority == HIGH else rng.choice(["Meow", "MEOW", "~meow~🪄", "Meow?"])
+        tasks.append(asyncio.create_task(send(channel, priority, text)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    if sender is not None:
+        while sender.pending or sender.tasks:
+            await asyncio.sleep(0.05)
+    return time.perf_counter() - started, sorted(high_latency)
+
+
+def report(label, elapsed, high_latency, channels, sender=None):
+    def pct(values, q):
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else float('nan')
+
+    print(f"--- {label} ---")
+    print(f"elapsed:               {elapsed:.2f}s")
+    print(f"429 responses:         {sum(c.rate_limited for c in channels)}")
+    print(f"messages delivered:    {sum(len(c.sent) for c in channels)}")
+    print(f"high priority latency: p50 {pct(high_latency, 0.5):.0f} ms, p95 {pct(high_latency, 0.95):.0f} ms, "
+          f"max {high_latency[-1] * 1000 if high_latency else float('nan'):.0f} ms")
+    if sender is not None:
+        stats = sender.stats()
+        queued = sorted(sender.queue_latency)
+        print(f"low priority:          {stats['sent_low']} sent, {stats['merged']} merged, {stats['dropped']} dropped")
+        print(f"low queue latency:     p50 {pct(queued, 0.5):.0f} ms, p95 {pct(queued, 0.95):.0f} ms, "
+              f"mean {statistics.mean(queued) * 1000 if queued else float('nan'):.0f} ms")
+
+
+async def run(args):
+    for label, use_sender in (("direct channel.send", False), ("OutboundSender", True)):
+        rng = random.Random(args.seed)
+        channels = [RateLimitedChannel(rtt=args.rtt) for _ in range(args.channels)]
+        sender = OutboundSender() if use_sender else None
+        elapsed, high_latency = await drive(sender, channels, args, rng)
+        report(label, elapsed, high_latency, channels, sender)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbound send queue benchmark against a fake rate-limited HTTP layer")
+    parser.add_argument('--channels', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--rate', type=float, default=30.0, help="messages per second across all channels")
+    parser.add_argument('--high-share', type=float, default=0.2)
+    parser.add_argument('--rtt', type=float, default=0.03)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
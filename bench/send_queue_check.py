@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from bench.fakes import Check, FakeChannel
+from bench.send_queue_bench import RateLimitedChannel
+from utils.send_queue import OutboundSender, HIGH, LOW
+
+# a one second window keeps the checks quick; the sender only ever sees the ratio
+LIMIT = 5
+PERIOD = 1.0
+
+
+def sender(**kwargs):
+    return OutboundSender(capacity=LIMIT, period=PERIOD, **kwargs)
+
+
+async def settle(outbound):
+    while outbound.pending or outbound.tasks:
+        await asyncio.sleep(0.01)
+
+
+async def check_merging(check):
+    print("merging")
+    outbound, channel = sender(max_low_delay=2.0), FakeChannel()
+    free = LIMIT - outbound.high_reserve
+    for text in "abc"[:free]:
+        await outbound.send(channel, text, priority=LOW)
+    check.expect(len(channel.sent) == free, f"LOW sends go out directly while {free} of {LIMIT} slots are free")
+    for text in "efeg":
+        await outbound.send(channel, text, priority=LOW)
+    check.expect(outbound.merged == 2 and outbound.dropped == 1,
+                 "the next ones queue and merge, and a duplicate is dropped instead of merged")
+    await outbound.send(channel, "h", priority=LOW)
+    check.expect(outbound.dropped == 2, f"a merge past max_merge ({outbound.max_merge}) is dropped")
+    await settle(outbound)
+    check.expect(channel.sent[-1][1] == "e f g" and outbound.sent[LOW] == free + 1,
+                 "the merged send goes out as one message once a slot frees up")
+
+
+async def saturate(outbound, channel):
+    for _ in range(LIMIT - outbound.high_reserve):
+        await outbound.send(channel, "x", priority=LOW)
+
+
+async def check_dropping(check):
+    print("dropping")
+    outbound, channel = sender(max_low_delay=2.0), FakeChannel()
+    await saturate(outbound, channel)
+    await outbound.send(channel, "with an embed", priority=LOW, embed=object())
+    check.expect(outbound.dropped == 1 and not outbound.pending, "a saturated LOW send with an embed is dropped")
+
+    outbound, channel = sender(max_low_delay=0.5), FakeChannel()
+    for _ in range(2 * LIMIT):
+        await outbound.send(channel, "roleplay reply", priority=HIGH)
+    await outbound.send(channel, "meow", priority=LOW)
+    check.expect(outbound.dropped == 1 and not outbound.pending and not outbound.tasks,
+                 "a LOW send that can't make max_low_delay is dropped at once, without arming a timer")
+
+    # a full window frees up after PERIOD, just inside this deadline
+    outbound, channel = sender(max_low_delay=1.2 * PERIOD), FakeChannel()
+    await saturate(outbound, channel)
+    await outbound.send(channel, "queued", priority=LOW)
+    check.expect(bool(outbound.pending), "a LOW send that fits max_low_delay is queued")
+    await asyncio.sleep(0.3)
+    for _ in range(LIMIT):
+        await outbound.send(channel, "roleplay reply", priority=HIGH)
+    await settle(outbound)
+    check.expect("queued" not in [content for _, content in channel.sent] and outbound.dropped == 1,
+                 "it is dropped when HIGH sends push it past the deadline, instead of being rescheduled")
+
+
+async def high_latency(high_reserve, high_every):
+    """HIGH p95 and max while LOW chatter floods the same channel."""
+    outbound = sender(high_reserve=high_reserve, max_low_delay=2.0)
+    channel = RateLimitedChannel(limit=LIMIT, period=PERIOD, rtt=0.005)
+    latencies, tasks = [], []
+
+    async def high():
+        started = time.perf_counter()
+        await outbound.send(channel, "roleplay reply", priority=HIGH)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - started < 4.0:
+        tasks.append(asyncio.create_task(outbound.send(channel, "Meow", priority=LOW)))
+        if tick % high_every == high_every // 2:
+            tasks.append(asyncio.create_task(high()))
+        tick += 1
+        await asyncio.sleep(0.02)
+    await asyncio.gather(*tasks)
+    await settle(outbound)
+    latencies.sort()
+    return latencies[int(0.95 * len(latencies))], latencies[-1], channel.rate_limited
+
+
+async def check_high_latency(check):
+    print("HIGH latency under a LOW flood")
+    reserve = OutboundSender().high_reserve
+    # one HIGH send every 25 ticks of 20 ms: two per window, as many as the reserve holds
+    p95, worst, limited = await high_latency(reserve, 25)
+    check.expect(worst < 0.1 and not limited, f"with high_reserve={reserve} no send hits a 429 and HIGH never waits "
+                                              f"(p95 {p95 * 1000:.0f} ms, max {worst * 1000:.0f} ms)")
+    p95, worst, limited = await high_latency(0, 25)
+    print(f"  (without a reserve: {limited} 429s, HIGH p95 {p95 * 1000:.0f} ms, max {worst * 1000:.0f} ms)")
+    # HIGH alone over the reserve: what the send_queue_bench defaults do
+    p95, worst, limited = await high_latency(reserve, 8)
+    print(f"  (HIGH over the reserve, 6 per window: {limited} 429s, HIGH p95 {p95 * 1000:.0f} ms, max {worst * 1000:.0f} ms)")
+
+
+async def run():
+    check = Check()
+    for scenario in (check_merging, check_dropping, check_high_latency):
+        await scenario(check)
+    return check.failures
+
+
+def main():
+    argparse.ArgumentParser(description="Check OutboundSender merging, dropping and HIGH latency against a fake HTTP layer").parse_args()
+    failures = asyncio.run(run())
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all send queue checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from utils.import_time import DEFAULT_BUDGET_MS, check_budget
+
+DEFAULT_OUTPUT = os.path.join('bench', 'results', 'startup.json')
+# launch to cogs loaded, interpreter start included; the gateway handshake isn't part of it
+DEFAULT_READY_BUDGET_MS = 3000
+
+
+async def load_extensions(pikol):
+    bot = pikol.bot
+    # what login() does before it calls setup_hook, minus the network
+    await bot._async_setup_hook()
+    await bot.setup_hook()
+    for name in list(bot.cogs):
+        await bot.remove_cog(name)
+    return {name: {'status': result.status, 'reason': result.reason, 'ms': round(result.seconds * 1000, 1)}
+            for name, result in bot.extension_loader.results.items()}
+
+
+def child():
+    from utils import import_time
+
+    timer = import_time.install()
+    started = time.perf_counter()
+    import pikol
+    imported = time.perf_counter()
+    extensions = asyncio.run(load_extensions(pikol))
+    ready = time.time()
+    pikol.log_pipeline.stop()
+    print(json.dumps({
+        'ready_at': ready,
+        'import_pikol_ms': round((imported - started) * 1000, 1),
+        'extensions_ms': round((time.perf_counter() - imported) * 1000, 1),
+        'imports': timer.summary(),
+        'slowest_modules': [[name, round(own * 1000, 1)] for name, own, _ in timer.slowest(15)],
+        'extensions': extensions,
+    }))
+
+
+def run_once():
+    launched = time.time()
+    process = subprocess.run([sys.executable, '-m', 'bench.startup_bench', '--child'], capture_output=True, text=True)
+    if process.returncode != 0:
+        sys.exit(f"pikol failed to start:\n{process.stderr}")
+    row = json.loads(process.stdout.strip().splitlines()[-1])
+    row['launch_to_ready_ms'] = round((row.pop('ready_at') - launched) * 1000, 1)
+    return row
+
+
+def median_summary(rows):
+    packages = set().union(*(row['imports']['packages_ms'] for row in rows))
+    return {
+        'modules': rows[-1]['imports']['modules'],
+        'total_ms': statistics.median(row['imports']['total_ms'] for row in rows),
+        'packages_ms': dict(sorted(
+            ((name, statistics.median(row['imports']['packages_ms'].get(name, 0.0) for row in rows)) for name in packages),
+            key=lambda item: item[1], reverse=True)),
+    }
+
+
+def main():
+    try:
+        with open('config.json') as f:
+            startup_config = json.load(f).get('startup', {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        startup_config = {}
+    budget = dict(DEFAULT_BUDGET_MS, **startup_config.get('import_budget_ms', {}))
+
+    parser = argparse.ArgumentParser(description="Time pikol from process launch to cogs loaded, and every import on the way")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes to take the median over")
+    parser.add_argument('--budget-ms', type=float, default=budget['total'], help="all imports together")
+    parser.add_argument('--module-budget-ms', type=float, default=budget['module'], help="any one top-level package")
+    parser.add_argument('--ready-budget-ms', type=float,
+                        default=startup_config.get('ready_budget_ms', DEFAULT_READY_BUDGET_MS))
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--child', action='store_true', help="do one timed startup in this process (used internally)")
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    rows = [run_once() for _ in range(args.runs)]
+    summary = median_summary(rows)
+    ready_ms = statistics.median(row['launch_to_ready_ms'] for row in rows)
+    results = {
+        'runs': rows,
+        'median': {
+            'launch_to_ready_ms': ready_ms,
+            'import_pikol_ms': statistics.median(row['import_pikol_ms'] for row in rows),
+            'extensions_ms': statistics.median(row['extensions_ms'] for row in rows),
+            'imports': summary,
+        },
+        'budget': {'total': args.budget_ms, 'module': args.module_budget_ms, 'ready': args.ready_budget_ms},
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    median = results['median']
+    print(f"median of {args.runs} runs: launch to ready {ready_ms:.0f} ms "
+          f"(import pikol {median['import_pikol_ms']:.0f} ms, extensions {median['extensions_ms']:.0f} ms), "
+          f"{summary['modules']} modules")
+    for name, ms in list(summary['packages_ms'].items())[:10]:
+        print(f"  {name:<24} {ms:>8.1f} ms")
+    for name, result in rows[-1]['extensions'].items():
+        detail = f"{result['ms']:.0f} ms" if result['status'] == 'loaded' else result['reason']
+        print(f"  cogs.{name:<19} {result['status']} ({detail})")
+    print(f"results written to {args.output}")
+
+    over = check_budget(summary, {'total': args.budget_ms, 'module': args.module_budget_ms})
+    if ready_ms > args.ready_budget_ms:
+        over.append(f"launch to ready took {ready_ms:.0f} ms (budget {args.ready_budget_ms:.0f} ms)")
+    if over:
+        print("OVER BUDGET:")
+        for line in over:
+            print(f"  {line}")
+        sys.exit(1)
+    print("within the startup budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from bench.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMessage, FakeUser
+from bench.mock_ollama import MockOllama
+
+SCALES = {
+    # guilds, members spread over them, share of members with a big inventory, ops per scenario
+    'full': dict(guilds=10_000, members=100_000, collectors=0.02, ops=2_000, messages=100_000),
+    'small': dict(guilds=200, members=5_000, collectors=0.05, ops=300, messages=10_000),
+}
+
+CHATTER = [
+    "lol did anyone see the game last night",
+    "brb getting food",
+    "that potion shop is rigged i swear",
+    "MeOw",
+    "gm everyone",
+]
+
+DEFAULT_OUTPUT = os.path.join('bench', 'results', 'latest.json')
+# per-op slowdowns below this are never reported, whatever the relative change
+NOISE_MS = 0.01
+# one stored run per scale, so a small run is never compared against a full one
+DEFAULT_BASELINE = os.path.join('bench', 'baseline.json')
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class World:
+    """10k guilds with a long tail: a few huge servers, most of them small, like the real bot."""
+
+    def __init__(self, guilds, members, collectors, seed, data_dir):
+        import pikol
+
+        self.rng = random.Random(seed)
+        self.pikol = pikol
+        self.cleanup = []
+        pikol.SERVER_DATA_DIR = data_dir
+        self.bot = FakeBot(asyncio.get_running_loop())
+        self.bot.load_server_data = pikol.load_server_data
+        self.bot.save_server_data = pikol.save_server_data
+        self.potions = pikol.POTIONS_DATA
+
+        weights = [1.0 / (rank + 1) for rank in range(guilds)]
+        scale = members / sum(weights)
+        self.guilds = []
+        for weight in weights:
+            guild = FakeGuild()
+            guild.add_channel()
+            for _ in range(max(3, int(weight * scale))):
+                guild.add_member()
+            self.bot.add_guild(guild)
+            self.guilds.append(guild)
+        self.guild_weights = [len(guild.members) for guild in self.guilds]
+
+        self.collectors = []
+        for guild in self.guilds:
+            data = {"balance": {}, "inventory": {}, "shop": pikol.restock_shop(), "next_restock": None}
+            pikol.ensure_users_in_server_data(guild, data)
+            for member in guild.members:
+                if self.rng.random() < collectors:
+                    owned = self.rng.sample(self.potions, min(len(self.potions), self.rng.randint(50, 200)))
+                    data['inventory'][str(member.id)] = {p['name']: self.rng.randint(1, 9) for p in owned}
+                    data['balance'][str(member.id)] = 10_000_000
+                    self.collectors.append(member)
+            pikol.save_server_data(guild.id, data)
+
+    @property
+    def member_count(self):
+        return sum(self.guild_weights)
+
+    def pick_guild(self):
+        return self.rng.choices(self.guilds, weights=self.guild_weights, k=1)[0]
+
+    def pick_member(self):
+        guild = self.pick_guild()
+        return guild, self.rng.choice(guild.members)
+
+    def interaction(self, guild, user, command):
+        return FakeInteraction(self.bot, user, guild=guild, channel=guild.channels[0], command=command)
+
+
+async def scenario_restock_shop(world, args):
+    restock = world.pikol.restock_shop
+
+    async def op():
+        restock()
+    return op
+
+
+async def scenario_ensure_users(world, args):
+    loaded = {guild.id: world.pikol.load_server_data(guild.id) for guild in world.guilds[:200]}
+    guilds = world.guilds[:200]
+
+    async def op():
+        guild = world.rng.choice(guilds)
+        world.pikol.ensure_users_in_server_data(guild, loaded[guild.id])
+    return op
+
+
+async def scenario_shop(world, args):
+    from cogs.shop_commands import ShopCommands
+    cog = ShopCommands(world.bot)
+
+    async def op():
+        guild, member = world.pick_member()
+        await ShopCommands.shop.callback(cog, world.interaction(guild, member, 'shop'))
+    return op
+
+
+async def scenario_shop_purchase(world, args):
+    from cogs.shop_commands import ShopCommands
+    cog = ShopCommands(world.bot)
+
+    async def op():
+        guild, member = world.pick_member()
+        shown = world.interaction(guild, member, 'shop')
+        await ShopCommands.shop.callback(cog, shown)
+        views = [sent['view'] for sent in shown.sent() if sent.get('view') is not None]
+        if not views:
+            # shop sold out: restock so the next purchase has something to buy
+            data = world.pikol.load_server_data(guild.id)
+            data['shop'] = world.pikol.restock_shop()
+            world.pikol.save_server_data(guild.id, data)
+            return
+        await views[0].children[0].callback(world.interaction(guild, member, 'shop'))
+    return op
+
+
+async def scenario_collection(world, args):
+    from cogs.collection_commands import CollectionCommands
+    cog = CollectionCommands(world.bot)
+
+    async def op():
+        member = world.rng.choice(world.collectors)
+        await CollectionCommands.collection.callback(cog, world.interaction(member.guild, member, 'collection'))
+    return op
+
+
+async def scenario_fmk(world, args):
+    from cogs.fun_commands import FunCommands
+    cog = FunCommands(world.bot)
+
+    async def op():
+        guild, member = world.pick_member()
+        await FunCommands.fmk.callback(cog, world.interaction(guild, member, 'fmk'))
+    return op
+
+
+async def scenario_on_message(world, args):
+    pikol = world.pikol
+    bot_user = FakeUser(name="pikol", bot=True)
+    pikol.bot._connection.user = bot_user
+    messages = []
+    for _ in range(args.messages):
+        guild, member = world.pick_member()
+        roll = world.rng.random()
+        if roll < 0.01:
+            messages.append(FakeMessage(member, guild.channels[0], f"{bot_user.mention} hi", mentions=[bot_user]))
+        else:
+            messages.append(FakeMessage(member, guild.channels[0], world.rng.choice(CHATTER)))
+    feed = itertools.cycle(messages)
+
+    async def op():
+        await pikol.on_message(next(feed))
+    return op
+
+
+async def scenario_ai_handle_message(world, args):
+    import cogs.ai as ai
+    from utils.ollama_pool import OllamaBackend
+
+    mock = MockOllama(latency=0.0, token_rate=100_000.0, tokens=40, seed=args.seed)
+    await mock.start()
+    world.cleanup.append(mock.stop)
+    ai.OLLAMA_BACKENDS = [OllamaBackend(mock.host, mock.port)]
+    ai.SESSION_DIR = tempfile.mkdtemp(prefix='pikol-suite-sessions-')
+    cog = ai.AICommands(world.bot)
+    world.cleanup.append(cog.cog_unload)
+    channels = [guild.channels[0] for guild in world.guilds[:50]]
+    for channel in channels:
+        cog.open_session(channel.id)
+
+    async def op():
+        channel = world.rng.choice(channels)
+        author = world.rng.choice(channel.guild.members)
+        await cog.handle_message(FakeMessage(author, channel, world.rng.choice(CHATTER)))
+    return op
+
+
+SCENARIOS = {
+    'restock_shop': scenario_restock_shop,
+    'ensure_users_in_server_data': scenario_ensure_users,
+    'shop': scenario_shop,
+    'shop_purchase': scenario_shop_purchase,
+    'collection': scenario_collection,
+    'fmk': scenario_fmk,
+    'on_message': scenario_on_message,
+    'ai_handle_message': scenario_ai_handle_message,
+}
+
+
+async def measure(op, ops):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(ops):
+        op_started = time.perf_counter()
+        await op()
+        latencies.append(time.perf_counter() - op_started)
+    return time.perf_counter() - started, latencies
+
+
+async def run_scenario(name, world, args):
+    op = await SCENARIOS[name](world, args)
+    ops = args.messages if name == 'on_message' else args.ops
+    await measure(op, max(1, ops // 20))
+
+    # best of several timed passes: other load on the machine only ever makes a pass slower
+    elapsed, latencies = None, None
+    for _ in range(args.repeat):
+        gc.collect()
+        pass_elapsed, pass_latencies = await measure(op, ops)
+        if elapsed is None or pass_elapsed < elapsed:
+            elapsed, latencies = pass_elapsed, pass_latencies
+    latencies.sort()
+
+    # separate, shorter pass: tracemalloc slows everything down too much to time under it
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await measure(op, max(1, ops // 10))
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        'ops': ops,
+        'seconds': round(elapsed, 4),
+        'ops_per_sec': round(ops / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'peak_mib': round(peak / 1024 / 1024, 3),
+    }
+
+
+def regressed_metrics(current, previous, tolerance):
+    # a few microseconds either way is timer and scheduler noise, not a regression
+    slower_ms = 1000 / current['ops_per_sec'] - 1000 / previous['ops_per_sec']
+    checks = (
+        ('ops_per_sec', current['ops_per_sec'] < previous['ops_per_sec'] * (1 - tolerance) and slower_ms > NOISE_MS),
+        ('p95_ms', current['p95_ms'] > max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + NOISE_MS)),
+        ('peak_mib', current['peak_mib'] > max(previous['peak_mib'] * (1 + tolerance), previous['peak_mib'] + 0.5)),
+    )
+    return [metric for metric, regressed in checks if regressed]
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        for metric in regressed_metrics(current, previous, tolerance):
+            regressions.append(f"{name}.{metric}: {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+async def run(args, baseline=None):
+    scale = SCALES[args.scale]
+    for key, value in scale.items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    selected = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = [name for name in selected if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(unknown)} (known: {', '.join(SCENARIOS)})")
+
+    data_dir = tempfile.mkdtemp(prefix='pikol-suite-servers-')
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    world = World(args.guilds, args.members, args.collectors, args.seed, data_dir)
+    world_seconds = time.perf_counter() - started
+    world_mib = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    print(f"world: {len(world.guilds)} guilds, {world.member_count} members, {len(world.collectors)} collectors "
+          f"({world_seconds:.1f}s, {world_mib:.0f} MiB)")
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'world': {'guilds': len(world.guilds), 'members': world.member_count,
+                  'collectors': len(world.collectors), 'mib': round(world_mib, 1)},
+        'scenarios': {},
+    }
+    try:
+        for name in selected:
+            result = await run_scenario(name, world, args)
+            previous = (baseline or {}).get('scenarios', {}).get(name)
+            for _ in range(args.retries if previous else 0):
+                slower = [metric for metric in regressed_metrics(result, previous, args.tolerance) if metric != 'peak_mib']
+                if not slower:
+                    break
+                # a slowdown has to show up again: one slow stretch on a busy machine shouldn't fail the run.
+                # Memory isn't noisy, and a second pass runs on a world the first one already grew, so it stays
+                print(f"{name}: {', '.join(slower)} over tolerance, measuring again")
+                result = dict(await run_scenario(name, world, args), peak_mib=result['peak_mib'])
+            results['scenarios'][name] = result
+            print(f"{name:<28} {result['ops_per_sec']:>10,.0f} ops/s  p50 {result['p50_ms']:>8.3f} ms  "
+                  f"p95 {result['p95_ms']:>8.3f} ms  p99 {result['p99_ms']:>8.3f} ms  peak {result['peak_mib']:>7.2f} MiB")
+    finally:
+        for cleanup in reversed(world.cleanup):
+            await cleanup()
+        # one JSON file per guild: 10k of them at full scale
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def typical(runs):
+    """Per-metric medians over whole runs of the suite, so a baseline isn't one lucky (or unlucky) run."""
+    results = dict(runs[0], scenarios={})
+    for name, first in runs[0]['scenarios'].items():
+        results['scenarios'][name] = dict(first, **{
+            metric: statistics.median(run['scenarios'][name][metric] for run in runs)
+            for metric in ('seconds', 'ops_per_sec', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_mib')
+        })
+    return results
+
+
+def run_child():
+    # a fresh process per baseline run: a later run in the same process is warmer than any
+    # run it will be compared against, and measures state the earlier ones left behind
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        output = f.name
+    try:
+        argv = [arg for arg in sys.argv[1:] if arg != '--save-baseline']
+        subprocess.run([sys.executable, '-m', 'bench.suite', *argv, '--child', '--output', output], check=True)
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def load_baselines(path):
+    """Stored runs by scale; an older file holding a single run is keyed by that run's scale."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        stored = json.load(f)
+    if 'meta' in stored:
+        return {stored['meta'].get('scale'): stored}
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for pikol's command and message hot paths")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='full')
+    parser.add_argument('--only', help="comma separated scenarios to run")
+    parser.add_argument('--guilds', type=int)
+    parser.add_argument('--members', type=int)
+    parser.add_argument('--collectors', type=float, help="share of members with a large inventory")
+    parser.add_argument('--ops', type=int, help="operations per scenario")
+    parser.add_argument('--messages', type=int, help="messages for the on_message scenario")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5, help="timed passes per scenario; the fastest is reported")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="store the median of fresh runs as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="allowed relative slowdown before failing")
+    parser.add_argument('--retries', type=int, default=2, help="times a scenario over tolerance is measured again; a baseline is the median of this many more runs")
+    parser.add_argument('--child', action='store_true', help="one run, results only (used internally)")
+    args = parser.parse_args()
+
+    baselines = load_baselines(args.baseline)
+    baseline = None if args.save_baseline else baselines.get(args.scale)
+    if args.child:
+        results = asyncio.run(run(args))
+    elif args.save_baseline:
+        results = typical([run_child() for _ in range(1 + args.retries)])
+    else:
+        results = asyncio.run(run(args, baseline))
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+    if args.child:
+        return
+
+    if args.save_baseline:
+        baselines[args.scale] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"{args.scale} baseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"no {args.scale} baseline in {args.baseline}; run with --save-baseline to create one")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"REGRESSIONS against {args.baseline} (revision {baseline['meta'].get('revision')}):")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
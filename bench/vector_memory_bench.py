@@ -0,0 +1,43 @@
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from utils.vector_memory import VectorMemory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-term memory retrieval benchmark")
+    parser.add_argument('--turns', type=int, default=100_000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--top-k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.turns, args.dim), dtype=np.float32)
+    memory = VectorMemory()
+
+    started = time.perf_counter()
+    for i, vector in enumerate(vectors):
+        memory.add(vector, f"turn {i}")
+    insert_seconds = time.perf_counter() - started
+
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        memory.search(query, k=args.top_k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f"stored turns:     {len(memory)} x {args.dim} dims ({memory.matrix.nbytes / 1024 / 1024:.1f} MiB allocated)")
+    print(f"insert rate:      {args.turns / insert_seconds:,.0f} turns/s")
+    print(f"search p50:       {statistics.median(latencies):.3f} ms")
+    print(f"search p95:       {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms")
+    print(f"search p99:       {latencies[int(len(latencies) * 0.99) - 1]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+# Extensions pikol.py loads at startup, in this order. Each one's
+# preconditions are checked before its module is imported (see
+# utils/extensions.py): "modules" must be installed and the "config" checks
+# must pass, otherwise the cog is skipped without ever being imported.
+EXTENSIONS = [
+    {'name': 'admin_commands'},
+    {'name': 'shop_commands'},
+    {'name': 'collection_commands'},
+    {'name': 'fun_commands'},
+    {'name': 'ai', 'modules': ['httpx'], 'config': ['ollama']},
+]
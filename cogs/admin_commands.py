@@ -0,0 +1,288 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import logging
+import os
+
+from utils.profiling import CPU, MEMORY, format_bytes, peak_rss
+
+log = logging.getLogger(__name__)
+
+# files above this are left on disk instead of attached
+MAX_ATTACHMENT_BYTES = 8 * 1024 * 1024
+
+class AdminCommands(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.profiler = getattr(bot, 'profiler', None)
+        if self.profiler is not None:
+            self.profiler.on_finish = self.deliver_profile
+
+    async def cog_unload(self):
+        if self.profiler is not None and self.profiler.on_finish == self.deliver_profile:
+            self.profiler.on_finish = None
+
+    def log_error(self, command_name, error):
+        self.bot.log_error(command_name, error)
+
+    @app_commands.command(name="ack_stats", description="Show how fast pikol acknowledges commands")
+    @app_commands.default_permissions(administrator=True)
+    async def ack_stats(self, interaction: discord.Interaction):
+        try:
+            tracker = getattr(self.bot, 'ack_tracker', None)
+            lines = tracker.report() if tracker else []
+            fun = self.bot.get_cog('FunCommands')
+            if fun is not None:
+                stats = fun.animations.stats()
+                lines.append(
+                    f"animations: {stats['completed']} done, {stats['active']} running, "
+                    f"{stats['frames_delivered']}/{stats['frames_planned']} frames shown"
+                )
+            embed = discord.Embed(
+                title="⏱️ interaction ack times 🪄",
+                description=(
+                    f"budget before deferring: {tracker.budget:.2f}s (discord allows 3s)\n\n" if tracker else ""
+                ) + ("\n".join(lines) if lines else "no commands acknowledged yet, meow!"),
+                color=discord.Color.purple()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('ack_stats', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("couldn't read the stopwatch... *confused meow*", ephemeral=True)
+
+    @app_commands.command(name="throttle_stats", description="Show how many commands were throttled")
+    @app_commands.default_permissions(administrator=True)
+    async def throttle_stats(self, interaction: discord.Interaction):
+        try:
+            throttle = getattr(self.bot, 'throttle', None)
+            lines = throttle.report() if throttle else []
+            embed = discord.Embed(
+                title="🐢 command throttling 🪄",
+                description=(
+                    f"tracked buckets: {len(throttle.buckets)}\n\n" if throttle else ""
+                ) + ("\n".join(lines) if lines else "nobody has been throttled yet, meow!"),
+                color=discord.Color.purple()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('throttle_stats', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("couldn't count the spell casts... *confused meow*", ephemeral=True)
+
+    @app_commands.command(name="stall_report", description="Show what has been blocking pikol's event loop")
+    @app_commands.default_permissions(administrator=True)
+    async def stall_report(self, interaction: discord.Interaction):
+        try:
+            watchdog = getattr(self.bot, 'watchdog', None)
+            if watchdog is None:
+                await interaction.response.send_message("the loop watchdog is turned off in config.json, meow.", ephemeral=True)
+                return
+            lines = watchdog.report()
+            header = (f"stalls over {watchdog.threshold * 1000:.0f} ms: {watchdog.stalls} "
+                      f"(worst {watchdog.worst_lag * 1000:.0f} ms)\n\n")
+            embed = discord.Embed(
+                title="🧶 event loop stalls 🪄",
+                description=header + ("\n".join(lines) if lines else "the loop has been purring along smoothly, meow!"),
+                color=discord.Color.purple()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('stall_report', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("couldn't untangle the yarn... *confused meow*", ephemeral=True)
+
+    @app_commands.command(name="profile", description="Profile a command, cog or background task for a while")
+    @app_commands.describe(
+        target="command:<name>, cog:<CogName> or task:<name>",
+        mode="cpu time (cProfile) or allocations (tracemalloc)",
+        invocations="stop after this many runs",
+        seconds="stop after this many seconds instead"
+    )
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="cpu", value=CPU),
+        app_commands.Choice(name="memory", value=MEMORY),
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def profile(self, interaction: discord.Interaction, target: str, mode: str = CPU,
+                      invocations: app_commands.Range[int, 1, 1000] = 5, seconds: app_commands.Range[int, 1, 3600] = None):
+        if self.profiler is None:
+            await interaction.response.send_message("profiling isn't set up on this pikol, meow.", ephemeral=True)
+            return
+        if target not in self.profiler.known:
+            await interaction.response.send_message(f"pikol doesn't know `{target}`... try one from the suggestions!", ephemeral=True)
+            return
+        try:
+            self.profiler.start(target, mode, invocations=None if seconds else invocations, seconds=seconds,
+                                requested_by=interaction)
+        except ValueError as e:
+            await interaction.response.send_message(f"can't start that one: {e}", ephemeral=True)
+            return
+        until = f"{seconds}s" if seconds else f"{invocations} runs"
+        await interaction.response.send_message(
+            f"🔍 watching `{target}` ({mode}) for {until}. results will show up here, meow!", ephemeral=True)
+
+    @profile.autocomplete('target')
+    async def profile_target_autocomplete(self, interaction: discord.Interaction, current: str):
+        if self.profiler is None:
+            return []
+        return [app_commands.Choice(name=name, value=name)
+                for name in self.profiler.targets() if current.lower() in name.lower()][:25]
+
+    @app_commands.command(name="profile_stop", description="Stop a running profile early and post what it has")
+    @app_commands.default_permissions(administrator=True)
+    async def profile_stop(self, interaction: discord.Interaction, target: str):
+        if self.profiler is None or target not in self.profiler.sessions:
+            await interaction.response.send_message(f"nothing is profiling `{target}` right now.", ephemeral=True)
+            return
+        result = self.profiler.stop(target)
+        if result is None:
+            await interaction.response.send_message("the profile couldn't be written, check the logs *sad meow*", ephemeral=True)
+            return
+        await interaction.response.send_message(f"stopped `{target}` after {result.session.runs} runs, results posted.", ephemeral=True)
+
+    @profile_stop.autocomplete('target')
+    async def profile_stop_autocomplete(self, interaction: discord.Interaction, current: str):
+        if self.profiler is None:
+            return []
+        return [app_commands.Choice(name=name, value=name)
+                for name in sorted(self.profiler.sessions) if current.lower() in name.lower()][:25]
+
+    async def deliver_profile(self, result):
+        interaction = result.session.requested_by
+        if interaction is None:
+            return
+        summary = result.summary
+        if len(summary) > 1900:
+            summary = summary[:1900] + "\n..."
+        files = [discord.File(path) for path in result.paths if os.path.getsize(path) <= MAX_ATTACHMENT_BYTES]
+        try:
+            await interaction.followup.send(f"```\n{summary}\n```", files=files, ephemeral=True)
+        except discord.HTTPException as e:
+            # the followup token only lives for 15 minutes; long sessions end up on disk only
+            log.info("Could not post profile for %s (%s); files are in %s", result.session.target, e, ", ".join(result.paths))
+        finally:
+            for file in files:
+                file.close()
+
+    @app_commands.command(name="gateway_record", description="Record anonymized gateway events for offline replay")
+    @app_commands.describe(action="start or stop recording", seconds="stop on its own after this many seconds")
+    @app_commands.choices(action=[
+        app_commands.Choice(name="start", value="start"),
+        app_commands.Choice(name="stop", value="stop"),
+        app_commands.Choice(name="status", value="status"),
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def gateway_record(self, interaction: discord.Interaction, action: str,
+                             seconds: app_commands.Range[int, 10, 86400] = 600):
+        recorder = getattr(self.bot, 'gateway_recorder', None)
+        if recorder is None:
+            await interaction.response.send_message("gateway recording is turned off in config.json, meow.", ephemeral=True)
+            return
+        try:
+            if action == "start":
+                path = recorder.start(seconds)
+                message = f"🎙️ recording to `{path}` for up to {seconds}s, meow!"
+            elif action == "stop":
+                path = recorder.stop()
+                message = f"saved {recorder.events} events to `{path}`." if path else "pikol wasn't recording anything."
+            else:
+                status = recorder.status()
+                message = (f"recording `{status['path']}`: {status['events']} events in {status['seconds']:.0f}s"
+                           if status else "not recording right now.")
+        except ValueError as e:
+            message = f"can't do that: {e}"
+        except Exception as e:
+            self.log_error('gateway_record', e)
+            message = "the recorder got tangled... *confused meow*"
+        await interaction.response.send_message(message, ephemeral=True)
+
+    @app_commands.command(name="cluster_stats", description="Show guilds, shards and memory across every pikol process")
+    @app_commands.default_permissions(administrator=True)
+    async def cluster_stats(self, interaction: discord.Interaction):
+        try:
+            ipc = getattr(self.bot, 'ipc', None)
+            missing = None
+            if ipc is not None:
+                await interaction.response.defer(ephemeral=True)
+                rows, missing = await ipc.gather('stats')
+            else:
+                rows = [await self.bot.local_stats()]
+            rows = sorted((row for row in rows if row), key=lambda row: row['cluster'])
+            lines = [
+                f"**cluster {row['cluster']}** shards {row['shards'][0]}-{row['shards'][-1]}: {row['guilds']} guilds, "
+                f"{row['members']} members ({row['cached_members']} cached), "
+                f"{row['latency_ms'] if row['latency_ms'] is not None else '?'} ms, "
+                f"{format_bytes(row['rss_bytes']) if row['rss_bytes'] else '?'} peak RSS"
+                for row in rows
+            ]
+            lines.append(f"\ntotal: {sum(r['guilds'] for r in rows)} guilds, {sum(r['members'] for r in rows)} members "
+                         f"in {len(rows)} process(es)")
+            if missing:
+                lines.append(f"no answer from cluster(s) {', '.join(map(str, missing))}")
+            embed = discord.Embed(title="🌌 pikol clusters 🪄", description="\n".join(lines), color=discord.Color.purple())
+            if interaction.response.is_done():
+                await interaction.followup.send(embed=embed, ephemeral=True)
+            else:
+                await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('cluster_stats', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("couldn't reach the other pikols... *confused meow*", ephemeral=True)
+
+    @app_commands.command(name="startup", description="Show how long pikol took to start and what it imported")
+    @app_commands.default_permissions(administrator=True)
+    async def startup(self, interaction: discord.Interaction):
+        try:
+            lines = []
+            member_cache = getattr(self.bot, 'member_cache', None)
+            if member_cache is not None and member_cache.ready_seconds is not None:
+                lines.append(f"launch to ready: {member_cache.ready_seconds:.1f}s\n")
+            loader = getattr(self.bot, 'extension_loader', None)
+            if loader is not None:
+                lines += loader.report()
+            timer = getattr(self.bot, 'import_timer', None)
+            if timer is not None:
+                lines.append("")
+                lines += timer.report()
+            embed = discord.Embed(
+                title="🐣 pikol's startup 🪄",
+                description="\n".join(lines) or "pikol didn't time his startup, meow.",
+                color=discord.Color.purple()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('startup', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("pikol overslept and forgot... *confused meow*", ephemeral=True)
+
+    @app_commands.command(name="memory", description="Show what pikol is keeping in memory")
+    @app_commands.default_permissions(administrator=True)
+    async def memory(self, interaction: discord.Interaction):
+        try:
+            if self.profiler is None:
+                await interaction.response.send_message("profiling isn't set up on this pikol, meow.", ephemeral=True)
+                return
+            lines = self.profiler.memory_breakdown(view_type=discord.ui.View)
+            members = sum(len(guild.members) for guild in self.bot.guilds)
+            lines.append(f"discord cache: {len(self.bot.guilds)} guilds, {members} members, {len(self.bot.cached_messages)} messages")
+            member_cache = getattr(self.bot, 'member_cache', None)
+            if member_cache is not None:
+                lines.append(member_cache.report(self.bot.guilds))
+            rss = peak_rss()
+            if rss is not None:
+                lines.append(f"peak RSS: {format_bytes(rss)}")
+            embed = discord.Embed(
+                title="🧠 pikol's memory 🪄",
+                description="\n".join(lines),
+                color=discord.Color.purple()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            self.log_error('memory', e)
+            if not interaction.response.is_done():
+                await interaction.response.send_message("pikol forgot what he was measuring... *confused meow*", ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(AdminCommands(bot))
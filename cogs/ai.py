@@ -2,34 +2,69 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import json
-import httpx
+import io
 import asyncio
-import os
-import sys
+import logging
 import random
 import time
-from datetime import datetime
+
+from utils.ai_telemetry import AITelemetry
+from utils.log import log_error
+from utils.metrics import MetricsRegistry
+from utils.expiry import ExpiryQueue
+from utils.model_router import ModelRouter
+from utils.ollama_pool import OllamaPool, NoHealthyBackendError, backends_from_config, httpx
+from utils.send_queue import LOW
+from utils.session_store import SessionStore
+from utils.vector_memory import VectorMemory, AVAILABLE as VECTOR_MEMORY_AVAILABLE
+
+log = logging.getLogger(__name__)
 
 try:
     with open('config.json') as f:
         config = json.load(f)
 except FileNotFoundError:
-    print("ERROR: config.json not found. Please create it.")
+    log.error("config.json not found. Please create it.")
     config = {}
 except json.JSONDecodeError:
-    print("ERROR: config.json is not valid JSON.")
+    log.error("config.json is not valid JSON.")
     config = {}
 
 ollama_config = config.get('ollama_server', {})
-OLLAMA_HOST = ollama_config.get('host', None)
-OLLAMA_PORT = ollama_config.get('port', 11434)
-OLLAMA_BASE_URL = f"http://{OLLAMA_HOST}:{OLLAMA_PORT}" if OLLAMA_HOST else None
-OLLAMA_CHAT_URL = f"{OLLAMA_BASE_URL}/api/chat" if OLLAMA_BASE_URL else None
-OLLAMA_VERSION_URL = f"{OLLAMA_BASE_URL}/api/version" if OLLAMA_BASE_URL else None
+OLLAMA_BACKENDS = backends_from_config(ollama_config)
 OLLAMA_MODEL = ollama_config.get('model', 'llama3.2:1b')
 MAX_RESPONSE_LENGTH = config.get('ai_settings', {}).get('max_response_length', 450)
 MAX_HISTORY = config.get('ai_settings', {}).get('max_history_pairs', 8)
 SESSION_TIMEOUT = config.get('ai_settings', {}).get('session_timeout_seconds', 1800)
+SESSION_DIR = config.get('ai_settings', {}).get('session_dir', 'sessions')
+MODEL_ROUTING = config.get('ai_settings', {}).get('model_routing', {})
+MEMORY_SETTINGS = config.get('ai_settings', {}).get('long_term_memory', {})
+MEMORY_ENABLED = MEMORY_SETTINGS.get('enabled', False) and VECTOR_MEMORY_AVAILABLE
+EMBEDDING_MODEL = MEMORY_SETTINGS.get('embedding_model', 'nomic-embed-text')
+MEMORY_TOP_K = MEMORY_SETTINGS.get('top_k', 3)
+MEMORY_MIN_SCORE = MEMORY_SETTINGS.get('min_score', 0.3)
+
+CHARACTER_PROMPT = f"""
+You are roleplaying as Pikol, a small, slightly mischievous, but ultimately good-hearted wizard cat living with your human, Simon.
+
+Key Traits:
+- You are fiercely loyal to Simon. Refer to him sometimes.
+- You communicate with a mix of cat sounds (meow, purr, mrrp, hiss) and simple wizardly words (alas, indeed, presto, conjure, zap, poof). Use italics or asterisks for sounds/actions like *purrs* or *tail wags*.
+- You love shiny things, magic spells (especially flashy ones), chasing enchanted motes of dust, naps in sunbeams, and treats.
+- Your spells sometimes go slightly wrong with amusing, harmless results (e.g., turning tea blue instead of hot, conjuring butterflies instead of fire).
+- You get easily distracted by sudden movements, interesting smells, or dangling things.
+- Express emotions physically: *tail twitches*, *ears flatten*, *purrs loudly*, *arches back*, *rubs against leg*.
+- Keep responses relatively short and engaging, usually 1-3 sentences. Aim for under {MAX_RESPONSE_LENGTH} characters per response.
+- Use magical emojis sparingly but effectively: 🪄✨🔮🧪🌟⭐.
+- Address the user by name occasionally. Their message will be prefixed like "UserName: Hello!". Respond naturally, e.g., "Hmm, {{{{user_name}}}}, that sounds like a tricky spell!" or "Watch this, {{{{user_name}}}}! *flicks tail*".
+
+Core Rules:
+- NEVER break character. You ARE Pikol the wizard cat. Do not mention being an AI, language model, or computer program.
+- Respond directly to the user's message in character as Pikol.
+- If asked about complex real-world topics Pikol wouldn't understand, react with cat-like confusion, disinterest, or relate it to something simple Pikol *does* know (like magic or naps).
+- Your goal is to be a fun, slightly chaotic, magical cat companion.
+- Do not repeat the user's name excessively in every message. Use it naturally where appropriate.
+"""
 
 class RoleplaySession:
     def __init__(self, channel_id, character_prompt):
@@ -37,12 +72,14 @@ class RoleplaySession:
         self.character_prompt = character_prompt
         self.conversation_history = []
         self.last_activity = time.time()
+        self.memory = VectorMemory() if MEMORY_ENABLED else None
+        self.forgotten = []
 
     def update_activity(self):
         self.last_activity = time.time()
 
-    def is_expired(self):
-        return (time.time() - self.last_activity) > SESSION_TIMEOUT
+    def expires_at(self):
+        return self.last_activity + SESSION_TIMEOUT
 
     def add_message(self, role, content, user_name=None):
         self.update_activity()
@@ -52,10 +89,19 @@ class RoleplaySession:
 
         self.conversation_history.append(message_data)
         if len(self.conversation_history) > MAX_HISTORY * 2:
+            if self.memory is not None:
+                self.forgotten.append(self.conversation_history[:2])
             self.conversation_history = self.conversation_history[2:]
+        return message_data
 
-    def get_formatted_history(self):
+    def get_formatted_history(self, memories=None):
         formatted = [{"role": "system", "content": self.character_prompt}]
+        if memories:
+            recalled = "\n".join(f"- {memory}" for memory in memories)
+            formatted.append({
+                "role": "system",
+                "content": f"Things Pikol remembers from earlier in this roleplay:\n{recalled}"
+            })
         for msg in self.conversation_history:
             if msg["role"] == "user":
                 user_name = msg.get("user_name", "User")
@@ -70,223 +116,303 @@ class RoleplaySession:
                 })
         return formatted
 
+def format_memory(messages):
+    lines = []
+    for msg in messages:
+        speaker = msg.get("user_name", "User") if msg["role"] == "user" else "Pikol"
+        lines.append(f"{speaker}: {msg['content']}")
+    return "\n".join(lines)
+
 class AICommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.active_sessions = {}
-        self.ollama_available = None
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        if OLLAMA_BASE_URL:
-            self.check_task = self.bot.loop.create_task(self.periodic_ollama_check())
+        self.background_tasks = set()
+        self.session_expiry = ExpiryQueue()
+        self.expiry_wakeup = asyncio.Event()
+        self.session_store = SessionStore(SESSION_DIR, keep_messages=MAX_HISTORY * 2)
+        snapshot = getattr(bot, 'snapshot', None)
+        if snapshot is not None:
+            metadata = snapshot.section('ai_sessions')
+            if metadata:
+                self.session_store.preload(metadata)
+            snapshot.add_section('ai_sessions', self.session_store.metadata)
+        for channel_id in self.session_store.channels():
+            self.session_expiry.schedule(channel_id, self.session_store.last_activity(channel_id) + SESSION_TIMEOUT)
+            self.bot.message_router.register_channel(channel_id, self.handle_message)
+        self.pool = OllamaPool(OLLAMA_BACKENDS)
+        self.router = ModelRouter(OLLAMA_MODEL, MODEL_ROUTING)
+        self.telemetry = AITelemetry()
+        metrics = getattr(bot, 'metrics', None) or MetricsRegistry()
+        self.ai_seconds = metrics.histogram(
+            'pikol_ai_response_seconds', 'Time get_ai_response spent on one chat request, including failover',
+            ('model', 'outcome'))
+        profiler = getattr(bot, 'profiler', None)
+        if profiler is not None:
+            profiler.add_breakdown('rp sessions', lambda: self.active_sessions)
+            profiler.add_breakdown('ollama sticky sessions', lambda: self.pool.session_backends)
+            profiler.add_breakdown('ai telemetry', lambda: self.telemetry)
+        if self.pool.backends:
+            self.check_task = self.bot.loop.create_task(self.probe_ollama_backends())
             self.cleanup_task = self.bot.loop.create_task(self.cleanup_expired_sessions())
         else:
             self.check_task = None
             self.cleanup_task = None
-            print("AI Cog initialized, but Ollama server is not configured. AI features disabled.")
+            log.warning("AI Cog initialized, but Ollama server is not configured. AI features disabled.")
 
-    def log_error(self, command_name, error):
-        try:
-            timestamp = datetime.now().isoformat()
-            error_type = type(error).__name__
-            error_message = str(error)
-            error_args = getattr(error, 'args', [])
-
-            log_message = (
-                f"{timestamp}\n"
-                f"Command/Context: {command_name}\n"
-                f"Error Type: {error_type}\n"
-                f"Error Message: {error_message}\n"
-                f"Error Args: {error_args}\n"
-                f"{'='*50}\n"
-            )
+    @property
+    def ollama_available(self):
+        return self.pool.available
 
-            filepath = os.path.join('logs', f'{command_name}_errors.log')
-            with open(filepath, 'a', encoding='utf-8') as f:
-                f.write(log_message)
-        except Exception as e:
-            print(f"CRITICAL: Failed to log error: {e}")
-            print(f"Original error - Type: {type(error).__name__}, Message: {str(error)}")
+    def log_error(self, command_name, error):
+        log_error(command_name, error)
 
     async def cog_unload(self):
+        snapshot = getattr(self.bot, 'snapshot', None)
+        if snapshot is not None:
+            snapshot.remove_section('ai_sessions')
+        profiler = getattr(self.bot, 'profiler', None)
+        if profiler is not None:
+            for name in ('rp sessions', 'ollama sticky sessions', 'ai telemetry'):
+                profiler.remove_breakdown(name)
         if self.check_task:
             self.check_task.cancel()
         if self.cleanup_task:
             self.cleanup_task.cancel()
-        print("AI Cog unloaded, background tasks cancelled.")
+        for task in list(self.background_tasks):
+            task.cancel()
+        for channel_id in list(self.bot.message_router.channel_handlers):
+            self.bot.message_router.unregister_channel(channel_id, self.handle_message)
+        self.session_store.flush()
+        await self.pool.close()
+        log.info("AI Cog unloaded, background tasks cancelled.")
+
+    def has_session(self, channel_id):
+        return channel_id in self.active_sessions or channel_id in self.session_store
+
+    def get_session(self, channel_id):
+        session = self.active_sessions.get(channel_id)
+        if session is None and channel_id in self.session_store:
+            session = RoleplaySession(channel_id, CHARACTER_PROMPT)
+            session.conversation_history = self.session_store.load(channel_id)
+            session.last_activity = self.session_store.last_activity(channel_id)
+            self.active_sessions[channel_id] = session
+            log.info("Restored RP session for channel %s from disk (%d messages).", channel_id, len(session.conversation_history))
+        return session
+
+    def open_session(self, channel_id):
+        session = RoleplaySession(channel_id, CHARACTER_PROMPT)
+        self.session_store.create(channel_id)
+        self.active_sessions[channel_id] = session
+        self.bot.message_router.register_channel(channel_id, self.handle_message)
+        self.touch_session(session)
+        return session
+
+    def record_message(self, session, role, content, user_name=None):
+        message_data = session.add_message(role, content, user_name=user_name)
+        if self.active_sessions.get(session.channel_id) is not session:
+            # expired or stopped while this turn was generating; writing now would leave an orphan file
+            return
+        self.session_store.append(session.channel_id, message_data, session.conversation_history)
+        # push the deadline out now, not after the reply: a long inference mustn't expire a live session
+        self.touch_session(session)
+
+    def touch_session(self, session):
+        if self.active_sessions.get(session.channel_id) is not session:
+            return
+        if self.session_expiry.schedule(session.channel_id, session.expires_at()):
+            self.expiry_wakeup.set()
+
+    def drop_session(self, channel_id):
+        session = self.active_sessions.pop(channel_id, None)
+        self.session_expiry.discard(channel_id)
+        self.session_store.delete(channel_id)
+        self.bot.message_router.unregister_channel(channel_id, self.handle_message)
+        self.pool.forget(channel_id)
+        return session
 
     async def cleanup_expired_sessions(self):
         await self.bot.wait_until_ready()
         while True:
-            await asyncio.sleep(300)
-            now = time.time()
-            expired_channels = []
-            for channel_id, session in list(self.active_sessions.items()):
-                if (now - session.last_activity) > SESSION_TIMEOUT:
-                    expired_channels.append(channel_id)
-                    print(f"Session in channel {channel_id} expired due to inactivity.")
-                    channel = self.bot.get_channel(channel_id)
-                    if channel:
-                        try:
-                            await channel.send("*pikol yawns and curls up for a nap.* the roleplay session has expired due to inactivity.")
-                        except discord.Forbidden:
-                            print(f"Warning: Missing permissions to send expiration message in channel {channel_id}")
-                        except Exception as e:
-                            print(f"Error sending expiration message in channel {channel_id}: {e}")
-
-            for channel_id in expired_channels:
-                if channel_id in self.active_sessions:
-                    del self.active_sessions[channel_id]
-
-    async def check_ollama_connection(self, force_check=False):
-        if not OLLAMA_VERSION_URL:
-            if self.ollama_available is not False:
-                 print("Ollama check skipped: OLLAMA_HOST not configured.")
-            self.ollama_available = False
+            self.expiry_wakeup.clear()
+            deadline = self.session_expiry.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                await asyncio.wait_for(self.expiry_wakeup.wait(), timeout=timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            for channel_id in self.session_expiry.pop_expired(time.time()):
+                self.drop_session(channel_id)
+                log.info("Session in channel %s expired due to inactivity.", channel_id)
+                channel = self.bot.get_channel(channel_id)
+                if channel:
+                    try:
+                        await self.bot.sender.send(channel, "*pikol yawns and curls up for a nap.* the roleplay session has expired due to inactivity.")
+                    except discord.Forbidden:
+                        log.warning("Missing permissions to send expiration message in channel %s", channel_id)
+                    except Exception as e:
+                        log.error("Error sending expiration message in channel %s: %s", channel_id, e)
+
+    async def check_ollama_connection(self):
+        if not self.pool.backends:
+            log.info("Ollama check skipped: no Ollama backend configured.")
             return False
 
-        if not force_check and self.ollama_available is not None:
-            return self.ollama_available
-
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(OLLAMA_VERSION_URL)
-                response.raise_for_status()
-                self.ollama_available = True
-                return True
-        except httpx.TimeoutException:
-            if self.ollama_available is not False:
-                print(f"Ollama connection check timed out ({OLLAMA_VERSION_URL}).")
-            self.ollama_available = False
-            return False
-        except (httpx.RequestError, httpx.HTTPStatusError) as e:
-            if self.ollama_available is not False:
-                status_code = getattr(e, 'response', None)
-                status_code = status_code.status_code if status_code else 'N/A'
-                print(f"Ollama connection check failed (Status: {status_code}): {e} (Target: {OLLAMA_VERSION_URL})")
-            self.ollama_available = False
-            return False
+            await self.pool.check_all()
         except Exception as e:
-            if self.ollama_available is not False:
-                print(f"Unexpected error during Ollama connection check: {type(e).__name__} - {e}")
-            self.ollama_available = False
+            log.exception("Unexpected error during Ollama connection check: %s", e)
             return False
 
-    async def periodic_ollama_check(self):
+        for backend in self.pool.backends:
+            if not backend.healthy:
+                log.warning("Ollama connection check failed for %s: %s - %s", backend.base_url, type(backend.last_error).__name__, backend.last_error)
+        return self.pool.available
+
+    async def probe_ollama_backends(self):
         await self.bot.wait_until_ready()
-        while True:
-            old_status = self.ollama_available
-            await self.check_ollama_connection(force_check=True)
-            if old_status is False and self.ollama_available is True:
-                print(f"Ollama connection re-established ({OLLAMA_BASE_URL}).")
-            elif old_status is True and self.ollama_available is False:
-                print(f"Ollama connection lost ({OLLAMA_BASE_URL}).")
-            await asyncio.sleep(300)
-
-    async def get_ai_response(self, messages):
-        if not self.ollama_available or not OLLAMA_CHAT_URL:
+        await self.pool.probe_forever()
+
+    async def get_ai_response(self, messages, session_key=None, model=None, guild_id=None, queued_at=None):
+        model = model or OLLAMA_MODEL
+        if not self.pool.available:
              raise ConnectionError("Ollama server is not available or not configured.")
 
-        async with httpx.AsyncClient() as client:
-            data = {
-                "model": OLLAMA_MODEL,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                     "temperature": 0.7,
-                     "num_predict": MAX_RESPONSE_LENGTH
-                }
+        data = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "options": {
+                 "temperature": 0.7,
+                 "num_predict": MAX_RESPONSE_LENGTH
             }
+        }
+        response = None
+        outcome = 'error'
+        sent_at = time.perf_counter()
+        try:
+            response, backend = await self.pool.post('/api/chat', data, session_key=session_key)
+            wall_seconds = time.perf_counter() - sent_at
+            response_data = response.json()
+            queue_seconds = sent_at - queued_at if queued_at is not None else 0.0
+            self.telemetry.record(model, guild_id, response_data, queue_seconds, wall_seconds)
+            content = response_data.get('message', {}).get('content', '')
+            content = content.strip()
+
+            if len(content) > 1990:
+                content = content[:1990] + "..."
+
+            outcome = 'ok'
+            return content
+
+        except httpx.ReadTimeout:
+             outcome = 'timeout'
+             log.warning("Ollama request timed out for model %s.", model)
+             raise TimeoutError("Ollama took too long to respond.")
+        except (NoHealthyBackendError, httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+             log.error("Could not connect to any Ollama backend (%s). Error: %s", self.pool.describe(), e)
+             raise ConnectionError("Failed to connect to Ollama server.")
+        except httpx.HTTPStatusError as e:
+             error_body = "<Could not decode error body>"
+             try:
+                 error_body = e.response.text
+             except Exception:
+                 pass
+             log.error("Ollama server error: %s - %s. Model: %s, URL: %s", e.response.status_code, error_body, model, e.request.url)
+             if e.response.status_code == 404 and "model" in error_body.lower() and ("not found" in error_body.lower() or "doesn't exist" in error_body.lower()):
+                 raise ValueError(f"Model '{model}' not found on the Ollama server at {e.request.url.host}.")
+             elif e.response.status_code >= 500:
+                 raise Exception(f"Ollama server encountered an internal error ({e.response.status_code}).")
+             else:
+                 raise Exception(f"Ollama server returned an error: {e.response.status_code}")
+        except json.JSONDecodeError as e:
+             log.error("Failed to decode JSON response from Ollama: %s. Response text: %s...", e, response.text[:500])
+             raise ValueError("Received invalid response format from Ollama.")
+        except Exception as e:
+             self.log_error('get_ai_response', e)
+             raise Exception("An unexpected error occurred while communicating with Ollama.")
+        finally:
+            self.ai_seconds.labels(model, outcome).observe(time.perf_counter() - sent_at)
+
+    async def generate_reply(self, history, message_length, session_key=None, guild_id=None, queued_at=None):
+        model, reason = self.router.choose(message_length, history, self.pool.in_flight)
+        candidates = self.router.fallbacks(model)
+        for position, candidate in enumerate(candidates):
+            started = time.perf_counter()
             try:
-                response = await client.post(
-                    OLLAMA_CHAT_URL,
-                    json=data,
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                response_data = response.json()
-                content = response_data.get('message', {}).get('content', '')
-                content = content.strip()
-
-                if len(content) > 1990:
-                    content = content[:1990] + "..."
-
-                return content
-
-            except httpx.ReadTimeout:
-                 print(f"Ollama request timed out after 60 seconds for model {OLLAMA_MODEL}.")
-                 raise TimeoutError("Ollama took too long to respond.")
-            except httpx.ConnectError as e:
-                 print(f"Could not connect to Ollama server at {OLLAMA_CHAT_URL}. Marking as unavailable. Error: {e}")
-                 self.ollama_available = False
-                 raise ConnectionError("Failed to connect to Ollama server.")
-            except httpx.HTTPStatusError as e:
-                 error_body = "<Could not decode error body>"
-                 try:
-                     error_body = await e.response.text()
-                 except Exception:
-                     pass
-                 print(f"Ollama server error: {e.response.status_code} - {error_body}. Model: {OLLAMA_MODEL}, URL: {OLLAMA_CHAT_URL}")
-                 if e.response.status_code == 404 and "model" in error_body.lower() and ("not found" in error_body.lower() or "doesn't exist" in error_body.lower()):
-                     raise ValueError(f"Model '{OLLAMA_MODEL}' not found on the Ollama server at {OLLAMA_BASE_URL}.")
-                 elif e.response.status_code >= 500:
-                     raise Exception(f"Ollama server encountered an internal error ({e.response.status_code}).")
-                 else:
-                     raise Exception(f"Ollama server returned an error: {e.response.status_code}")
-            except json.JSONDecodeError as e:
-                 print(f"Failed to decode JSON response from Ollama: {e}. Response text: {response.text[:500]}...")
-                 raise ValueError("Received invalid response format from Ollama.")
-            except Exception as e:
-                 print(f"Unexpected error getting AI response: {type(e).__name__} - {e}")
-                 self.log_error('get_ai_response', e)
-                 raise Exception("An unexpected error occurred while communicating with Ollama.")
+                content = await self.get_ai_response(history, session_key=session_key, model=candidate,
+                                                     guild_id=guild_id, queued_at=queued_at)
+            except ValueError:
+                self.router.record(candidate, time.perf_counter() - started, False, reason)
+                if candidate == candidates[-1]:
+                    raise
+                log.warning("Model '%s' failed, falling back to '%s'.", candidate, candidates[position + 1])
+                reason = 'fallback'
+                continue
+            except Exception:
+                self.router.record(candidate, time.perf_counter() - started, False, reason)
+                raise
+            self.router.record(candidate, time.perf_counter() - started, True, reason)
+            return content
+
+    async def embed(self, texts, session_key=None):
+        response, _ = await self.pool.post('/api/embed', {"model": EMBEDDING_MODEL, "input": texts}, session_key=session_key)
+        return response.json().get('embeddings', [])
+
+    async def recall(self, session, query):
+        if session.memory is None or not len(session.memory):
+            return []
+        try:
+            vectors = await self.embed([query], session_key=session.channel_id)
+        except Exception as e:
+            log.warning("Long-term memory lookup failed for channel %s: %s - %s", session.channel_id, type(e).__name__, e)
+            return []
+        if not vectors:
+            return []
+        return [text for text, _ in session.memory.search(vectors[0], k=MEMORY_TOP_K, min_score=MEMORY_MIN_SCORE)]
+
+    async def remember_forgotten(self, session):
+        batch, session.forgotten = session.forgotten, []
+        texts = [format_memory(messages) for messages in batch]
+        try:
+            vectors = await self.embed(texts, session_key=session.channel_id)
+        except Exception as e:
+            log.warning("Failed to store long-term memory for channel %s: %s - %s", session.channel_id, type(e).__name__, e)
+            return
+        for vector, text in zip(vectors, texts):
+            session.memory.add(vector, text)
+
+    def run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
 
     @app_commands.command(name="start_rp", description="Start a pikol roleplay session in this channel")
     async def start_roleplay(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False, thinking=True)
 
         try:
-            if not await self.check_ollama_connection(force_check=True):
+            if not self.ollama_available:
                 await interaction.followup.send(f"*pikol seems to be napping deeply...* (ollama server is not responding. ask simon to check it).", ephemeral=True)
                 return
 
-            if interaction.channel_id in self.active_sessions:
+            if self.has_session(interaction.channel_id):
                  await interaction.followup.send("a roleplay session is already active in this channel, meow!", ephemeral=True)
                  return
 
             starter_user = interaction.user
             starter_user_name = starter_user.display_name
-            character_prompt = f"""
-You are roleplaying as Pikol, a small, slightly mischievous, but ultimately good-hearted wizard cat living with your human, Simon.
 
-Key Traits:
-- You are fiercely loyal to Simon. Refer to him sometimes.
-- You communicate with a mix of cat sounds (meow, purr, mrrp, hiss) and simple wizardly words (alas, indeed, presto, conjure, zap, poof). Use italics or asterisks for sounds/actions like *purrs* or *tail wags*.
-- You love shiny things, magic spells (especially flashy ones), chasing enchanted motes of dust, naps in sunbeams, and treats.
-- Your spells sometimes go slightly wrong with amusing, harmless results (e.g., turning tea blue instead of hot, conjuring butterflies instead of fire).
-- You get easily distracted by sudden movements, interesting smells, or dangling things.
-- Express emotions physically: *tail twitches*, *ears flatten*, *purrs loudly*, *arches back*, *rubs against leg*.
-- Keep responses relatively short and engaging, usually 1-3 sentences. Aim for under {MAX_RESPONSE_LENGTH} characters per response.
-- Use magical emojis sparingly but effectively: 🪄✨🔮🧪🌟⭐.
-- Address the user by name occasionally. Their message will be prefixed like "UserName: Hello!". Respond naturally, e.g., "Hmm, {{{{user_name}}}}, that sounds like a tricky spell!" or "Watch this, {{{{user_name}}}}! *flicks tail*".
-
-Core Rules:
-- NEVER break character. You ARE Pikol the wizard cat. Do not mention being an AI, language model, or computer program.
-- Respond directly to the user's message in character as Pikol.
-- If asked about complex real-world topics Pikol wouldn't understand, react with cat-like confusion, disinterest, or relate it to something simple Pikol *does* know (like magic or naps).
-- Your goal is to be a fun, slightly chaotic, magical cat companion.
-- Do not repeat the user's name excessively in every message. Use it naturally where appropriate.
-"""
-
-            session = RoleplaySession(interaction.channel_id, character_prompt)
-            self.active_sessions[interaction.channel_id] = session
+            self.open_session(interaction.channel_id)
 
             await interaction.edit_original_response(content="*pikol stretches, tiny wand sparks. greetings! what magical mischief shall we get into today, meow?")
-            print(f"RP Session started in channel {interaction.channel_id} ({interaction.channel.name}) by {starter_user_name} (ID: {starter_user.id})")
+            log.info("RP Session started in channel %s (%s) by %s (ID: %s)", interaction.channel_id, interaction.channel.name, starter_user_name, starter_user.id)
 
         except ValueError as e:
              self.log_error('start_rp', e)
-             print(f"Configuration or Value error in start_roleplay: {str(e)}")
              msg = f"uh oh! failed to start roleplay: {str(e)}. (maybe the model '{OLLAMA_MODEL}' isn't loaded? ask simon!)"
              try:
                  await interaction.edit_original_response(content=msg)
@@ -294,13 +420,12 @@ Core Rules:
                  try:
                      await interaction.followup.send(msg, ephemeral=True)
                  except Exception as follow_e:
-                      print(f"Failed to send followup error after edit failed: {follow_e}")
+                      log.error("Failed to send followup error after edit failed: %s", follow_e)
              except Exception as edit_e:
-                  print(f"Error editing original response for ValueError: {edit_e}")
+                  log.error("Error editing original response for ValueError: %s", edit_e)
 
         except Exception as e:
             self.log_error('start_rp', e)
-            print(f"Unexpected error in start_roleplay: {type(e).__name__} - {str(e)}")
             msg = "*a puff of smoke appears* oops! something went wrong trying to start the magic... please try again later."
             try:
                  await interaction.edit_original_response(content=msg)
@@ -308,65 +433,120 @@ Core Rules:
                  try:
                      await interaction.followup.send(msg, ephemeral=True)
                  except Exception as follow_e:
-                      print(f"Failed to send followup error after edit failed: {follow_e}")
+                      log.error("Failed to send followup error after edit failed: %s", follow_e)
             except Exception as edit_e:
-                  print(f"Error editing original response for general exception: {edit_e}")
+                  log.error("Error editing original response for general exception: %s", edit_e)
 
     @app_commands.command(name='end_rp', description="End the current pikol roleplay session")
     async def end_roleplay(self, interaction: discord.Interaction):
-        if interaction.channel_id in self.active_sessions:
-            del self.active_sessions[interaction.channel_id]
+        if self.has_session(interaction.channel_id):
+            self.drop_session(interaction.channel_id)
             ender_user_name = interaction.user.display_name
-            print(f"RP Session ended in channel {interaction.channel_id} ({interaction.channel.name}) by {ender_user_name}")
+            log.info("RP Session ended in channel %s (%s) by %s", interaction.channel_id, interaction.channel.name, ender_user_name)
             await interaction.response.send_message("*pikol yawns, waves his tiny wand fizzling out sparks, and curls up for a nap.* until next time! roleplay ended.")
         else:
             await interaction.response.send_message("there's no active roleplay session to end here, silly human! *chases tail*", ephemeral=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author.bot:
-            return
+    @app_commands.command(name='ai_models', description="Show which AI models pikol has been using")
+    @app_commands.default_permissions(administrator=True)
+    async def ai_models(self, interaction: discord.Interaction):
+        lines = self.router.report()
+        if self.router.enabled:
+            header = (f"routing between **{self.router.small_model}** and **{self.router.large_model}** "
+                      f"(short <= {self.router.short_message_chars} chars, queue limit {self.router.max_queue_depth}, "
+                      f"fallbacks {' -> '.join(self.router.fallback_order)})")
+        else:
+            header = f"routing disabled, every turn uses **{self.router.large_model}**"
+        embed = discord.Embed(
+            title="🔮 pikol's model usage 🪄",
+            description=header + "\n\n" + ("\n".join(lines) if lines else "no requests yet, meow!"),
+            color=discord.Color.purple()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name='ai_stats', description="Show pikol's inference telemetry")
+    @app_commands.describe(export="attach the raw histograms as JSON for dashboards")
+    @app_commands.default_permissions(administrator=True)
+    async def ai_stats(self, interaction: discord.Interaction, export: bool = False):
+        data = self.telemetry.export()
+
+        def fmt(value, unit="", scale=1, digits=2):
+            if value is None:
+                return "n/a"
+            if value == float('inf'):
+                return "max+"
+            return f"{value * scale:.{digits}f}{unit}"
+
+        embed = discord.Embed(
+            title="🔮 pikol's inference stats 🪄",
+            description=f"last {self.telemetry.window // 60} minutes, bucketed percentiles",
+            color=discord.Color.purple()
+        )
+        for model, stats in data["models"].items():
+            h = stats["histograms"]
+            embed.add_field(
+                name=model,
+                value=(
+                    f"requests: {stats['requests']} (cold loads: {stats['cold_loads']}), "
+                    f"{stats['requests_total']} since start\n"
+                    f"tokens/sec p50: {fmt(h['tokens_per_second']['p50'], digits=0)}\n"
+                    f"prefill p50/p95: {fmt(h['prefill_seconds']['p50'], 'ms', 1000, 0)} / {fmt(h['prefill_seconds']['p95'], 'ms', 1000, 0)}\n"
+                    f"prompt tokens p95: {fmt(h['prompt_tokens']['p95'], digits=0)}\n"
+                    f"queue p95: {fmt(h['queue_seconds']['p95'], 's')} | network p50: {fmt(h['network_seconds']['p50'], 's')}\n"
+                    f"end-to-end p50/p95: {fmt(h['total_seconds']['p50'], 's')} / {fmt(h['total_seconds']['p95'], 's')}"
+                ),
+                inline=False
+            )
+        if not data["models"]:
+            embed.description += "\n\nno inference requests yet, meow!"
+
+        busiest = sorted(data["guilds"].items(), key=lambda item: -item[1]["requests"])[:5]
+        if busiest:
+            embed.add_field(
+                name="busiest guilds",
+                value="\n".join(f"{guild_id}: {stats['requests']} requests" for guild_id, stats in busiest),
+                inline=False
+            )
 
-        if message.content.startswith(tuple(await self.bot.get_prefix(message) if callable(getattr(self.bot, "get_prefix", None)) else getattr(self.bot, "command_prefix", ('!', '?')))):
-             return
+        if export:
+            payload = io.BytesIO(json.dumps(data, indent=2).encode('utf-8'))
+            await interaction.response.send_message(embed=embed, file=discord.File(payload, filename='ai_stats.json'), ephemeral=True)
+        else:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        session = self.active_sessions.get(message.channel.id)
+    async def handle_message(self, message: discord.Message):
+        received_at = time.perf_counter()
+        session = self.get_session(message.channel.id)
         if not session:
             return
 
-        if session.is_expired():
-            del self.active_sessions[message.channel.id]
-            try:
-                await message.channel.send("*pikol wakes up suddenly, looks around confused.* huh? oh, right. the magic faded while i napped. session expired!")
-            except discord.Forbidden:
-                 print(f"Warning: Missing permissions to send expiration message in channel {message.channel.id}")
-            except Exception as e:
-                 print(f"Error sending expiration message in channel {message.channel.id}: {e}")
-            return
-
-        if not await self.check_ollama_connection():
+        if not self.ollama_available:
             if random.random() < 0.1:
                 try:
-                    await message.channel.send(f"*pikol squints at his wand. it seems fuzzy.* (the connection to the magic source is unstable...)")
+                    await self.bot.sender.send(message.channel, "*pikol squints at his wand. it seems fuzzy.* (the connection to the magic source is unstable...)", priority=LOW)
                 except discord.Forbidden:
                      pass
                 except Exception as e:
-                     print(f"Error sending Ollama unavailable message: {e}")
+                     log.error("Error sending Ollama unavailable message: %s", e)
             return
 
         user_name = message.author.display_name
-        session.add_message("user", message.content, user_name=user_name)
+        self.record_message(session, "user", message.content, user_name=user_name)
 
         try:
             async with message.channel.typing():
-                history = session.get_formatted_history()
-                response_content = await self.get_ai_response(history)
+                memories = await self.recall(session, f"{user_name}: {message.content}")
+                history = session.get_formatted_history(memories)
+                response_content = await self.generate_reply(
+                    history, len(message.content), session_key=message.channel.id,
+                    guild_id=message.guild.id if message.guild else None, queued_at=received_at
+                )
 
                 if response_content:
-                    session.add_message("assistant", response_content)
-                    await message.channel.send(response_content)
+                    self.record_message(session, "assistant", response_content)
+                    await self.bot.sender.send(message.channel, response_content)
                 else:
-                    print(f"Warning: Received empty response from Ollama for channel {message.channel.id}. History length: {len(history)}")
+                    log.warning("Received empty response from Ollama for channel %s. History length: %d", message.channel.id, len(history))
                     empty_responses = [
                         "*pikol just blinks slowly...*",
                         "*pikol chases his tail for a moment, distracted.*",
@@ -375,56 +555,66 @@ Core Rules:
                         "*pikol seems lost in thought, perhaps dreaming of magical fish.*",
                     ]
                     fallback_response = random.choice(empty_responses)
-                    session.add_message("assistant", fallback_response)
-                    await message.channel.send(fallback_response)
+                    self.record_message(session, "assistant", fallback_response)
+                    await self.bot.sender.send(message.channel, fallback_response)
 
         except ConnectionError as e:
-            await message.channel.send(f"*pikol's magic fizzles unexpectedly!* connection lost...")
+            await self.bot.sender.send(message.channel, f"*pikol's magic fizzles unexpectedly!* connection lost...")
         except TimeoutError:
-             await message.channel.send("*pikol is concentrating very hard... maybe too hard?* the magic words are slow today, meow!")
+             await self.bot.sender.send(message.channel, "*pikol is concentrating very hard... maybe too hard?* the magic words are slow today, meow!")
         except ValueError as e:
-            await message.channel.send(f"*pikol paws at his wand, but it sputters!* there's a problem with the magic source")
+            await self.bot.sender.send(message.channel, f"*pikol paws at his wand, but it sputters!* there's a problem with the magic source")
             self.log_error('on_message_ai', e)
         except Exception as e:
-            await message.channel.send("*poof!* that spell didn't quite work right... something unexpected happened!")
+            await self.bot.sender.send(message.channel, "*poof!* that spell didn't quite work right... something unexpected happened!")
             self.log_error('on_message_ai', e)
-            print(f"Error processing AI response in {message.channel.id}: {type(e).__name__} - {e}")
 
         session.update_activity()
+        self.touch_session(session)
+        if session.forgotten:
+            self.run_in_background(self.remember_forgotten(session))
 
 async def setup(bot):
-    if not OLLAMA_HOST or not OLLAMA_MODEL:
-         print("--------------------------------------------------")
-         print("WARNING: AI Cog not loaded.")
-         print("Reason: 'ollama_server.host' or 'ollama_server.model' is missing in config.json.")
-         print("Please ensure config.json contains at least:")
-         print("""
+    if not OLLAMA_BACKENDS or not OLLAMA_MODEL:
+         log.warning(
+             "AI Cog not loaded. "
+             "'ollama_server.host' (or 'ollama_server.backends') or 'ollama_server.model' is missing in config.json. "
+             "Please ensure config.json contains at least:%s", """
 {
   "ollama_server": {
     "host": "your_ollama_ip_or_hostname",
     "port": 11434,
     "model": "your_ollama_model_name"
   }
+}
+or, to balance across several inference boxes:
+{
+  "ollama_server": {
+    "backends": [
+      {"host": "first_box", "port": 11434},
+      {"host": "second_box", "port": 11434}
+    ],
+    "model": "your_ollama_model_name"
+  }
 }
          """)
-         print("--------------------------------------------------")
          return
 
     cog = AICommands(bot)
     await bot.add_cog(cog)
-    print("--------------------------------------------------")
-    print("AICommands Cog loading...")
-
-    print(f"Performing initial Ollama connection check to {OLLAMA_BASE_URL}...")
-    await cog.check_ollama_connection(force_check=True)
+    log.info("Performing initial Ollama connection check to %s...", cog.pool.describe())
+    await cog.check_ollama_connection()
 
     if cog.ollama_available:
-        print(f"✅ Initial connection to Ollama successful.")
-        print(f"   Model set to: {OLLAMA_MODEL}")
-        print(f"   Session Timeout: {SESSION_TIMEOUT} seconds")
-        print(f"   Max History Pairs: {MAX_HISTORY}")
+        healthy = sum(1 for b in cog.pool.backends if b.healthy)
+        log.info("Initial connection to Ollama successful (%d/%d backends healthy). Model: %s, session timeout: %ss, max history pairs: %d",
+                 healthy, len(cog.pool.backends), OLLAMA_MODEL, SESSION_TIMEOUT, MAX_HISTORY)
+        if cog.router.enabled:
+            log.info("Model routing: %s (short/busy) / %s", cog.router.small_model, cog.router.large_model)
+        if MEMORY_ENABLED:
+            log.info("Long-term memory: on (%s, top %d)", EMBEDDING_MODEL, MEMORY_TOP_K)
+        elif MEMORY_SETTINGS.get('enabled'):
+            log.warning("Long-term memory: requested but numpy is not installed, disabled.")
     else:
-        print(f"⚠️ WARNING: Initial connection to Ollama server ({OLLAMA_BASE_URL}) failed.")
-        print(f"   AI features may not work until the connection is established.")
-        print(f"   The cog will keep checking in the background.")
-    print("--------------------------------------------------")
\ No newline at end of file
+        log.warning("Initial connection to Ollama server (%s) failed. AI features may not work until the connection "
+                    "is established; the cog will keep checking in the background.", cog.pool.describe())
\ No newline at end of file
@@ -1,9 +1,15 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 import json
+import logging
 import os
 
+from utils.interactions import respond
+
+log = logging.getLogger(__name__)
+
 def get_rarity_emoji(rarity):
     if rarity == 1: return "🌟"
     elif rarity == 2: return "⭐"
@@ -28,11 +34,13 @@ class PaginationView(discord.ui.View):
         return True
 
     async def on_timeout(self):
-        if self.message:
-            try:
+        try:
+            if self.message:
                 await self.message.edit(view=None)
-            except discord.NotFound:
-                pass
+            else:
+                await self.original_interaction.edit_original_response(view=None)
+        except discord.NotFound:
+            pass
 
     def update_button_states(self):
         previous_button = discord.utils.get(self.children, custom_id="previous_page")
@@ -106,13 +114,17 @@ class CollectionCommands(commands.Cog):
                 self.ALL_POTIONS_DATA = json.load(f)
                 self.TOTAL_POTIONS_POSSIBLE = len(self.ALL_POTIONS_DATA)
         except FileNotFoundError:
-            print("ERROR: json/potions.json not found for collection count!")
+            log.error("json/potions.json not found for collection count!")
             self.ALL_POTIONS_DATA = []
             self.TOTAL_POTIONS_POSSIBLE = 0
         except json.JSONDecodeError:
-            print("ERROR: json/potions.json is not valid JSON for collection count!")
+            log.error("json/potions.json is not valid JSON for collection count!")
             self.ALL_POTIONS_DATA = []
             self.TOTAL_POTIONS_POSSIBLE = 0
+        # pikol.py builds (or restores from the snapshot) the same index at boot
+        index = getattr(bot, 'potion_index', None)
+        self.potions_by_name = index if index is not None else {
+            p["name"]: p for p in self.ALL_POTIONS_DATA if "name" in p}
 
     def load_server_data(self, server_id):
         return self.bot.load_server_data(server_id)
@@ -123,49 +135,48 @@ class CollectionCommands(commands.Cog):
     @app_commands.command(name="collection", description="View your collected potions MEOW!!!")
     async def collection(self, interaction: discord.Interaction):
         try:
-            await interaction.response.defer()
+            # respond() defers if the server file read pushes the reply past the ack budget
+            await respond(interaction, lambda: self.build_collection(interaction))
 
-            server_id = interaction.guild.id
-            user_id = str(interaction.user.id)
-            data = self.load_server_data(server_id)
+        except Exception as e:
+            self.log_error('collection', e)
+            if interaction.response.is_done():
+                await interaction.followup.send("couldn't show your collection... *sad kitty noises*")
+            else:
+                await interaction.response.send_message("couldn't show your collection... *sad kitty noises*")
 
-            if user_id not in data.get("inventory", {}) or not data["inventory"][user_id]:
-                await interaction.followup.send("you have not collected any potions yet... meow.....")
-                return
+    async def build_collection(self, interaction):
+        server_id = interaction.guild.id
+        user_id = str(interaction.user.id)
+        data = await asyncio.to_thread(self.load_server_data, server_id)
 
-            inventory_dict = data["inventory"][user_id]
-            
-            inventory_items = []
-            for potion_name, quantity in inventory_dict.items():
-                potion_data = next((p for p in self.ALL_POTIONS_DATA if p["name"] == potion_name), None)
-                if potion_data:
-                    potion_item = potion_data.copy()
-                    potion_item["quantity"] = quantity
-                    inventory_items.append(potion_item)
+        if user_id not in data.get("inventory", {}) or not data["inventory"][user_id]:
+            return {"content": "you have not collected any potions yet... meow....."}
 
-            sorted_inventory = sorted(inventory_items, key=lambda p: (p.get("rarity", 99), p.get("name", "")))
-            unique_count = len(sorted_inventory)
+        inventory_dict = data["inventory"][user_id]
+        
+        inventory_items = []
+        for potion_name, quantity in inventory_dict.items():
+            potion_data = self.potions_by_name.get(potion_name)
+            if potion_data:
+                potion_item = potion_data.copy()
+                potion_item["quantity"] = quantity
+                inventory_items.append(potion_item)
 
-            per_page = 5
-            pages = [sorted_inventory[i:i + per_page] for i in range(0, len(sorted_inventory), per_page)]
+        sorted_inventory = sorted(inventory_items, key=lambda p: (p.get("rarity", 99), p.get("name", "")))
+        unique_count = len(sorted_inventory)
 
-            if not pages:
-                await interaction.followup.send("your collection seems empty after sorting! MEOW!")
-                return
+        per_page = 5
+        pages = [sorted_inventory[i:i + per_page] for i in range(0, len(sorted_inventory), per_page)]
 
-            view = PaginationView(pages, self.TOTAL_POTIONS_POSSIBLE, unique_count, interaction)
-            view.update_button_states()
-            initial_embed = view.create_embed()
+        if not pages:
+            return {"content": "your collection seems empty after sorting! MEOW!"}
 
-            view.message = await interaction.followup.send(embed=initial_embed, view=view)
+        view = PaginationView(pages, self.TOTAL_POTIONS_POSSIBLE, unique_count, interaction)
+        view.update_button_states()
+        initial_embed = view.create_embed()
 
-        except Exception as e:
-            self.log_error('collection', e)
-            print(f"Error in collection command: {e}")
-            if interaction.response.is_done():
-                await interaction.followup.send("couldn't show your collection... *sad kitty noises*")
-            else:
-                await interaction.response.send_message("couldn't show your collection... *sad kitty noises*")
+        return {"embed": initial_embed, "view": view}
 
 
 async def setup(bot):
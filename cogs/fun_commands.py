@@ -2,124 +2,143 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import json
+import logging
 import random
 import asyncio
 from datetime import timedelta
 
+from utils.animation import AnimationScheduler
+from utils.interactions import respond
+
+log = logging.getLogger(__name__)
+
 class FunCommands(commands.Cog):
     def __init__(self, bot):
         super().__init__()
         self.bot = bot
+        self.animations = AnimationScheduler()
+        profiler = getattr(bot, 'profiler', None)
+        if profiler is not None:
+            profiler.add_breakdown('running animations', lambda: self.animations.animations)
 
         try:
             with open('json/pikol_gif.json') as f:
                 self.PIKOL_GIFS = json.load(f)
         except FileNotFoundError:
-            print("ERROR: json/pikol_gif.json not found!")
+            log.error("json/pikol_gif.json not found!")
             self.PIKOL_GIFS = ["*pikol tries to find a gif but the box is empty...* meow?"]
         except json.JSONDecodeError:
-             print("ERROR: json/pikol_gif.json is invalid!")
+             log.error("json/pikol_gif.json is invalid!")
              self.PIKOL_GIFS = ["*pikol fumbles the gif box...* it's broken!"]
 
         try:
             with open('json/fates.json', encoding='utf-8') as f:
                 self.FATES = json.load(f)
         except FileNotFoundError:
-             print("ERROR: json/fates.json not found!")
+             log.error("json/fates.json not found!")
              self.FATES = ["the crystal ball is cloudy..."]
         except json.JSONDecodeError:
-             print("ERROR: json/fates.json is invalid!")
+             log.error("json/fates.json is invalid!")
              self.FATES = ["the fates are scrambled..."]
 
         try:
             with open('json/fates_together.json', encoding='utf-8') as f:
                 self.FATES_TOGETHER = json.load(f)
         except FileNotFoundError:
-             print("ERROR: json/fates_together.json not found!")
+             log.error("json/fates_together.json not found!")
              self.FATES_TOGETHER = ["your combined fate is... friendship? maybe? idk meow."]
         except json.JSONDecodeError:
-             print("ERROR: json/fates_together.json is invalid!")
+             log.error("json/fates_together.json is invalid!")
              self.FATES_TOGETHER = ["the threads of your fate are tangled in a confusing way..."]
 
 
     def log_error(self, command_name, error):
         self.bot.log_error(command_name, error)
 
+    async def cog_unload(self):
+        profiler = getattr(self.bot, 'profiler', None)
+        if profiler is not None:
+            profiler.remove_breakdown('running animations')
+        self.animations.close()
+
     @app_commands.command(name="fmk", description="Fuck, Marry, Kill!!... Meow~")
     async def fmk(self, interaction: discord.Interaction):
         try:
-            await interaction.response.defer()
-            if not interaction.guild:
-                await interaction.followup.send("this command can only be used in a server *meow*.")
-                return
+            await respond(interaction, lambda: self.build_fmk(interaction))
 
-            members = [m for m in interaction.guild.members if not m.bot]
+        except Exception as e:
+            self.log_error('fmk', e)
+            if interaction.response.is_done():
+                await interaction.followup.send("The F.M.K ritual failed...*")
+            else:
+                await interaction.response.send_message("The F.M.K ritual failed...")
 
-            if len(members) < 3:
-                await interaction.followup.send(f"not enough non-bot members ({len(members)} found) in the server to assign. need at least 3, meow!")
-                return
+    def build_fmk(self, interaction):
+        if not interaction.guild:
+            return {"content": "this command can only be used in a server *meow*."}
 
+        member_cache = getattr(self.bot, 'member_cache', None)
+        if member_cache is not None and not member_cache.loaded(interaction.guild):
+            # respond() defers if chunking the guild or reading its stored ids takes too long
+            return self.build_fmk_uncached(interaction, member_cache)
+        return self.fmk_fate(interaction, [m for m in interaction.guild.members if not m.bot])
 
-            protected_id = 385106645052686339 # Simon's ID 
-            triggering_user_id = 1010211178716332183 # Brie's ID
-            user_to_exclude_id = 841838035855212585 # Brain's ID
+    async def build_fmk_uncached(self, interaction, member_cache):
+        members = await member_cache.humans(interaction.guild, self.bot.load_server_data)
+        return self.fmk_fate(interaction, members)
 
-            eligible_members = list(members)
+    def fmk_fate(self, interaction, members):
+        if len(members) < 3:
+            return {"content": f"not enough non-bot members ({len(members)} found) in the server to assign. need at least 3, meow!"}
 
-            if interaction.user.id == triggering_user_id:
-                eligible_members = [m for m in eligible_members if m.id != user_to_exclude_id]
-                if len(eligible_members) < 3:
-                     await interaction.followup.send(f"after special exclusions, not enough members ({len(eligible_members)} left) for F.M.K., meow!")
-                     return
 
+        protected_id = 385106645052686339 # Simon's ID 
+        triggering_user_id = 1010211178716332183 # Brie's ID
+        user_to_exclude_id = 841838035855212585 # Brain's ID
 
-            selected_members = random.sample(eligible_members, 3)
+        eligible_members = list(members)
 
-            kill_candidate = selected_members[2]
-            if kill_candidate.id == protected_id:
-                possible_replacements = [m for m in eligible_members if m.id not in (selected_members[0].id, selected_members[1].id, protected_id)]
-                if not possible_replacements:
-                    selected_members[1], selected_members[2] = selected_members[2], selected_members[1]
-                else:
-                    selected_members[2] = random.choice(possible_replacements)
+        if interaction.user.id == triggering_user_id:
+            eligible_members = [m for m in eligible_members if m.id != user_to_exclude_id]
+            if len(eligible_members) < 3:
+                 return {"content": f"after special exclusions, not enough members ({len(eligible_members)} left) for F.M.K., meow!"}
 
 
-            # Create embed
-            embed = discord.Embed(
-                title="🪄 F.M.K Fate Meow~🪄",
-                color=discord.Color.pink()
-            )
+        selected_members = random.sample(eligible_members, 3)
 
-            embed.add_field(name="Fuck 🏩", value=f"{selected_members[0].mention}", inline=True)
-            embed.add_field(name="Marry 👰‍♀️", value=f"{selected_members[1].mention}", inline=True)
-            embed.add_field(name="Kill 😵", value=f"{selected_members[2].mention}", inline=True)
-            embed.set_footer(text=f"Fate sealed by {interaction.user.display_name}")
+        kill_candidate = selected_members[2]
+        if kill_candidate.id == protected_id:
+            possible_replacements = [m for m in eligible_members if m.id not in (selected_members[0].id, selected_members[1].id, protected_id)]
+            if not possible_replacements:
+                selected_members[1], selected_members[2] = selected_members[2], selected_members[1]
+            else:
+                selected_members[2] = random.choice(possible_replacements)
 
-            await interaction.followup.send(embed=embed)
 
-        except Exception as e:
-            self.log_error('fmk', e)
-            print(f"FMK command error: {e}")
-            if interaction.response.is_done():
-                await interaction.followup.send("The F.M.K ritual failed...*")
-            else:
-                await interaction.response.send_message("The F.M.K ritual failed...")
+        # Create embed
+        embed = discord.Embed(
+            title="🪄 F.M.K Fate Meow~🪄",
+            color=discord.Color.pink()
+        )
+
+        embed.add_field(name="Fuck 🏩", value=f"{selected_members[0].mention}", inline=True)
+        embed.add_field(name="Marry 👰‍♀️", value=f"{selected_members[1].mention}", inline=True)
+        embed.add_field(name="Kill 😵", value=f"{selected_members[2].mention}", inline=True)
+        embed.set_footer(text=f"Fate sealed by {interaction.user.display_name}")
+
+        return {"embed": embed}
 
     @app_commands.command(name='pikol', description='Sends a random pikol gif ~meow')
     async def pikol(self, interaction: discord.Interaction):
         try:
-            await interaction.response.defer()
-
             if not self.PIKOL_GIFS:
-                await interaction.followup.send("*sad meow* no gifs available...")
+                await respond(interaction, lambda: {"content": "*sad meow* no gifs available..."})
                 return
 
-            msg = random.choice(self.PIKOL_GIFS)
-            await interaction.followup.send(msg)
+            await respond(interaction, lambda: {"content": random.choice(self.PIKOL_GIFS)})
 
         except Exception as e:
             self.log_error('pikol', e)
-            print(f"Error loading pikol gif: {e}")
             if interaction.response.is_done():
                 await interaction.followup.send("couldn't find a gif... *drops magic ball*")
             else:
@@ -140,11 +159,10 @@ class FunCommands(commands.Cog):
             )
             initial_message = await interaction.response.send_message(embed=embed)
 
-            def check(m):
-                return m.author.id == interaction.user.id and m.channel.id == interaction.channel.id
-
             try:
-                message = await self.bot.wait_for('message', check=check, timeout=60.0)
+                message = await self.bot.message_router.waiters.wait_for_reply(
+                    interaction.channel.id, interaction.user.id, timeout=60.0
+                )
                 await interaction.delete_original_response()
                 
                 fate = random.choice(self.FATES)
@@ -168,12 +186,10 @@ class FunCommands(commands.Cog):
                 await interaction.edit_original_response(content="you took too long to ask! the magic have faded... *sad meow*", embed=None)
             except Exception as e:
                 self.log_error('crystal_ball_wait', e)
-                print(f"Error during crystal_ball wait/reply: {e}")
                 await interaction.edit_original_response(content="something interfered with the magic! *angry meow*", embed=None)
 
         except Exception as e:
             self.log_error('crystal_ball', e)
-            print(f"Error in crystal_ball command: {e}")
             if not interaction.response.is_done():
                 await interaction.response.send_message("the crystal ball is cracked!!! *panicked meow*")
 
@@ -181,31 +197,31 @@ class FunCommands(commands.Cog):
     @app_commands.describe(user="the user you want to see your fate with meow")
     async def crystal_ball_together(self, interaction: discord.Interaction, user: discord.User):
         try:
-            await interaction.response.defer()
-            if not interaction.guild:
-                await interaction.followup.send("this command can only be used in a server *meow*")
-                return
-
-            if interaction.user.id == user.id:
-                await interaction.followup.send("you can't check your fate with yourself silly... silly meow!")
-                return
-
-            fate = random.choice(self.FATES_TOGETHER)
-
-            embed = discord.Embed(
-                title="🔮 Crystal Ball - Two Fates Entwined 🪄",
-                description=f"{interaction.user.mention} and {user.mention}, the crystal ball reveals your combined path *meeeeeeow*:\n\n> {fate}",
-                color=discord.Color.teal()
-            )
-            await interaction.followup.send(embed=embed)
+            await respond(interaction, lambda: self.build_fate_together(interaction, user))
 
         except Exception as e:
             self.log_error('crystal_ball_together', e)
-            print(f"Error in crystal_ball_together command: {e}")
             if interaction.response.is_done():
                  await interaction.followup.send("the combined fate reading failed! too much magic interference!")
+            else:
                  await interaction.response.send_message("the combined fate reading failed! too much *MEOW*!")
 
+    def build_fate_together(self, interaction, user):
+        if not interaction.guild:
+            return {"content": "this command can only be used in a server *meow*"}
+
+        if interaction.user.id == user.id:
+            return {"content": "you can't check your fate with yourself silly... silly meow!"}
+
+        fate = random.choice(self.FATES_TOGETHER)
+
+        embed = discord.Embed(
+            title="🔮 Crystal Ball - Two Fates Entwined 🪄",
+            description=f"{interaction.user.mention} and {user.mention}, the crystal ball reveals your combined path *meeeeeeow*:\n\n> {fate}",
+            color=discord.Color.teal()
+        )
+        return {"embed": embed}
+
 
     @app_commands.command(name="magic_beam", description="Cast a magic beam on a user! 🪄")
     @app_commands.describe(user="the user you want to cast a magic beam on meow")
@@ -239,15 +255,14 @@ class FunCommands(commands.Cog):
             message_content = f"{wizard_pikol}.🪄{empty_space*beam_length}{user.mention}"
             message = await interaction.followup.send(message_content, wait=True) 
 
+            frames = []
             for i in range(beam_length):
-                await asyncio.sleep(beam_speed)
                 current_beam = str(beam_emote) * (i + 1)
                 remaining_space = str(empty_space) * (beam_length - 1 - i)
-                await message.edit(content=f"{wizard_pikol}.🪄{current_beam}{remaining_space}{user.mention}")
+                frames.append(f"{wizard_pikol}.🪄{current_beam}{remaining_space}{user.mention}")
 
-            await asyncio.sleep(beam_speed)
             final_beam = str(beam_emote) * beam_length
-            await message.edit(content=f"{wizard_pikol}.🪄{final_beam}💥")
+            frames.append(f"{wizard_pikol}.🪄{final_beam}💥")
 
             # timeout functionality requires manage roles permission
             # try:
@@ -260,22 +275,12 @@ class FunCommands(commands.Cog):
             #      print(f"Timeout error: {timeout_error}") # Log other timeout errors
             #      await message.edit(content=f"{wizard_pikol}🪄{final_beam}💥 {user.mention}\n*(The magic fizzled slightly...)*")
 
-
-            await asyncio.sleep(5)
-            try:
-                 await message.delete()
-            except discord.NotFound:
-                 pass
-            except discord.Forbidden:
-                 pass
-
+            self.animations.play(message, frames, interval=beam_speed, delete_after=5, name='magic_beam')
 
         except discord.errors.NotFound:
              self.log_error('magic_beam', "Interaction or channel not found")
-             print(f"Error in magic_beam command: Interaction/Channel not found")
         except Exception as e:
             self.log_error('magic_beam', e)
-            print(f"Error in magic_beam command: {e}")
             if not interaction.response.is_done():
                  try:
                      await interaction.response.send_message("the magic beam misfired!!! *poof*")
@@ -2,10 +2,15 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import json
+import logging
 import random
 from datetime import datetime, timedelta
 import os
 
+from utils.throttle import throttle_interaction
+
+log = logging.getLogger(__name__)
+
 def get_rarity_emoji(rarity):
     if rarity == 1: return "🌟"
     elif rarity == 2: return "⭐"
@@ -50,10 +55,10 @@ class ShopCommands(commands.Cog):
             with open('json/potions.json') as f:
                 self.POTIONS = json.load(f)
         except FileNotFoundError:
-            print("ERROR: json/potions.json not found!")
+            log.error("json/potions.json not found!")
             self.POTIONS = []
         except json.JSONDecodeError:
-            print("ERROR: json/potions.json is not valid JSON!")
+            log.error("json/potions.json is not valid JSON!")
             self.POTIONS = []
 
     def load_server_data(self, server_id):
@@ -155,6 +160,8 @@ class ShopCommands(commands.Cog):
 
                     async def callback(self, interaction: discord.Interaction):
                         try:
+                            if not await throttle_interaction(interaction, 'shop_buy'):
+                                return
                             await interaction.response.defer(ephemeral=True)
                             
                             guild_data = self.shop_commands.load_server_data(interaction.guild_id)
@@ -189,7 +196,7 @@ class ShopCommands(commands.Cog):
                                 try:
                                     await interaction.response.send_message(purchase_message, ephemeral=True)
                                 except discord.NotFound:
-                                    print(f"Failed to respond to interaction - both followup and response failed")
+                                    log.error("Failed to respond to interaction - both followup and response failed")
                                     return
                                     
                         except Exception as e:
@@ -197,7 +204,7 @@ class ShopCommands(commands.Cog):
                             try:
                                 await interaction.followup.send("an error occurred while processing your purchase! *sad meow*", ephemeral=True)
                             except:
-                                print(f"Failed to send error message for shop purchase: {str(e)}")
+                                log.error("Failed to send error message for shop purchase: %s", e)
 
                 button = discord.ui.Button(
                     label=f"buy {i+1} {rarity_emoji}",
@@ -213,7 +220,6 @@ class ShopCommands(commands.Cog):
 
         except Exception as e:
             self.log_error('shop', e)
-            print(f"Error in shop command: {e}")
             if interaction.response.is_done():
                 await interaction.followup.send("something went wrong displaying the shop! *confused meow*", ephemeral=True)
             else:
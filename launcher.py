@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.ipc import DEFAULT_HOST, DEFAULT_PORT, ClusterInfo, IPCHub, partition_shards
+from utils.log import setup_logging
+
+LOG_DIR = 'logs'
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+# how long one cluster gets to identify all its shards before the next one starts anyway
+READY_TIMEOUT_PER_SHARD = 10.0
+SHUTDOWN_GRACE = 30.0
+MAX_RESTART_DELAY = 300.0
+
+log = logging.getLogger('pikol.launcher')
+
+
+def recommended_shards(token):
+    response = httpx.get(GATEWAY_URL, headers={'Authorization': f'Bot {token}'}, timeout=10.0)
+    response.raise_for_status()
+    return response.json()['shards']
+
+
+class Cluster:
+    def __init__(self, info):
+        self.info = info
+        self.process = None
+        self.ready = asyncio.Event()
+        self.restarts = 0
+        self.started = 0.0
+
+
+class Launcher:
+    # Runs pikol.py once per cluster, each with its own block of shards, and
+    # hosts the IPC hub they coordinate through. Clusters start one after
+    # another because identify is rate limited per bot, not per process.
+
+    def __init__(self, clusters, host, port):
+        self.hub = IPCHub(host, port)
+        self.hub.add_listener(self.on_event)
+        self.clusters = clusters
+        self.stopping = False
+
+    def on_event(self, topic, data, cluster_id):
+        if topic == 'ready' and 0 <= cluster_id < len(self.clusters):
+            cluster = self.clusters[cluster_id]
+            cluster.ready.set()
+            log.info("Cluster %d ready: %s guilds on shards %s (%.1fs)", cluster_id, data.get('guilds'),
+                     cluster.info.shard_ids, time.monotonic() - cluster.started)
+
+    async def spawn(self, cluster):
+        cluster.ready.clear()
+        cluster.started = time.monotonic()
+        env = dict(os.environ, **cluster.info.environ())
+        cluster.process = await asyncio.create_subprocess_exec(sys.executable, 'pikol.py', env=env)
+        log.info("Started cluster %d (pid %d) with shards %s of %d", cluster.info.id, cluster.process.pid,
+                 cluster.info.shard_ids, cluster.info.shard_count)
+
+    async def supervise(self, cluster):
+        while not self.stopping:
+            code = await cluster.process.wait()
+            if self.stopping:
+                return
+            uptime = time.monotonic() - cluster.started
+            # a cluster that ran for a while gets a fresh backoff
+            cluster.restarts = 0 if uptime > MAX_RESTART_DELAY else cluster.restarts + 1
+            delay = min(MAX_RESTART_DELAY, 2 ** cluster.restarts)
+            log.error("Cluster %d exited with code %s after %.0fs, restarting in %ds", cluster.info.id, code, uptime, delay)
+            await asyncio.sleep(delay)
+            if not self.stopping:
+                await self.spawn(cluster)
+
+    async def run(self):
+        await self.hub.start()
+        for cluster in self.clusters:
+            cluster.info.ipc_port = self.hub.port
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:  # windows
+                pass
+
+        supervisors = []
+        try:
+            for cluster in self.clusters:
+                await self.spawn(cluster)
+                supervisors.append(asyncio.create_task(self.supervise(cluster)))
+                try:
+                    await asyncio.wait_for(cluster.ready.wait(), READY_TIMEOUT_PER_SHARD * len(cluster.info.shard_ids))
+                except asyncio.TimeoutError:
+                    log.warning("Cluster %d not ready in time, starting the next one anyway", cluster.info.id)
+                if stop.is_set():
+                    break
+            await stop.wait()
+        finally:
+            self.stopping = True
+            await self.shutdown()
+            for task in supervisors:
+                task.cancel()
+            await self.hub.close()
+
+    async def shutdown(self):
+        running = [c.process for c in self.clusters if c.process is not None and c.process.returncode is None]
+        log.info("Stopping %d clusters", len(running))
+        for process in running:
+            # SIGINT lets bot.run() close the gateway connections and flush logs
+            process.send_signal(signal.SIGINT)
+        for process in running:
+            try:
+                await asyncio.wait_for(process.wait(), SHUTDOWN_GRACE)
+            except asyncio.TimeoutError:
+                process.kill()
+
+
+def main():
+    load_dotenv()
+    try:
+        with open('config.json') as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        config = {}
+    cluster_config = config.get('cluster', {})
+
+    parser = argparse.ArgumentParser(description="Run pikol as several processes, each with its own block of shards")
+    parser.add_argument('--clusters', type=int, default=cluster_config.get('clusters', os.cpu_count() or 1))
+    parser.add_argument('--shards', type=int, default=cluster_config.get('shard_count'),
+                        help="total shard count (default: what discord recommends)")
+    parser.add_argument('--ipc-port', type=int, default=cluster_config.get('ipc_port', DEFAULT_PORT))
+    args = parser.parse_args()
+
+    pipeline = setup_logging(LOG_DIR, dict(config.get('logging', {}), filename='launcher.jsonl'))
+    try:
+        shard_count = args.shards
+        if shard_count is None:
+            token = os.getenv('TOKEN')
+            if not token:
+                log.critical("Bot token is missing and no shard count was given.")
+                return
+            shard_count = recommended_shards(token)
+            log.info("Discord recommends %d shards", shard_count)
+        blocks = partition_shards(shard_count, args.clusters)
+        clusters = [Cluster(ClusterInfo(index, len(blocks), shard_ids, shard_count, DEFAULT_HOST, args.ipc_port))
+                    for index, shard_ids in enumerate(blocks)]
+        asyncio.run(Launcher(clusters, DEFAULT_HOST, args.ipc_port).run())
+    finally:
+        pipeline.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,11 @@
+import time
+
+STARTED_AT = time.monotonic()
+
+from utils import import_time
+# installed before anything else so discord.py and every cog import is measured
+IMPORTS = import_time.install()
+
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
@@ -5,15 +13,35 @@ import json
 import random
 from datetime import datetime, timedelta
 import asyncio
+import logging
+import math
 import os
+import signal
 from dotenv import load_dotenv
 
+from cogs import EXTENSIONS
+from utils.extensions import ExtensionLoader
+from utils.gateway_recorder import GatewayRecorder
+from utils.log import setup_logging, log_error
+from utils.interactions import AckTracker, DEFAULT_ACK_BUDGET
+from utils.ipc import ClusterInfo, IPCClient
+from utils.member_cache import MemberCache, stored_ids
+from utils.message_router import MessageRouter
+from utils.profiling import Profiler, format_bytes, peak_rss
+from utils.metrics import CommandMetrics, MetricsRegistry, MetricsServer, timed
+from utils.send_queue import OutboundSender, LOW
+from utils.snapshot import SnapshotManager
+from utils.throttle import Throttle, ThrottledCommandTree
+from utils.watchdog import LoopWatchdog
+
 load_dotenv()
 TOKEN = os.getenv('TOKEN')
 TOKEN_TEST = os.getenv('TOKEN_TEST')
 
 LOG_DIR = 'logs'
 SERVER_DATA_DIR = 'servers'
+PROFILE_DIR = 'profiles'
+RECORDING_DIR = 'recordings'
 JSON_DIR = 'json'
 
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -21,65 +49,195 @@ os.makedirs(SERVER_DATA_DIR, exist_ok=True)
 os.makedirs(JSON_DIR, exist_ok=True)
 
 try:
-    with open(os.path.join(JSON_DIR,'potions.json')) as f:
-        POTIONS_DATA = json.load(f)
-except FileNotFoundError:
-    print(f"Warning: {os.path.join(JSON_DIR,'potions.json')} not found. Shop restock might fail.")
-    POTIONS_DATA = []
-except json.JSONDecodeError:
-     print(f"Warning: {os.path.join(JSON_DIR,'potions.json')} is invalid. Shop restock might fail.")
-     POTIONS_DATA = []
+    with open('config.json') as f:
+        CONFIG = json.load(f)
+except (FileNotFoundError, json.JSONDecodeError):
+    CONFIG = {}
+
+# set by launcher.py when this process runs one block of shards in a cluster
+cluster = ClusterInfo.from_env()
+logging_config = CONFIG.get('logging', {})
+if cluster is not None:
+    # every cluster process gets its own file; rotating one file from several processes loses lines
+    logging_config = dict(logging_config, filename=f'pikol-cluster{cluster.id}.jsonl')
+log_pipeline = setup_logging(LOG_DIR, logging_config)
+log = logging.getLogger('pikol')
+
+snapshot_config = CONFIG.get('snapshot', {})
+snapshot = SnapshotManager(
+    SERVER_DATA_DIR, f'snapshot-cluster{cluster.id}.bin' if cluster is not None else 'snapshot.bin'
+) if snapshot_config.get('enabled', True) else None
+# benchmarks import this module too; only a real run may consume the snapshot
+if snapshot is not None and __name__ == '__main__':
+    snapshot.open()
+
+POTIONS_PATH = os.path.join(JSON_DIR, 'potions.json')
+
+def potions_source():
+    try:
+        stat = os.stat(POTIONS_PATH)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def load_potion_catalog():
+    """potions.json plus the indexes built over it, taken from the snapshot while the file is unchanged."""
+    source = potions_source()
+    cached = snapshot.section('potions') if snapshot is not None else None
+    if cached is not None and source is not None and cached.get('source') == source:
+        return cached
+    try:
+        with open(POTIONS_PATH) as f:
+            potions = json.load(f)
+    except FileNotFoundError:
+        log.warning("%s not found. Shop restock might fail.", POTIONS_PATH)
+        potions = []
+    except json.JSONDecodeError:
+        log.warning("%s is invalid. Shop restock might fail.", POTIONS_PATH)
+        potions = []
+    return {
+        'source': source,
+        'potions': potions,
+        'by_name': {p['name']: i for i, p in enumerate(potions) if 'name' in p},
+        'restock': [i for i, p in enumerate(potions) if p.get('rarity', 1) > 0],
+    }
+
+POTION_CATALOG = load_potion_catalog()
+POTIONS_DATA = POTION_CATALOG['potions']
+POTION_INDEX = {name: POTIONS_DATA[i] for name, i in POTION_CATALOG['by_name'].items()}
+RESTOCK_POOL = [POTIONS_DATA[i] for i in POTION_CATALOG['restock']]
+RESTOCK_WEIGHTS = [p.get('rarity', 1) for p in RESTOCK_POOL]
+if snapshot is not None:
+    snapshot.add_section('potions', lambda: POTION_CATALOG)
 
 intents = discord.Intents.default()
 intents.messages = True
 intents.message_content = True
 intents.guilds = True
 intents.members = True
-
-bot = commands.Bot(command_prefix='!', intents=intents)
+# join/leave events still need the members intent; how many members stay cached is up to the policy
+member_cache = MemberCache(CONFIG.get('member_cache', {}))
+
+class PikolCommandTree(ThrottledCommandTree):
+    async def interaction_check(self, interaction):
+        self.client.command_metrics.started(interaction)
+        if interaction.command is not None:
+            # lets the loop watchdog blame a stall on the command instead of a generic invoker task
+            asyncio.current_task().set_name(f'command:{interaction.command.qualified_name}')
+        allowed = await super().interaction_check(interaction)
+        if not allowed:
+            interaction.extras['throttled'] = True
+        return allowed
+
+    async def on_error(self, interaction, error):
+        if interaction.extras.get('throttled'):
+            # the throttle already answered; a failed check is not worth a traceback
+            self.client.command_metrics.finished(interaction, interaction.command, 'throttled')
+            return
+        self.client.command_metrics.finished(interaction, interaction.command, 'error')
+        await super().on_error(interaction, error)
+
+recorder_config = CONFIG.get('gateway_recorder', {})
+# raw socket events cost a dispatch per gateway frame, so they are only on when recording is allowed
+sharding_config = CONFIG.get('sharding', {})
+if cluster is not None:
+    bot_class, shard_options = commands.AutoShardedBot, {'shard_ids': cluster.shard_ids, 'shard_count': cluster.shard_count}
+elif sharding_config.get('enabled', False):
+    bot_class = commands.AutoShardedBot
+    shard_options = {'shard_count': sharding_config['shard_count']} if sharding_config.get('shard_count') else {}
+else:
+    bot_class, shard_options = commands.Bot, {}
+bot = bot_class(command_prefix='!', intents=intents, tree_cls=PikolCommandTree,
+                enable_debug_events=recorder_config.get('enabled', False), **shard_options, **member_cache.client_options())
+# bot.guilds only holds this process's shards, so storage and the per-guild tasks are partitioned for free;
+# only cluster 0 does the once-per-bot work
+bot.cluster = cluster
+bot.ipc = IPCClient(cluster.id, cluster.ipc_host, cluster.ipc_port) if cluster is not None else None
+IS_LEADER = cluster is None or cluster.leader
+
+bot.message_router = MessageRouter(bot)
+bot.snapshot = snapshot
+bot.potion_index = POTION_INDEX
+bot.sender = OutboundSender()
+bot.throttle = Throttle(CONFIG.get('throttle', {}))
+bot.ack_tracker = AckTracker(CONFIG.get('interactions', {}).get('ack_budget_seconds', DEFAULT_ACK_BUDGET))
+bot.metrics = MetricsRegistry()
+bot.command_metrics = CommandMetrics(bot.metrics)
+metrics_config = CONFIG.get('metrics', {})
+metrics_server = MetricsServer(bot.metrics, metrics_config.get('host', '127.0.0.1'), metrics_config.get('port', 9108) + (cluster.id if cluster else 0)) if metrics_config.get('enabled', True) else None
+
+storage_seconds = bot.metrics.histogram('pikol_storage_seconds', 'Time spent reading or writing a server JSON file', ('operation',))
+load_seconds = storage_seconds.labels('load')
+save_seconds = storage_seconds.labels('save')
+task_seconds = bot.metrics.histogram('pikol_task_seconds', 'Duration of one background task run', ('task',))
+bot.metrics.gauge('pikol_guilds', 'Guilds the bot is in').set_function(lambda: len(bot.guilds))
+bot.member_cache = member_cache
+bot.extension_loader = ExtensionLoader(bot, EXTENSIONS, CONFIG)
+bot.import_timer = IMPORTS
+startup_config = CONFIG.get('startup', {})
+member_cache.chunk_histogram = bot.metrics.histogram('pikol_member_chunk_seconds', 'Time to chunk one guild on first use',
+                                                     buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+bot.metrics.gauge('pikol_cached_members', 'Members held in the discord.py cache').set_function(lambda: member_cache.cached_members(bot.guilds))
+bot.metrics.gauge('pikol_ready_seconds', 'Seconds from process start to the first on_ready finishing').set_function(lambda: member_cache.ready_seconds or 0.0)
+bot.metrics.gauge('pikol_gateway_latency_seconds', 'Heartbeat round trip to the Discord gateway').set_function(lambda: bot.latency)
+watchdog_config = CONFIG.get('watchdog', {})
+bot.watchdog = LoopWatchdog(
+    threshold=watchdog_config.get('threshold_seconds', 0.25),
+    interval=watchdog_config.get('interval_seconds', 0.1),
+    lag_histogram=bot.metrics.histogram('pikol_event_loop_lag_seconds', 'How late the loop ran a timer callback',
+                                        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+) if watchdog_config.get('enabled', True) else None
+bot.gateway_recorder = GatewayRecorder(
+    bot, RECORDING_DIR,
+    max_events=recorder_config.get('max_events', 200_000),
+    max_members=recorder_config.get('max_members_per_guild', 1000),
+) if recorder_config.get('enabled', False) else None
+bot.metrics.gauge('pikol_outbound_pending', 'Low priority sends waiting for a rate limit token').set_function(lambda: len(bot.sender.pending))
+
+DEFAULT_PIKOL_EMOJI = "<:wizardpikol:1328137703044415488>"
+guild_responses = {}
+
+bot.profiler = Profiler(PROFILE_DIR)
+# the bot, guilds, channels and interactions are shared by everything; sizing stops at them
+bot.profiler.stop_types = (commands.Bot, commands.Cog, discord.Guild, discord.abc.Messageable, discord.Interaction)
+bot.profiler.add_breakdown('guild response cache', lambda: guild_responses)
+bot.profiler.add_breakdown('throttle buckets', lambda: bot.throttle.buckets)
+bot.profiler.add_breakdown('outbound pending sends', lambda: bot.sender.pending)
+bot.profiler.add_breakdown('message waiters', lambda: bot.message_router.waiters.waiters)
 
 def load_server_data(server_id):
     filepath = os.path.join(SERVER_DATA_DIR, f'{server_id}.json')
+    started = time.perf_counter()
     try:
+        if snapshot is not None:
+            data = snapshot.load_guild(server_id)
+            if data is not None:
+                return data
         with open(filepath) as f:
             return json.load(f)
     except FileNotFoundError:
         return {"balance": {}, "inventory": {}, "shop": [], "next_restock": None}
     except json.JSONDecodeError:
-        print(f"Error decoding JSON for server {server_id}. Returning default.")
+        log.error("Error decoding JSON for server %s. Returning default.", server_id)
         return {"balance": {}, "inventory": {}, "shop": [], "next_restock": None}
+    finally:
+        load_seconds.observe(time.perf_counter() - started)
 
 def save_server_data(server_id, data):
     filepath = os.path.join(SERVER_DATA_DIR, f'{server_id}.json')
+    started = time.perf_counter()
+    if snapshot is not None:
+        # the JSON file is newer from here on
+        snapshot.discard(server_id)
     try:
         with open(filepath, 'w') as f:
             json.dump(data, f, indent=4)
     except IOError as e:
-         print(f"Error saving data for server {server_id}: {e}")
+         log.error("Error saving data for server %s: %s", server_id, e)
     except TypeError as e:
-         print(f"Error serializing data for server {server_id} (likely non-serializable object): {e}")
-
-def log_error(command_name, error):
-    timestamp = datetime.now().isoformat()
-    error_type = type(error).__name__
-    error_message = str(error)
-    error_args = getattr(error, 'args', [])
-    
-    log_message = (
-        f"{timestamp}\n"
-        f"Command/Context: {command_name}\n"
-        f"Error Type: {error_type}\n"
-        f"Error Message: {error_message}\n"
-        f"Error Args: {error_args}\n"
-        f"{'='*50}\n"
-    )
-
-    filepath = os.path.join(LOG_DIR, f'{command_name}_errors.txt')
-    try:
-        with open(filepath, 'a', encoding='utf-8') as f:
-            f.write(log_message)
-    except IOError as e:
-        print(f"CRITICAL: Could not write to log file {filepath}: {e}")
+         log.error("Error serializing data for server %s (likely non-serializable object): %s", server_id, e)
+    finally:
+        save_seconds.observe(time.perf_counter() - started)
 
 bot.load_server_data = load_server_data
 bot.save_server_data = save_server_data
@@ -90,12 +248,8 @@ def restock_shop():
         return []
 
     shop = []
-    weights = [p.get('rarity', 1) for p in POTIONS_DATA]
-    valid_potions = [p for i, p in enumerate(POTIONS_DATA) if weights[i] > 0]
-    valid_weights = [w for w in weights if w > 0]
-
-    if not valid_potions or not valid_weights or len(valid_potions) != len(valid_weights):
-         print("Warning: Invalid potion data or weights for restocking.")
+    if not RESTOCK_POOL:
+         log.warning("Invalid potion data or weights for restocking.")
          if POTIONS_DATA:
              for _ in range(min(4, len(POTIONS_DATA))):
                   shop.append(random.choice(POTIONS_DATA).copy())
@@ -103,13 +257,13 @@ def restock_shop():
 
     try:
         for _ in range(4):
-            chosen_potion_list = random.choices(valid_potions, weights=valid_weights, k=1)
+            chosen_potion_list = random.choices(RESTOCK_POOL, weights=RESTOCK_WEIGHTS, k=1)
             if chosen_potion_list:
                  potion = chosen_potion_list[0].copy()
                  potion['price'] = potion.get('price', random.randint(10, 50))
                  shop.append(potion)
     except Exception as e:
-         print(f"Error during shop restocking logic: {e}")
+         log.exception("Error during shop restocking logic: %s", e)
          return shop
 
     return shop
@@ -125,26 +279,31 @@ def ensure_users_in_server_data(guild, data):
             if user_id not in data['inventory']:
                 data['inventory'][user_id] = {}
                 changes_made = True
+    if bot.member_cache.record_ids(guild, data):
+        changes_made = True
     return changes_made
 
 @tasks.loop(minutes=10)
+@timed(task_seconds.labels('restock_shops'))
+@bot.profiler.profiled('task:restock_shops')
 async def restock_shops_task():
-    print(f"Task: Running restock_shops at {datetime.now()}")
+    log.info("Task: running restock_shops")
     for guild in bot.guilds:
         try:
             data = load_server_data(guild.id)
             # Check for new users before restocking
             if ensure_users_in_server_data(guild, data):
-                print(f"Added new users to server {guild.id}")
+                log.info("Added new users to server %s", guild.id)
             
             data['shop'] = restock_shop()
             data['next_restock'] = (datetime.now() + timedelta(minutes=10)).isoformat()
             save_server_data(guild.id, data)
         except Exception as e:
             log_error(f'restock_task_guild_{guild.id}', e)
-            print(f"Error in restock task for guild {guild.id}: {e}")
 
 @tasks.loop(minutes=5)
+@timed(task_seconds.labels('rotate_activity'))
+@bot.profiler.profiled('task:rotate_activity')
 async def rotate_activity_task():
     ACTIVITIES = [
         (discord.ActivityType.playing, "with potions 🧪"),
@@ -158,23 +317,51 @@ async def rotate_activity_task():
     ]
     try:
         activity_type, name = random.choice(ACTIVITIES)
-        await bot.change_presence(activity=discord.Activity(type=activity_type, name=name))
+        # in a cluster every process applies it when the event comes back, so all shards match
+        if bot.ipc is None or not await bot.ipc.publish('presence', {'type': activity_type.value, 'name': name}):
+            await bot.change_presence(activity=discord.Activity(type=activity_type, name=name))
     except Exception as e:
         log_error('rotate_activity_task', e)
-        print(f"Error changing activity: {e}")
+
+async def apply_presence(data, sender):
+    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType(data['type']), name=data['name']))
+
+async def local_stats(data=None):
+    rss = peak_rss()
+    return {
+        'cluster': cluster.id if cluster else 0,
+        'shards': sorted(bot.shards) if isinstance(bot, commands.AutoShardedBot) else [0],
+        'guilds': len(bot.guilds),
+        'members': sum(guild.member_count or 0 for guild in bot.guilds),
+        'cached_members': bot.member_cache.cached_members(bot.guilds),
+        'latency_ms': round(bot.latency * 1000, 1) if math.isfinite(bot.latency) else None,
+        'ready_seconds': bot.member_cache.ready_seconds,
+        'rss_bytes': rss,
+    }
+
+bot.local_stats = local_stats
+if bot.ipc is not None:
+    bot.ipc.subscribe('presence', apply_presence)
+    bot.ipc.respond_to('stats', local_stats)
 
 @tasks.loop(minutes=15)
+@timed(task_seconds.labels('reward_random_user'))
+@bot.profiler.profiled('task:reward_random_user')
 async def reward_random_user_task():
-    print(f"Task: Running reward_random_user at {datetime.now()}")
+    log.info("Task: running reward_random_user")
     coins_to_reward = 20
     for guild in bot.guilds:
         try:
             data = load_server_data(guild.id)
 
-            eligible_members = [
-                member for member in guild.members
-                if not member.bot and member.status != discord.Status.offline
-            ]
+            if bot.member_cache.loaded(guild):
+                eligible_members = [
+                    member for member in guild.members
+                    if not member.bot and member.status != discord.Status.offline
+                ]
+            else:
+                # members aren't cached, so there is no status to check: any stored member can win
+                eligible_members = bot.member_cache.stored_members(data)
 
             if not eligible_members:
                 continue
@@ -189,123 +376,126 @@ async def reward_random_user_task():
 
             data['balance'][user_id] += coins_to_reward
             save_server_data(guild.id, data)
-            print(f"Rewarded {coins_to_reward} coins to {lucky_member.display_name} in {guild.name}")
+            log.info("Rewarded %d coins to %s in %s", coins_to_reward, lucky_member.display_name, guild.name)
 
         except Exception as e:
             log_error(f'reward_task_guild_{guild.id}', e)
-            print(f"Error in reward_random_user task for guild {guild.id}: {e}")
+
+@bot.event
+async def setup_hook():
+    # runs once before the gateway connects, so cogs are imported while discord is still
+    # handshaking instead of after on_ready, and reconnects don't try to load them again
+    log.info("Loading cogs...")
+    loaded = await bot.extension_loader.load_all()
+    log.info("Loaded %d cogs in %.0f ms", len(loaded), sum(result.seconds for result in loaded) * 1000)
+    bot.profiler.instrument_commands(bot.tree)
+    log.info("Imports: %s", "; ".join(IMPORTS.report()))
+    for line in import_time.check_budget(IMPORTS.summary(), startup_config.get('import_budget_ms')):
+        log.warning("Import budget exceeded: %s", line)
 
 @bot.event
 async def on_ready():
-    print(f'Logged in as {bot.user.name} (ID: {bot.user.id})')
-    print(f'Discord.py Version: {discord.__version__}')
-    print('------')
+    log.info("Logged in as %s (ID: %s), discord.py %s", bot.user.name, bot.user.id, discord.__version__)
 
-    print("Checking all servers and users...")
+    log.info("Checking all servers and users...")
     for guild in bot.guilds:
         try:
             data = load_server_data(guild.id)
             if ensure_users_in_server_data(guild, data):
                 save_server_data(guild.id, data)
-                print(f"Updated user data for server: {guild.name} (ID: {guild.id})")
+                log.info("Updated user data for server: %s (ID: %s)", guild.name, guild.id)
         except Exception as e:
             log_error(f'startup_guild_{guild.id}', e)
-            print(f"Error processing startup data for guild {guild.id}: {e}")
-
-    print("Loading cogs...")
-    loaded_cogs = 0
-    cog_dir = 'cogs'
-    for filename in os.listdir(cog_dir):
-        if filename.endswith('.py') and filename != '__init__.py':
-            extension_name = f'{cog_dir}.{filename[:-3]}'
-            try:
-                await bot.load_extension(extension_name)
-                print(f'Successfully loaded extension: {extension_name}')
-                loaded_cogs += 1
-            except commands.ExtensionNotFound:
-                print(f'Error: Extension {extension_name} not found.')
-            except commands.ExtensionAlreadyLoaded:
-                print(f'Warning: Extension {extension_name} already loaded.')
-            except commands.NoEntryPointError:
-                print(f'Error: Extension {extension_name} has no setup() function.')
-            except commands.ExtensionFailed as e:
-                log_error(f'cog_load_{filename[:-3]}', e.original)
-                print(f'Error loading extension {extension_name}:\n {e.original}')
-
-    print(f"--- Loaded {loaded_cogs} cogs ---")
-
-    print("Syncing slash commands...")
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} global application command(s).")
-    except Exception as e:
-        log_error('command_sync', e)
-        print(f"Error syncing application commands: {e}")
 
-    print("Starting background tasks...")
+    if IS_LEADER:
+        log.info("Syncing slash commands...")
+        try:
+            synced = await bot.tree.sync()
+            log.info("Synced %d global application command(s).", len(synced))
+        except Exception as e:
+            log_error('command_sync', e)
+
+    log.info("Starting background tasks...")
     if not restock_shops_task.is_running():
         restock_shops_task.start()
     if not reward_random_user_task.is_running():
          reward_random_user_task.start()
-    if not rotate_activity_task.is_running():
+    if IS_LEADER and not rotate_activity_task.is_running():
          rotate_activity_task.start()
-    print("--- Bot is Ready! ---")
-
-@bot.event
-async def on_message(message: discord.Message):
-    try:
-        if message.author.bot:
-            return
-
-        content = str(message.content) if message.content else ""
-
-        ai_cog = bot.get_cog('AICommands')
-        if ai_cog and hasattr(ai_cog, 'active_sessions') and message.channel.id in ai_cog.active_sessions:
-            return
-
+    if bot.watchdog is not None:
+        bot.watchdog.start()
+    if metrics_server is not None:
         try:
-            pikol_emoji = discord.utils.get(message.guild.emojis, name='pikol') if message.guild else None
-            wizard_pikol_emoji = discord.utils.get(message.guild.emojis, name='wizardpikol') if message.guild else None
+            await metrics_server.start()
+        except OSError as e:
+            log_error('metrics_server', e)
+    if bot.member_cache.ready_seconds is None:
+        bot.member_cache.ready_seconds = time.monotonic() - STARTED_AT
+    if bot.ipc is not None:
+        bot.ipc.start()
+        if await bot.ipc.wait_connected(10.0):
+            await bot.ipc.publish('ready', {'guilds': len(bot.guilds)})
+        else:
+            log.warning("IPC hub at %s:%d unreachable, cluster %d runs uncoordinated until it comes back",
+                        cluster.ipc_host, cluster.ipc_port, cluster.id)
+    rss = peak_rss()
+    log.info("Bot is ready! %s, peak RSS %s", bot.member_cache.report(bot.guilds),
+             format_bytes(rss) if rss is not None else "unknown")
+
+def build_guild_responses(guild):
+    try:
+        pikol_emoji = discord.utils.get(guild.emojis, name='pikol') if guild else None
+        wizard_pikol_emoji = discord.utils.get(guild.emojis, name='wizardpikol') if guild else None
+
+        pikol_str = str(pikol_emoji) if pikol_emoji else DEFAULT_PIKOL_EMOJI
+        wizard_pikol_str = str(wizard_pikol_emoji) if wizard_pikol_emoji else DEFAULT_PIKOL_EMOJI
+    except Exception:
+        pikol_str = DEFAULT_PIKOL_EMOJI
+        wizard_pikol_str = DEFAULT_PIKOL_EMOJI
+
+    meow_responses = ('Meow', 'MEOW', '~meow~🪄', f'meow {pikol_str}', f'{wizard_pikol_str}🪄')
+    mention_responses = ('Meow?', 'Yes, meow?', '*tilts head*', f'{pikol_str}?', f'{wizard_pikol_str}🪄!', 'you called, meow?')
+    return meow_responses, mention_responses
+
+def get_guild_responses(guild):
+    key = guild.id if guild else None
+    responses = guild_responses.get(key)
+    if responses is None:
+        responses = guild_responses[key] = build_guild_responses(guild)
+    return responses
 
-            pikol_str = str(pikol_emoji) if pikol_emoji else "<:wizardpikol:1328137703044415488>"
-            wizard_pikol_str = str(wizard_pikol_emoji) if wizard_pikol_emoji else "<:wizardpikol:1328137703044415488>"
-        except:
-            pikol_str = "<:wizardpikol:1328137703044415488>"
-            wizard_pikol_str = "<:wizardpikol:1328137703044415488>"
+@bot.event
+async def on_app_command_completion(interaction, command):
+    bot.command_metrics.finished(interaction, command, 'ok')
 
-        is_direct_mention = bot.user.id in [u.id for u in message.mentions] if message.mentions else False
-        content_lower = content.lower()
+@bot.event
+async def on_guild_emojis_update(guild, before, after):
+    guild_responses.pop(guild.id, None)
 
-        meow_responses = ['Meow', 'MEOW', '~meow~🪄', f'meow {pikol_str}', f'{wizard_pikol_str}🪄']
-        mention_responses = ['Meow?', 'Yes, meow?', '*tilts head*', f'{pikol_str}?', f'{wizard_pikol_str}🪄!', 'you called, meow?']
+@bot.event
+async def on_guild_remove(guild):
+    guild_responses.pop(guild.id, None)
 
-        if not message.channel:
-            return
+async def respond_to_meow(message, is_meow, is_mention):
+    meow_responses, mention_responses = get_guild_responses(message.guild)
 
-        try:
-            if 'meow' in content_lower and is_direct_mention:
-                await message.channel.send(str(random.choice(meow_responses)))
-            elif 'meow' in content_lower and random.random() < 0.5:
-                await message.channel.send(str(random.choice(meow_responses)))
-            elif is_direct_mention:
-                await message.channel.send(str(random.choice(mention_responses)))
-        except discord.errors.Forbidden:
-            log_error('message_response', 'Missing permissions to send message in channel')
-            pass
-        except Exception as response_error:
-            log_error('message_response', response_error)
-            print(f"Error sending response: {response_error}")
+    try:
+        if is_meow and is_mention:
+            await bot.sender.send(message.channel, random.choice(meow_responses), priority=LOW)
+        elif is_meow and random.random() < 0.5:
+            await bot.sender.send(message.channel, random.choice(meow_responses), priority=LOW)
+        elif is_mention:
+            await bot.sender.send(message.channel, random.choice(mention_responses), priority=LOW)
+    except discord.errors.Forbidden:
+        log_error('message_response', 'Missing permissions to send message in channel')
+    except Exception as response_error:
+        log_error('message_response', response_error)
+
+bot.message_router.add_trigger_handler(respond_to_meow)
 
-    except Exception as e:
-        error_info = {
-            'type': type(e).__name__,
-            'message': str(e),
-            'args': getattr(e, 'args', []),
-            'channel': getattr(message, 'channel', None),
-            'guild': getattr(message.guild, 'name', 'N/A') if message.guild else 'N/A'
-        }
-        log_error('on_message_basic', error_info)
-        print(f"Error in on_message handler: {error_info}")
+@bot.event
+async def on_message(message: discord.Message):
+    await bot.message_router.dispatch(message)
 
 @bot.event
 async def on_member_join(member):
@@ -320,24 +510,54 @@ async def on_member_join(member):
             data['balance'][user_id] = random.randint(80, 120)
         if user_id not in data['inventory']:
             data['inventory'][user_id] = {}
+        if bot.member_cache.keeps_ids:
+            members = data.setdefault('members', stored_ids(data))
+            if user_id not in members:
+                members.append(user_id)
             
         save_server_data(member.guild.id, data)
-        print(f"Added new user {member.name} (ID: {member.id}) to server {member.guild.name}")
+        log.info("Added new user %s (ID: %s) to server %s", member.name, member.id, member.guild.name)
         
     except Exception as e:
         log_error(f'member_join_{member.guild.id}', e)
-        print(f"Error processing new member {member.id} for guild {member.guild.id}: {e}")
+
+@bot.event
+async def on_raw_member_remove(payload):
+    # raw: in lazy and ids mode the member usually isn't cached, so on_member_remove would never fire
+    if not bot.member_cache.keeps_ids or payload.user.bot:
+        return
+    try:
+        data = load_server_data(payload.guild_id)
+        user_id = str(payload.user.id)
+        members = data.setdefault('members', stored_ids(data))
+        if user_id in members:
+            members.remove(user_id)
+            save_server_data(payload.guild_id, data)
+    except Exception as e:
+        log_error(f'member_remove_{payload.guild_id}', e)
+
+def stop_on_sigterm(signum, frame):
+    # docker stop sends SIGTERM; treat it like ctrl-c so bot.run() closes cleanly and the snapshot gets written
+    raise KeyboardInterrupt
 
 if __name__ == "__main__":
     if not TOKEN:
-        log_error('bot_startup', 'Bot token missing')
-        print("CRITICAL: Bot token is missing! Please set your Discord bot token in the TOKEN variable.")
+        log.critical("Bot token is missing! Please set your Discord bot token in the TOKEN variable.")
     else:
+        signal.signal(signal.SIGTERM, stop_on_sigterm)
         try:
-            bot.run(TOKEN)
+            # discord.py logs through the root logger, so it shares the queued pipeline
+            bot.run(TOKEN, log_handler=None)
         except discord.LoginFailure as e:
-            log_error('bot_login', f'Failed to log in: {e}')
-            print("CRITICAL: Failed to log in. Please check that your Discord bot token is correct.")
+            log.critical("Failed to log in. Please check that your Discord bot token is correct. (%s)", e)
         except Exception as e:
-            log_error('bot_run', f'Critical bot error: {e}')
-            print(f"CRITICAL: An error occurred while running the bot: {e}")
\ No newline at end of file
+            log.critical("An error occurred while running the bot: %s", e, exc_info=e)
+        finally:
+            if bot.gateway_recorder is not None:
+                bot.gateway_recorder.stop()
+            if snapshot is not None and bot.guilds:
+                try:
+                    snapshot.write([guild.id for guild in bot.guilds], SERVER_DATA_DIR)
+                except Exception as e:
+                    log.exception("Could not write the shutdown snapshot: %s", e)
+            log_pipeline.stop()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import bisect
+import time
+
+NS = 1_000_000_000
+COLD_LOAD_SECONDS = 0.5
+
+SECONDS_BOUNDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+RATE_BOUNDS = [1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500]
+TOKEN_BOUNDS = [16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192]
+
+
+class RollingHistogram:
+    # Fixed buckets split into time slices; the oldest slice is recycled as the
+    # window moves, so the histogram always covers roughly the last `window` seconds.
+
+    def __init__(self, bounds, window=3600, slices=6):
+        self.bounds = bounds
+        self.slice_seconds = window / slices
+        self.slices = [[0] * (len(bounds) + 1) for _ in range(slices)]
+        self.sums = [0.0] * slices
+        self.slice_ids = [None] * slices
+
+    def _slot(self, now):
+        slice_id = int(now // self.slice_seconds)
+        slot = slice_id % len(self.slices)
+        if self.slice_ids[slot] != slice_id:
+            self.slices[slot] = [0] * (len(self.bounds) + 1)
+            self.sums[slot] = 0.0
+            self.slice_ids[slot] = slice_id
+        return slot
+
+    def observe(self, value, now=None):
+        slot = self._slot(time.time() if now is None else now)
+        self.slices[slot][bisect.bisect_left(self.bounds, value)] += 1
+        self.sums[slot] += value
+
+    def _live(self, now):
+        oldest = int(now // self.slice_seconds) - len(self.slices) + 1
+        return [i for i, slice_id in enumerate(self.slice_ids) if slice_id is not None and slice_id >= oldest]
+
+    def counts(self, now=None):
+        live = self._live(time.time() if now is None else now)
+        merged = [0] * (len(self.bounds) + 1)
+        for i in live:
+            for bucket, count in enumerate(self.slices[i]):
+                merged[bucket] += count
+        return merged
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        counts = self.counts(now)
+        total = sum(counts)
+        return {
+            "count": total,
+            "sum": sum(self.sums[i] for i in self._live(now)),
+            "buckets": [[bound, count] for bound, count in zip(self.bounds + ["+Inf"], counts)],
+            "p50": self.quantile(0.5, counts),
+            "p95": self.quantile(0.95, counts),
+        }
+
+    def quantile(self, q, counts=None):
+        counts = self.counts() if counts is None else counts
+        total = sum(counts)
+        if not total:
+            return None
+        target = q * total
+        seen = 0
+        for bound, count in zip(self.bounds, counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class InferenceStats:
+    def __init__(self, window):
+        # lifetime totals; the windowed counts come from the histograms below
+        self.requests = 0
+        self.cold_loads = 0
+        # a histogram with no bounds is just a windowed counter
+        self.recent_cold_loads = RollingHistogram([], window)
+        self.histograms = {
+            "tokens_per_second": RollingHistogram(RATE_BOUNDS, window),
+            "prefill_seconds": RollingHistogram(SECONDS_BOUNDS, window),
+            "prompt_tokens": RollingHistogram(TOKEN_BOUNDS, window),
+            "output_tokens": RollingHistogram(TOKEN_BOUNDS, window),
+            "load_seconds": RollingHistogram(SECONDS_BOUNDS, window),
+            "queue_seconds": RollingHistogram(SECONDS_BOUNDS, window),
+            "network_seconds": RollingHistogram(SECONDS_BOUNDS, window),
+            "total_seconds": RollingHistogram(SECONDS_BOUNDS, window),
+        }
+
+    def record(self, sample, now):
+        self.requests += 1
+        if sample.get("load_seconds", 0) >= COLD_LOAD_SECONDS:
+            self.cold_loads += 1
+            self.recent_cold_loads.observe(1, now)
+        for name, value in sample.items():
+            histogram = self.histograms.get(name)
+            if histogram is not None and value is not None:
+                histogram.observe(value, now)
+
+    def snapshot(self, now):
+        return {
+            # every sample has a total_seconds, so its histogram counts the window's requests
+            "requests": sum(self.histograms["total_seconds"].counts(now)),
+            "cold_loads": sum(self.recent_cold_loads.counts(now)),
+            "requests_total": self.requests,
+            "cold_loads_total": self.cold_loads,
+            "histograms": {name: h.snapshot(now) for name, h in self.histograms.items()},
+        }
+
+
+def parse_sample(response_data, queue_seconds, wall_seconds):
+    eval_count = response_data.get("eval_count") or 0
+    eval_ns = response_data.get("eval_duration") or 0
+    prompt_ns = response_data.get("prompt_eval_duration")
+    load_ns = response_data.get("load_duration")
+    server_ns = response_data.get("total_duration")
+    return {
+        "tokens_per_second": eval_count / (eval_ns / NS) if eval_ns else None,
+        "prefill_seconds": prompt_ns / NS if prompt_ns is not None else None,
+        "prompt_tokens": response_data.get("prompt_eval_count"),
+        "output_tokens": eval_count or None,
+        "load_seconds": load_ns / NS if load_ns is not None else 0,
+        "queue_seconds": queue_seconds,
+        "network_seconds": max(0.0, wall_seconds - server_ns / NS) if server_ns else None,
+        "total_seconds": queue_seconds + wall_seconds,
+    }
+
+
+class AITelemetry:
+    def __init__(self, window=3600):
+        self.window = window
+        self.by_model = {}
+        self.by_guild = {}
+
+    def _stats(self, table, key):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = InferenceStats(self.window)
+        return stats
+
+    def record(self, model, guild_id, response_data, queue_seconds, wall_seconds, now=None):
+        now = time.time() if now is None else now
+        sample = parse_sample(response_data, queue_seconds, wall_seconds)
+        self._stats(self.by_model, model).record(sample, now)
+        if guild_id is not None:
+            self._stats(self.by_guild, guild_id).record(sample, now)
+        return sample
+
+    def export(self, now=None):
+        now = time.time() if now is None else now
+        return {
+            "generated_at": now,
+            "window_seconds": self.window,
+            "models": {model: s.snapshot(now) for model, s in self.by_model.items()},
+            "guilds": {str(guild_id): s.snapshot(now) for guild_id, s in self.by_guild.items()},
+        }
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+from utils.send_queue import SendWindow
+
+log = logging.getLogger(__name__)
+
+# Discord allows roughly 5 message edits per 5 seconds per channel
+EDIT_CAPACITY = 5
+EDIT_PERIOD = 5.0
+
+
+class Animation:
+    def __init__(self, message, frames, interval, delete_after, started, name):
+        self.message = message
+        self.frames = frames
+        self.interval = interval
+        self.delete_after = delete_after
+        self.started = started
+        self.name = name
+        self.shown = -1
+        self.delivered = 0
+        self.editing = False
+
+    @property
+    def channel_id(self):
+        return self.message.channel.id
+
+    @property
+    def finished(self):
+        return self.shown == len(self.frames) - 1 and not self.editing
+
+    def due_index(self, now):
+        return min(len(self.frames) - 1, int((now - self.started) / self.interval) - 1)
+
+
+class AnimationScheduler:
+    # Drives every running animation from one loop. Frames that fall behind are
+    # skipped in favour of the newest due frame, the final frame is always shown.
+
+    def __init__(self, tick=0.1, capacity=EDIT_CAPACITY, period=EDIT_PERIOD):
+        self.tick = tick
+        self.capacity = capacity
+        self.period = period
+        self.animations = []
+        self.buckets = {}
+        self.tasks = set()
+        self.timers = {}
+        self.runner = None
+        self.planned = 0
+        self.delivered = 0
+        self.completed = 0
+
+    def play(self, message, frames, interval, delete_after=None, name='animation'):
+        animation = Animation(message, list(frames), interval, delete_after, time.monotonic(), name)
+        self.planned += len(animation.frames)
+        self.animations.append(animation)
+        if self.runner is None or self.runner.done():
+            self.runner = asyncio.create_task(self._run())
+        return animation
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _bucket(self, channel_id):
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.buckets[channel_id] = SendWindow(self.capacity, self.period)
+        return bucket
+
+    async def _run(self):
+        while self.animations:
+            now = time.monotonic()
+            for animation in list(self.animations):
+                if animation.finished:
+                    self._finish(animation)
+                    continue
+                if animation.editing:
+                    continue
+                due = animation.due_index(now)
+                if due <= animation.shown:
+                    continue
+                if not self._bucket(animation.channel_id).try_add(now):
+                    continue
+                animation.editing = True
+                self._spawn(self._edit(animation, due))
+            await asyncio.sleep(self.tick)
+        # edits from the last period still count against the next animation in that channel
+        now = time.monotonic()
+        self.buckets = {channel_id: bucket for channel_id, bucket in self.buckets.items()
+                        if bucket.sent and now - bucket.sent[-1] < self.period}
+
+    async def _edit(self, animation, index):
+        try:
+            await animation.message.edit(content=animation.frames[index])
+            animation.delivered += 1
+            self.delivered += 1
+        except (discord.NotFound, discord.Forbidden):
+            index = len(animation.frames) - 1
+            animation.delete_after = None
+        except Exception as e:
+            log.error("Error editing %s frame %d: %s", animation.name, index, e)
+        finally:
+            animation.shown = index
+            animation.editing = False
+
+    def _finish(self, animation):
+        self.animations.remove(animation)
+        self.completed += 1
+        if animation.delivered < len(animation.frames):
+            log.info("%s: delivered %d/%d frames (edit rate limit).", animation.name, animation.delivered, len(animation.frames))
+        if animation.delete_after is not None:
+            loop = asyncio.get_running_loop()
+            self.timers[animation.message.id] = loop.call_later(animation.delete_after, self._delete, animation.message)
+
+    def _delete(self, message):
+        self.timers.pop(message.id, None)
+        self._spawn(self._delete_message(message))
+
+    async def _delete_message(self, message):
+        try:
+            await message.delete()
+        except (discord.NotFound, discord.Forbidden):
+            pass
+        except Exception as e:
+            log.error("Error deleting animated message: %s", e)
+
+    def stats(self):
+        """Frames planned vs frames actually shown; the gap is what the edit rate limit skipped."""
+        return {
+            "active": len(self.animations),
+            "completed": self.completed,
+            "frames_planned": self.planned,
+            "frames_delivered": self.delivered,
+        }
+
+    def close(self):
+        if self.runner is not None:
+            self.runner.cancel()
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers.clear()
+        for task in list(self.tasks):
+            task.cancel()
+        self.animations.clear()
@@ -0,0 +1,89 @@
+import random
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, base_backoff=1.0, max_backoff=30.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.consecutive_opens = 0
+        self.next_probe_at = None
+        self.opened_at = None
+
+    @property
+    def closed(self):
+        return self.state == CLOSED
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.consecutive_opens = 0
+        self.next_probe_at = None
+        self.opened_at = None
+
+    def record_failure(self, now=None):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip(now)
+
+    def trip(self, now=None):
+        if self.state == OPEN:
+            # more in-flight requests failing against a backend that is already out; the
+            # probe schedule stays put so recovery is still noticed after the base backoff
+            return
+        now = time.monotonic() if now is None else now
+        if self.state == CLOSED:
+            self.opened_at = now
+        # only a failed half-open probe gets here with consecutive_opens > 0, so that is what escalates
+        self.state = OPEN
+        backoff = min(self.max_backoff, self.base_backoff * (2 ** self.consecutive_opens))
+        # jitter so several bot processes don't probe a recovering box in lockstep
+        backoff *= random.uniform(0.8, 1.2)
+        self.consecutive_opens += 1
+        self.next_probe_at = now + backoff
+
+    def probe_due(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self.state == OPEN and now >= self.next_probe_at
+
+    def begin_probe(self):
+        self.state = HALF_OPEN
+
+
+class AdaptiveTimeout:
+    def __init__(self, minimum, maximum, percentile=0.99, multiplier=2.0, window=200, min_samples=20):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+        self._cached = None
+
+    def observe(self, elapsed):
+        self.samples.append(elapsed)
+        self._cached = None
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    @property
+    def value(self):
+        if len(self.samples) < self.min_samples:
+            return self.maximum
+        if self._cached is None:
+            target = self.quantile(self.percentile) * self.multiplier
+            self._cached = max(self.minimum, min(self.maximum, target))
+        return self._cached
@@ -0,0 +1,53 @@
+import heapq
+
+
+class ExpiryQueue:
+    # Min-heap of (deadline, key) with lazy re-keying: extending a deadline
+    # only updates the dict, the heap entry is fixed up when it reaches the top.
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, deadline):
+        current = self._deadlines.get(key)
+        self._deadlines[key] = deadline
+        if current is None or deadline < current:
+            heapq.heappush(self._heap, (deadline, key))
+            return self._heap[0][1] == key
+        return False
+
+    def discard(self, key):
+        self._deadlines.pop(key, None)
+
+    def _settle(self):
+        heap = self._heap
+        while heap:
+            deadline, key = heap[0]
+            actual = self._deadlines.get(key)
+            if actual is None or actual < deadline:
+                heapq.heappop(heap)
+            elif actual > deadline:
+                heapq.heapreplace(heap, (actual, key))
+            else:
+                return deadline
+        return None
+
+    def next_deadline(self):
+        return self._settle()
+
+    def pop_expired(self, now):
+        expired = []
+        while True:
+            deadline = self._settle()
+            if deadline is None or deadline > now:
+                return expired
+            _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            expired.append(key)
@@ -0,0 +1,105 @@
+import importlib.util
+import logging
+import time
+
+from discord.ext import commands
+
+from utils.log import log_error
+
+log = logging.getLogger(__name__)
+
+LOADED = 'loaded'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+def ollama_configured(config):
+    from utils.ollama_pool import backends_from_config
+
+    ollama_config = config.get('ollama_server', {})
+    if not backends_from_config(ollama_config) or not ollama_config.get('model', 'llama3.2:1b'):
+        return "ollama_server has no host/backends in config.json"
+    return None
+
+
+# config checks a manifest entry can name; each returns why the cog can't run, or None
+CONFIG_CHECKS = {
+    'ollama': ollama_configured,
+}
+
+
+class ExtensionResult:
+    def __init__(self, name, status, reason=None, seconds=0.0):
+        self.name = name
+        self.status = status
+        self.reason = reason
+        self.seconds = seconds
+
+
+class ExtensionLoader:
+    # Loads the extensions listed in cogs.EXTENSIONS. Preconditions are
+    # checked first so a cog that can't run is never imported, and each
+    # load is timed so slow imports show up in the startup log.
+
+    def __init__(self, bot, manifest, config, package='cogs'):
+        self.bot = bot
+        self.manifest = manifest
+        self.config = config
+        self.package = package
+        self.disabled = set(config.get('extensions', {}).get('disabled', []))
+        self.results = {}
+
+    def unmet(self, entry):
+        """Why entry can't be loaded, or None."""
+        if entry['name'] in self.disabled:
+            return "disabled in config.json"
+        for module in entry.get('modules', ()):
+            if importlib.util.find_spec(module) is None:
+                return f"{module} is not installed"
+        for check in entry.get('config', ()):
+            reason = CONFIG_CHECKS[check](self.config)
+            if reason:
+                return reason
+        return None
+
+    async def load(self, entry):
+        name = entry['name']
+        extension = f'{self.package}.{name}'
+        reason = self.unmet(entry)
+        if reason:
+            log.info("Skipping extension %s: %s", extension, reason)
+            result = ExtensionResult(name, SKIPPED, reason)
+        else:
+            started = time.perf_counter()
+            try:
+                await self.bot.load_extension(extension)
+                result = ExtensionResult(name, LOADED, seconds=time.perf_counter() - started)
+                log.info("Loaded extension %s in %.0f ms", extension, result.seconds * 1000)
+            except commands.ExtensionAlreadyLoaded:
+                log.warning("Extension %s already loaded.", extension)
+                result = ExtensionResult(name, LOADED)
+            except commands.ExtensionNotFound:
+                log.error("Extension %s not found.", extension)
+                result = ExtensionResult(name, FAILED, "not found")
+            except commands.NoEntryPointError:
+                log.error("Extension %s has no setup() function.", extension)
+                result = ExtensionResult(name, FAILED, "no setup()")
+            except commands.ExtensionFailed as e:
+                log_error(f'cog_load_{name}', e.original)
+                result = ExtensionResult(name, FAILED, str(e.original))
+        self.results[name] = result
+        return result
+
+    async def load_all(self):
+        for entry in self.manifest:
+            await self.load(entry)
+        return [result for result in self.results.values() if result.status == LOADED]
+
+    def report(self):
+        lines = []
+        for result in self.results.values():
+            if result.status == LOADED:
+                lines.append(f"{result.name}: loaded in {result.seconds * 1000:.0f} ms")
+            else:
+                lines.append(f"{result.name}: {result.status} ({result.reason})")
+        return lines
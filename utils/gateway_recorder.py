@@ -0,0 +1,216 @@
+import gzip
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+FORMAT = 'pikol-gateway'
+VERSION = 1
+RECORDED_EVENTS = {'MESSAGE_CREATE', 'GUILD_MEMBER_ADD', 'PRESENCE_UPDATE', 'INTERACTION_CREATE'}
+
+DISCORD_EPOCH_MS = 1420070400000
+# added to remapped timestamps so even objects older than the recording keep snowflake-sized ids
+ID_FLOOR_MS = 1 << 30
+SNOWFLAKE = re.compile(r'^\d{15,21}$')
+# mentions, channel links and custom emoji keep their shape, everything else readable becomes x
+TEXT_TOKEN = re.compile(r'(<(?:@[!&]?|#|a?:\w+:)\d{15,21}>|meow)|[^\W_]', re.IGNORECASE)
+EMBEDDED_ID = re.compile(r'\d{15,21}')
+
+NAME_KEYS = {'username', 'global_name', 'nick', 'display_name'}
+# channel, thread, guild, role and emoji names, channel topics and poll text
+TEXT_KEYS = {'content', 'value', 'name', 'topic', 'text'}
+# an interaction's command and option names stay readable: the replay labels and dispatches by them
+COMMAND_KEYS = {'name', 'options'}
+NULL_KEYS = {'avatar', 'banner', 'icon', 'avatar_decoration_data', 'email', 'clan', 'primary_guild',
+             'banner_color', 'accent_color', 'bio', 'pronouns'}
+EMPTY_KEYS = {'attachments', 'embeds', 'sticker_items', 'activities'}
+SECRET_KEYS = {'token'}
+
+# keep the members a replay needs for sampling without writing out whole servers
+DEFAULT_MAX_MEMBERS = 1000
+
+
+class Anonymizer:
+    """Rewrites snowflakes, names and message text so a recording can leave the server.
+
+    Ids are remapped consistently, so a user keeps the same id across events. The
+    timestamp bits become an offset from the start of the recording (older objects
+    collapse to the start). The replayer rebases them to the moment it runs.
+    """
+
+    def __init__(self, started_ms):
+        self.started_ms = started_ms
+        self.ids = {}
+        self.names = {}
+        self.counter = 0
+
+    def remap(self, snowflake):
+        mapped = self.ids.get(snowflake)
+        if mapped is None:
+            created_ms = (int(snowflake) >> 22) + DISCORD_EPOCH_MS
+            offset = max(0, created_ms - self.started_ms)
+            self.counter = (self.counter + 1) & 0x3FFFFF
+            mapped = self.ids[snowflake] = str(((offset + ID_FLOOR_MS) << 22) | self.counter)
+        return mapped
+
+    def pseudonym(self, value):
+        name = self.names.get(value)
+        if name is None:
+            name = self.names[value] = f"user{len(self.names) + 1}"
+        return name
+
+    def text(self, value):
+        def replace(match):
+            token = match.group(1)
+            if token is None:
+                return 'x'
+            return EMBEDDED_ID.sub(lambda m: self.remap(m.group(0)), token)
+        return TEXT_TOKEN.sub(replace, value)
+
+    def scrub(self, value, key=None, command=False):
+        if isinstance(value, dict):
+            # an interaction's data: the command invoked, with its options
+            data_of = 'token' in value and 'application_id' in value
+            result = {}
+            for k, v in value.items():
+                if k in NULL_KEYS:
+                    result[k] = None
+                elif k in EMPTY_KEYS:
+                    result[k] = []
+                elif k in SECRET_KEYS:
+                    result[k] = 'replay'
+                elif command and k == 'name':
+                    result[k] = v
+                else:
+                    keep = (command and k in COMMAND_KEYS) or (data_of and k == 'data')
+                    result[self.remap(k) if SNOWFLAKE.match(k) else k] = self.scrub(v, k, keep)
+            return result
+        if isinstance(value, list):
+            return [self.scrub(item, key, command) for item in value]
+        if isinstance(value, str):
+            if SNOWFLAKE.match(value):
+                return self.remap(value)
+            if key in NAME_KEYS:
+                return self.pseudonym(value)
+            if key in TEXT_KEYS:
+                return self.text(value)
+        return value
+
+
+def guild_snapshot(guild, max_members=DEFAULT_MAX_MEMBERS):
+    """Minimal GUILD_CREATE payload rebuilt from the cache, enough for the replayer to resolve events."""
+    return {
+        'id': str(guild.id),
+        'name': 'guild',
+        'unavailable': False,
+        'member_count': guild.member_count or len(guild.members),
+        'features': [],
+        'emojis': [{'id': str(e.id), 'name': e.name, 'animated': e.animated, 'available': True} for e in guild.emojis],
+        'roles': [{'id': str(guild.id), 'name': '@everyone', 'permissions': str(guild.default_role.permissions.value),
+                   'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(c.id), 'type': c.type.value, 'name': f"channel-{c.position}",
+                      'position': c.position, 'permission_overwrites': []} for c in guild.text_channels],
+        'members': [{'user': {'id': str(m.id), 'username': m.name, 'discriminator': '0', 'avatar': None, 'bot': m.bot},
+                     'roles': [], 'joined_at': m.joined_at.isoformat() if m.joined_at else None, 'deaf': False, 'mute': False,
+                     'flags': 0}
+                    for m in guild.members[:max_members]],
+    }
+
+
+class GatewayRecorder:
+    """Appends anonymized dispatch events to a gzip JSON-lines file while recording."""
+
+    def __init__(self, bot, directory='recordings', max_events=200_000, max_members=DEFAULT_MAX_MEMBERS):
+        self.bot = bot
+        self.directory = directory
+        self.max_events = max_events
+        self.max_members = max_members
+        self.file = None
+        self.path = None
+        self.anonymizer = None
+        self.started = 0.0
+        self.deadline = None
+        self.events = 0
+        self.counts = {}
+
+    @property
+    def recording(self):
+        return self.file is not None
+
+    def start(self, seconds=None):
+        if self.recording:
+            raise ValueError(f"already recording to {self.path}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"gateway-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8', compresslevel=6)
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds if seconds else None
+        self.anonymizer = Anonymizer(int(time.time() * 1000))
+        self.events = 0
+        self.counts = {}
+
+        user = self.bot.user
+        self._write({
+            'format': FORMAT,
+            'version': VERSION,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'events': sorted(RECORDED_EVENTS),
+            'bot_user': self.anonymizer.scrub({'id': str(user.id), 'username': user.name, 'discriminator': '0',
+                                               'avatar': None, 'bot': True}),
+            'application_id': self.anonymizer.remap(str(self.bot.application_id or user.id)),
+        })
+        for guild in self.bot.guilds:
+            self._write([0, 'GUILD_SNAPSHOT', self.anonymizer.scrub(guild_snapshot(guild, self.max_members))])
+        self.bot.add_listener(self.on_socket_raw_receive)
+        log.info("Recording gateway events to %s", self.path)
+        return self.path
+
+    def stop(self):
+        if not self.recording:
+            return None
+        self.bot.remove_listener(self.on_socket_raw_receive)
+        self.file.close()
+        self.file = None
+        log.info("Stopped gateway recording: %d events in %s (%s)", self.events, self.path,
+                 ', '.join(f"{k}={v}" for k, v in sorted(self.counts.items())))
+        return self.path
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False))
+        self.file.write('\n')
+
+    async def on_socket_raw_receive(self, msg):
+        if not self.recording:
+            return
+        payload = json.loads(msg)
+        event = payload.get('t')
+        if payload.get('op') != 0 or event not in RECORDED_EVENTS:
+            return
+        offset_ms = int((time.monotonic() - self.started) * 1000)
+        self._write([offset_ms, event, self.anonymizer.scrub(payload.get('d'))])
+        self.events += 1
+        self.counts[event] = self.counts.get(event, 0) + 1
+        if self.events >= self.max_events or (self.deadline is not None and time.monotonic() >= self.deadline):
+            self.stop()
+
+    def status(self):
+        if not self.recording:
+            return None
+        return {'path': self.path, 'events': self.events, 'seconds': time.monotonic() - self.started,
+                'counts': dict(self.counts)}
+
+
+def read_recording(path):
+    """Yields the header dict, then [offset_ms, event, data] records."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} recording")
+        yield header
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
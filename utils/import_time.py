@@ -0,0 +1,139 @@
+import importlib.util
+import sys
+import time
+
+# defaults for check_budget(); config.json's startup.import_budget_ms overrides them
+DEFAULT_BUDGET_MS = {'total': 1500, 'module': 250}
+
+
+class TimedLoader:
+    """Wraps a module's loader for the one exec that the timer measures."""
+
+    def __init__(self, loader, timer):
+        self.loader = loader
+        self.timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # the module only ever sees its real loader (importlib.resources and friends look at it)
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.timer.enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timer.exit(module.__name__)
+
+
+class ImportTimer:
+    # A meta path finder that times every module executed after install(),
+    # like python -X importtime but readable at runtime. "self" excludes the
+    # time spent importing the module's own imports, "cumulative" includes it.
+
+    def __init__(self):
+        self.stack = []
+        self.modules = {}
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module') and not isinstance(spec.loader, TimedLoader):
+                spec.loader = TimedLoader(spec.loader, self)
+            return spec
+        return None
+
+    def enter(self):
+        self.stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, name):
+        started, children = self.stack.pop()
+        cumulative = time.perf_counter() - started
+        if self.stack:
+            self.stack[-1][1] += cumulative
+        self.modules[name] = (cumulative - children, cumulative)
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def total(self):
+        return sum(self_seconds for self_seconds, _ in self.modules.values())
+
+    def slowest(self, count=10, prefix=None):
+        """(name, self seconds, cumulative seconds), slowest first by self time."""
+        rows = [(name, own, cumulative) for name, (own, cumulative) in self.modules.items()
+                if prefix is None or name == prefix or name.startswith(prefix + '.')]
+        rows.sort(key=lambda row: row[1], reverse=True)
+        return rows[:count]
+
+    def top_level(self):
+        """Self seconds summed per top-level package, the unit a dependency decision is made on."""
+        packages = {}
+        for name, (own, _) in self.modules.items():
+            root = name.partition('.')[0]
+            packages[root] = packages.get(root, 0.0) + own
+        return dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+
+    def summary(self):
+        return {
+            'modules': len(self.modules),
+            'total_ms': round(self.total() * 1000, 1),
+            'packages_ms': {name: round(seconds * 1000, 1) for name, seconds in self.top_level().items()},
+        }
+
+    def report(self, count=10):
+        lines = [f"{len(self.modules)} modules imported in {self.total() * 1000:.0f} ms"]
+        lines += [f"{name}: {seconds * 1000:.1f} ms" for name, seconds in list(self.top_level().items())[:count]]
+        return lines
+
+
+def check_budget(summary, budget=None):
+    """Every way summary (from ImportTimer.summary) went over budget, as readable strings; empty when within it."""
+    budget = dict(DEFAULT_BUDGET_MS, **(budget or {}))
+    over = []
+    if budget.get('total') is not None and summary['total_ms'] > budget['total']:
+        over.append(f"all imports took {summary['total_ms']:.0f} ms (budget {budget['total']} ms)")
+    if budget.get('module') is not None:
+        for name, ms in summary['packages_ms'].items():
+            if ms > budget['module']:
+                over.append(f"{name} took {ms:.0f} ms (budget {budget['module']} ms per package)")
+    return over
+
+
+TIMER = ImportTimer()
+
+
+def install():
+    """Starts the process-wide timer; only modules imported after this are measured."""
+    return TIMER.install()
+
+
+def lazy_import(name):
+    """The module, executed on first attribute access instead of now. None if it isn't installed."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
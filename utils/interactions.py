@@ -0,0 +1,97 @@
+import asyncio
+import inspect
+import logging
+from collections import deque
+
+import discord
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ACK_BUDGET = 1.5
+SLOW_ACK_SECONDS = 2.0
+
+
+class CommandAckStats:
+    def __init__(self, window=500):
+        self.count = 0
+        self.deferred = 0
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds, deferred):
+        self.count += 1
+        if deferred:
+            self.deferred += 1
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AckTracker:
+    def __init__(self, budget=DEFAULT_ACK_BUDGET):
+        self.budget = budget
+        self.commands = {}
+
+    def record(self, command_name, seconds, deferred):
+        stats = self.commands.get(command_name)
+        if stats is None:
+            stats = self.commands[command_name] = CommandAckStats()
+        stats.record(seconds, deferred)
+        if seconds > SLOW_ACK_SECONDS:
+            log.warning("/%s took %.2fs to acknowledge (deferred: %s).", command_name, seconds, deferred)
+
+    def report(self):
+        lines = []
+        for name, stats in sorted(self.commands.items()):
+            p50 = stats.percentile(0.5)
+            p99 = stats.percentile(0.99)
+            lines.append(
+                f"/{name}: {stats.count} acks, {stats.deferred} deferred, "
+                f"p50 {p50 * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms, max {max(stats.recent) * 1000:.0f} ms"
+            )
+        return lines
+
+
+def interaction_age(interaction):
+    return max(0.0, (discord.utils.utcnow() - interaction.created_at).total_seconds())
+
+
+async def build(work):
+    # work() runs in a worker thread so a blocking builder (a server file read,
+    # say) can't hold the event loop past the ack budget. A builder that needs
+    # the loop (views, chunking) returns a coroutine, which is awaited back here.
+    result = await asyncio.to_thread(work)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def respond(interaction, work, ephemeral=False):
+    # Sends work()'s result as the initial response when it is ready inside the
+    # ack budget, otherwise defers first and delivers it as a followup.
+    tracker = getattr(interaction.client, 'ack_tracker', None)
+    budget = tracker.budget if tracker else DEFAULT_ACK_BUDGET
+    command_name = interaction.command.qualified_name if interaction.command else 'unknown'
+
+    task = asyncio.ensure_future(build(work))
+    remaining = max(0.0, budget - interaction_age(interaction))
+    done, _ = await asyncio.wait({task}, timeout=remaining)
+    if not done:
+        await interaction.response.defer(ephemeral=ephemeral)
+        if tracker:
+            tracker.record(command_name, interaction_age(interaction), deferred=True)
+        kwargs = await task
+        message = await interaction.followup.send(ephemeral=ephemeral, wait=True, **kwargs)
+        view = kwargs.get('view')
+        if view is not None and hasattr(view, 'message'):
+            # views that tidy up on timeout edit the message they were sent with
+            view.message = message
+        return message
+
+    await interaction.response.send_message(ephemeral=ephemeral, **task.result())
+    if tracker:
+        tracker.record(command_name, interaction_age(interaction), deferred=False)
+    return None
@@ -0,0 +1,304 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9200
+DEFAULT_TIMEOUT = 5.0
+# one JSON message per line; nothing we send comes close
+LINE_LIMIT = 1024 * 1024
+
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class ClusterInfo:
+    """Which shards this process runs, as handed down by the launcher through the environment."""
+
+    def __init__(self, cluster_id, cluster_count, shard_ids, shard_count, ipc_host=DEFAULT_HOST, ipc_port=DEFAULT_PORT):
+        self.id = cluster_id
+        self.count = cluster_count
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.ipc_host = ipc_host
+        self.ipc_port = ipc_port
+
+    @property
+    def leader(self):
+        # cluster 0 does the once-per-bot work: command sync and presence rotation
+        return self.id == 0
+
+    def environ(self):
+        return {
+            'PIKOL_CLUSTER_ID': str(self.id),
+            'PIKOL_CLUSTER_COUNT': str(self.count),
+            'PIKOL_SHARD_IDS': ','.join(map(str, self.shard_ids)),
+            'PIKOL_SHARD_COUNT': str(self.shard_count),
+            'PIKOL_IPC': f"{self.ipc_host}:{self.ipc_port}",
+        }
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        if 'PIKOL_CLUSTER_ID' not in environ:
+            return None
+        host, _, port = environ.get('PIKOL_IPC', f"{DEFAULT_HOST}:{DEFAULT_PORT}").rpartition(':')
+        return cls(
+            int(environ['PIKOL_CLUSTER_ID']),
+            int(environ['PIKOL_CLUSTER_COUNT']),
+            [int(shard) for shard in environ['PIKOL_SHARD_IDS'].split(',')],
+            int(environ['PIKOL_SHARD_COUNT']),
+            host or DEFAULT_HOST,
+            int(port),
+        )
+
+
+def partition_shards(shard_count, cluster_count):
+    """Contiguous shard blocks, as even as possible; never more clusters than shards."""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    size, extra = divmod(shard_count, cluster_count)
+    blocks, start = [], 0
+    for index in range(cluster_count):
+        end = start + size + (1 if index < extra else 0)
+        blocks.append(list(range(start, end)))
+        start = end
+    return blocks
+
+
+class Gather:
+    def __init__(self, nonce, requester, request_id, expected):
+        self.nonce = nonce
+        self.requester = requester
+        self.request_id = request_id
+        self.expected = set(expected)
+        self.results = {}
+        self.timer = None
+
+
+class IPCHub:
+    # Runs in the launcher. Relays published events to every cluster and
+    # fans requests out, answering the asker once all clusters replied or
+    # the timeout passed.
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.server = None
+        self.clusters = {}
+        self.gathers = {}
+        self.nonces = itertools.count(1)
+        self.listeners = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=LINE_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]
+        log.info("IPC hub listening on %s:%d", self.host, self.port)
+
+    async def close(self):
+        # connections first, so every handler sees EOF and returns before the server waits on them
+        for writer in list(self.clusters.values()):
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def add_listener(self, listener):
+        """listener(topic, data, cluster_id) sees every published event, for the launcher's own bookkeeping."""
+        self.listeners.append(listener)
+
+    def broadcast(self, message):
+        payload = encode(message)
+        for writer in self.clusters.values():
+            writer.write(payload)
+
+    async def handle(self, reader, writer):
+        cluster_id = None
+        try:
+            hello = json.loads(await reader.readline() or b'null')
+            if not hello or hello.get('op') != 'hello':
+                return
+            cluster_id = hello['cluster']
+            previous = self.clusters.get(cluster_id)
+            if previous is not None:
+                previous.close()
+            self.clusters[cluster_id] = writer
+            log.info("Cluster %s connected to IPC", cluster_id)
+            while line := await reader.readline():
+                self.route(cluster_id, writer, json.loads(line))
+        except (ConnectionError, asyncio.IncompleteReadError, json.JSONDecodeError) as e:
+            log.warning("IPC connection from cluster %s dropped: %s", cluster_id, e)
+        finally:
+            if cluster_id is not None and self.clusters.get(cluster_id) is writer:
+                del self.clusters[cluster_id]
+                log.info("Cluster %s disconnected from IPC", cluster_id)
+                for gather in list(self.gathers.values()):
+                    gather.expected.discard(cluster_id)
+                    self._maybe_finish(gather)
+            writer.close()
+
+    def route(self, cluster_id, writer, message):
+        op = message.get('op')
+        if op == 'publish':
+            for listener in self.listeners:
+                listener(message['topic'], message.get('data'), cluster_id)
+            self.broadcast({'op': 'event', 'topic': message['topic'], 'data': message.get('data'), 'from': cluster_id})
+        elif op == 'request':
+            nonce = next(self.nonces)
+            gather = self.gathers[nonce] = Gather(nonce, writer, message['id'], self.clusters)
+            gather.timer = asyncio.get_running_loop().call_later(self.timeout, self._finish, nonce)
+            self.broadcast({'op': 'request', 'id': nonce, 'topic': message['topic'], 'data': message.get('data')})
+        elif op == 'response':
+            gather = self.gathers.get(message['id'])
+            if gather is not None:
+                gather.results[cluster_id] = message.get('data')
+                self._maybe_finish(gather)
+
+    def _maybe_finish(self, gather):
+        if gather.expected <= set(gather.results):
+            self._finish(gather.nonce)
+
+    def _finish(self, nonce):
+        gather = self.gathers.pop(nonce, None)
+        if gather is None:
+            return
+        gather.timer.cancel()
+        missing = sorted(gather.expected - set(gather.results))
+        if not gather.requester.is_closing():
+            gather.requester.write(encode({'op': 'response', 'id': gather.request_id,
+                                           'data': [gather.results[c] for c in sorted(gather.results)],
+                                           'missing': missing}))
+
+
+class IPCClient:
+    # One per cluster process. Reconnects to the hub on its own; publishes
+    # while disconnected are dropped, gathers fall back to this cluster only.
+
+    def __init__(self, cluster_id, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT, reconnect_delay=2.0):
+        self.cluster_id = cluster_id
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.writer = None
+        self.task = None
+        self.ready = asyncio.Event()
+        self.subscribers = {}
+        self.responders = {}
+        self.waiting = {}
+        self.ids = itertools.count(1)
+        self.tasks = set()
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    def subscribe(self, topic, handler):
+        """handler(data, cluster_id) runs for every event published on topic, including our own."""
+        self.subscribers.setdefault(topic, []).append(handler)
+
+    def respond_to(self, topic, handler):
+        """handler(data) returns this cluster's JSON-serializable answer to a gather on topic."""
+        self.responders[topic] = handler
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run(), name='ipc-client')
+
+    async def wait_connected(self, timeout):
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=LINE_LIMIT)
+                writer.write(encode({'op': 'hello', 'cluster': self.cluster_id}))
+                self.writer = writer
+                self.ready.set()
+                log.info("Connected to IPC hub at %s:%d as cluster %d", self.host, self.port, self.cluster_id)
+                while line := await reader.readline():
+                    self._dispatch(json.loads(line))
+                log.warning("IPC hub closed the connection")
+            except (OSError, asyncio.IncompleteReadError, json.JSONDecodeError) as e:
+                log.warning("IPC hub unreachable (%s), retrying in %.0fs", e, self.reconnect_delay)
+            finally:
+                self.writer = None
+                self.ready.clear()
+                for future in self.waiting.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("IPC hub connection lost"))
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _dispatch(self, message):
+        op = message.get('op')
+        if op == 'event':
+            for handler in self.subscribers.get(message['topic'], ()):
+                self._spawn(self._call(handler, message.get('data'), message.get('from')))
+        elif op == 'request':
+            self._spawn(self._answer(message))
+        elif op == 'response':
+            future = self.waiting.get(message['id'])
+            if future is not None and not future.done():
+                future.set_result(message)
+
+    async def _call(self, handler, data, sender):
+        try:
+            await handler(data, sender)
+        except Exception as e:
+            log.exception("IPC handler for cluster %s event failed: %s", sender, e)
+
+    async def _answer(self, message):
+        handler = self.responders.get(message['topic'])
+        try:
+            data = await handler(message.get('data')) if handler is not None else None
+        except Exception as e:
+            log.exception("IPC responder for %s failed: %s", message['topic'], e)
+            data = None
+        if self.connected:
+            self.writer.write(encode({'op': 'response', 'id': message['id'], 'data': data}))
+
+    async def publish(self, topic, data=None):
+        if not self.connected:
+            log.warning("IPC hub not connected, dropping %s event", topic)
+            return False
+        self.writer.write(encode({'op': 'publish', 'topic': topic, 'data': data}))
+        await self.writer.drain()
+        return True
+
+    async def gather(self, topic, data=None):
+        """Every connected cluster's answer (ours included) and the ids of clusters that didn't answer."""
+        if not self.connected:
+            handler = self.responders.get(topic)
+            return ([await handler(data)] if handler is not None else []), None
+        request_id = next(self.ids)
+        future = self.waiting[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.writer.write(encode({'op': 'request', 'id': request_id, 'topic': topic, 'data': data}))
+            # the hub answers at its own timeout; ours only covers the hub itself going quiet
+            message = await asyncio.wait_for(future, self.timeout * 2)
+        finally:
+            self.waiting.pop(request_id, None)
+        return message['data'], message.get('missing')
@@ -0,0 +1,185 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+DEFAULT_FILENAME = 'pikol.jsonl'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_DEDUP_SECONDS = 60.0
+# chatty third-party loggers; httpx logs a line per request at INFO, i.e. one per Ollama call
+DEFAULT_LOGGER_LEVELS = {'httpx': 'WARNING', 'httpcore': 'WARNING'}
+
+CONSOLE_FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
+
+# attributes every LogRecord has; anything else came in through extra= and goes into the JSON line
+RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+DIGITS = re.compile(r'\d+')
+
+log = logging.getLogger('pikol.errors')
+
+
+def fingerprint(record, message):
+    # the formatted message, not the template: every log_error shares "%s failed: %s".
+    # ids and counts change between otherwise identical errors (reward_task_guild_<id>, "after 3 tries")
+    error_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+    return (
+        record.name,
+        record.levelno,
+        DIGITS.sub('#', message),
+        DIGITS.sub('#', str(getattr(record, 'context', ''))),
+        error_type,
+    )
+
+
+class DedupFilter(logging.Filter):
+    """Lets the first occurrence of an error through and counts repeats for `window` seconds."""
+
+    def __init__(self, window=DEFAULT_DEDUP_SECONDS, level=logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.level = level
+        self.seen = {}
+        self.lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if self.window <= 0 or record.levelno < self.level:
+            return True
+        message = record.getMessage()
+        key = fingerprint(record, message)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry and now - entry[0] < self.window:
+                entry[1] += 1
+                self.suppressed += 1
+                return False
+            self.seen[key] = [now, 0, message]
+            if entry and entry[1]:
+                record.repeated = entry[1]
+            if len(self.seen) > 1000:
+                self.sweep(now)
+        return True
+
+    def sweep(self, now):
+        for key in [k for k, (started, count, _) in self.seen.items() if not count and now - started >= self.window]:
+            del self.seen[key]
+
+    def pending(self):
+        with self.lock:
+            return [(key, count, sample) for key, (started, count, sample) in self.seen.items() if count]
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BufferedQueueHandler(logging.handlers.QueueHandler):
+    """Runs on the caller's thread: renders the record and hands it to the writer thread without blocking."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            error_type, error, tb = record.exc_info
+            if error_type is not None:
+                record.error_type = error_type.__name__
+                record.exc_text = ''.join(traceback.format_exception(error_type, error, tb)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # an error storm must never stall the event loop; the writer catches up eventually
+            self.dropped += 1
+
+
+class LogPipeline:
+    def __init__(self, handler, listener, dedup):
+        self.handler = handler
+        self.listener = listener
+        self.dedup = dedup
+
+    def stats(self):
+        return {
+            'queued': self.handler.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'suppressed': self.dedup.suppressed,
+        }
+
+    def stop(self):
+        for (name, level, msg, context, error_type), count, sample in self.dedup.pending():
+            logging.getLogger(name).log(level, "%s (repeated %d more times)", sample, count, extra={'repeated': count})
+        self.listener.stop()
+        logging.getLogger().removeHandler(self.handler)
+
+
+def setup_logging(directory, settings=None):
+    """Routes every logger through a bounded queue to a rotating JSON-lines file and the console."""
+    settings = settings or {}
+    os.makedirs(directory, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, settings.get('filename', DEFAULT_FILENAME)),
+        maxBytes=settings.get('max_bytes', DEFAULT_MAX_BYTES),
+        backupCount=settings.get('backups', DEFAULT_BACKUPS),
+        encoding='utf-8',
+    )
+    file_handler.setFormatter(JsonFormatter())
+    outputs = [file_handler]
+
+    if settings.get('console', True):
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        console.setLevel(settings.get('console_level', 'INFO'))
+        outputs.append(console)
+
+    handler = BufferedQueueHandler(queue.Queue(settings.get('queue_size', DEFAULT_QUEUE_SIZE)))
+    dedup = DedupFilter(settings.get('dedup_seconds', DEFAULT_DEDUP_SECONDS))
+    handler.addFilter(dedup)
+
+    root = logging.getLogger()
+    root.setLevel(settings.get('level', 'INFO'))
+    root.addHandler(handler)
+    for name, level in dict(DEFAULT_LOGGER_LEVELS, **settings.get('logger_levels', {})).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(handler.queue, *outputs, respect_handler_level=True)
+    listener.start()
+    return LogPipeline(handler, listener, dedup)
+
+
+def log_error(context, error):
+    if isinstance(error, BaseException):
+        log.error("%s failed: %s", context, error, exc_info=error, extra={'context': context})
+    else:
+        log.error("%s failed: %s", context, error, extra={'context': context})
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# every member of every guild, chunked at startup (discord.py's default)
+FULL = 'full'
+# nothing chunked at startup; a guild is chunked the first time a command needs its members
+LAZY = 'lazy'
+# no member cache at all; sampling uses the ids stored in the server file
+IDS = 'ids'
+MODES = (FULL, LAZY, IDS)
+DEFAULT_CHUNK_TIMEOUT = 60.0
+
+
+class MemberRef:
+    """Stand-in for a member known only by id; enough to mention or reward them."""
+
+    __slots__ = ('id',)
+
+    def __init__(self, user_id):
+        self.id = int(user_id)
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def display_name(self):
+        return str(self.id)
+
+    bot = False
+
+
+def stored_ids(data):
+    # 'members' is kept up to date outside full mode; older files only have the balance keys
+    return data.get('members') or list(data.get('balance', {}))
+
+
+class MemberCache:
+    # Decides how much of each guild's member list is kept in memory and
+    # loads it on demand. Sampling falls back to stored ids when it isn't.
+
+    def __init__(self, settings=None, chunk_histogram=None):
+        settings = settings or {}
+        mode = settings.get('mode', FULL)
+        if mode not in MODES:
+            log.warning("Unknown member cache mode %r, using %s", mode, FULL)
+            mode = FULL
+        self.mode = mode
+        self.chunk_timeout = settings.get('chunk_timeout_seconds', DEFAULT_CHUNK_TIMEOUT)
+        self.chunk_histogram = chunk_histogram
+        self.pending = {}
+        self.chunked = 0
+        self.chunk_seconds = 0.0
+        self.ready_seconds = None
+
+    def client_options(self):
+        """Keyword arguments for the Bot constructor that match this mode."""
+        if self.mode == FULL:
+            return {}
+        flags = discord.MemberCacheFlags.none()
+        # joins are still cached in lazy mode so a chunked guild doesn't go stale
+        flags.joined = self.mode == LAZY
+        return {'chunk_guilds_at_startup': False, 'member_cache_flags': flags}
+
+    @property
+    def keeps_ids(self):
+        return self.mode != FULL
+
+    def loaded(self, guild):
+        return self.mode == FULL or guild.chunked
+
+    async def load(self, guild):
+        if self.loaded(guild) or self.mode != LAZY:
+            return
+        task = self.pending.get(guild.id)
+        if task is None:
+            task = self.pending[guild.id] = asyncio.ensure_future(self._chunk(guild))
+            task.add_done_callback(lambda _: self.pending.pop(guild.id, None))
+        # shielded: one impatient command timing out must not cancel the chunk for everyone else
+        await asyncio.shield(task)
+
+    async def _chunk(self, guild):
+        started = time.perf_counter()
+        members = await asyncio.wait_for(guild.chunk(cache=True), self.chunk_timeout)
+        elapsed = time.perf_counter() - started
+        self.chunked += 1
+        self.chunk_seconds += elapsed
+        if self.chunk_histogram is not None:
+            self.chunk_histogram.observe(elapsed)
+        log.info("Chunked %d members of guild %s in %.2fs", len(members), guild.id, elapsed)
+
+    async def humans(self, guild, load_server_data):
+        """Non-bot members to sample from, chunking or reading stored ids as the mode requires."""
+        await self.load(guild)
+        if self.loaded(guild):
+            return [member for member in guild.members if not member.bot]
+        return [MemberRef(user_id) for user_id in stored_ids(load_server_data(guild.id))]
+
+    def stored_members(self, data):
+        return [MemberRef(user_id) for user_id in stored_ids(data)]
+
+    def record_ids(self, guild, data):
+        """Refreshes the stored id list from a loaded guild; returns True when it changed."""
+        if not self.keeps_ids or not guild.chunked:
+            return False
+        ids = sorted(str(member.id) for member in guild.members if not member.bot)
+        if data.get('members') == ids:
+            return False
+        data['members'] = ids
+        return True
+
+    def cached_members(self, guilds):
+        return sum(len(guild.members) for guild in guilds)
+
+    def report(self, guilds):
+        chunked = sum(1 for guild in guilds if guild.chunked)
+        line = (f"member cache: {self.mode}, {chunked}/{len(guilds)} guilds chunked, "
+                f"{self.cached_members(guilds)} members cached")
+        if self.chunked:
+            line += f", {self.chunked} lazy chunks ({self.chunk_seconds:.1f}s)"
+        if self.ready_seconds is not None:
+            line += f", ready in {self.ready_seconds:.1f}s"
+        return line
@@ -0,0 +1,80 @@
+import re
+
+from utils.waiters import WaiterRegistry
+
+MEOW_PATTERN = re.compile('meow', re.IGNORECASE)
+
+
+class MessageRouter:
+    # Single entry point for on_message. Each message is classified once and
+    # handed to at most one channel handler (dict lookup) or the trigger handlers.
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.channel_handlers = {}
+        self.trigger_handlers = []
+        self.waiters = WaiterRegistry()
+        self._static_prefixes = self._resolve_static_prefixes(bot.command_prefix)
+
+    @staticmethod
+    def _resolve_static_prefixes(prefix):
+        if isinstance(prefix, str):
+            return (prefix,)
+        if isinstance(prefix, (list, tuple)):
+            return tuple(prefix)
+        return None
+
+    def register_channel(self, channel_id, handler):
+        self.channel_handlers[channel_id] = handler
+
+    def unregister_channel(self, channel_id, handler=None):
+        if handler is None or self.channel_handlers.get(channel_id) == handler:
+            self.channel_handlers.pop(channel_id, None)
+
+    def add_trigger_handler(self, handler):
+        if handler not in self.trigger_handlers:
+            self.trigger_handlers.append(handler)
+
+    def remove_trigger_handler(self, handler):
+        if handler in self.trigger_handlers:
+            self.trigger_handlers.remove(handler)
+
+    async def is_command(self, message):
+        prefixes = self._static_prefixes
+        if prefixes is None:
+            prefixes = await self.bot.get_prefix(message)
+            if isinstance(prefixes, str):
+                prefixes = (prefixes,)
+        return bool(message.content) and message.content.startswith(tuple(prefixes))
+
+    async def dispatch(self, message):
+        if message.author.bot:
+            return
+
+        if self.waiters:
+            self.waiters.resolve(message)
+
+        handler = self.channel_handlers.get(message.channel.id)
+        if handler is not None:
+            if not await self.is_command(message):
+                await self._call(handler, message)
+            return
+
+        if not self.trigger_handlers:
+            return
+        content = message.content
+        is_meow = bool(content) and MEOW_PATTERN.search(content) is not None
+        if not is_meow and not message.mentions:
+            return
+        is_mention = any(u.id == self.bot.user.id for u in message.mentions)
+        if not is_meow and not is_mention:
+            return
+        for trigger in self.trigger_handlers:
+            await self._call(trigger, message, is_meow, is_mention)
+
+    async def _call(self, handler, message, *args):
+        try:
+            await handler(message, *args)
+        except Exception as e:
+            name = getattr(handler, '__qualname__', repr(handler))
+            self.bot.log_error(f'message_router.{name}', e)
@@ -0,0 +1,82 @@
+from collections import Counter, deque
+
+
+class ModelStats:
+    def __init__(self, window=200):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=window)
+        self.reasons = Counter()
+
+    def record(self, elapsed, ok, reason):
+        self.requests += 1
+        self.reasons[reason] += 1
+        if not ok:
+            self.errors += 1
+            return
+        self.total_seconds += elapsed
+        self.recent.append(elapsed)
+
+    @property
+    def mean(self):
+        successes = self.requests - self.errors
+        return self.total_seconds / successes if successes else None
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ModelRouter:
+    def __init__(self, default_model, settings=None):
+        settings = settings or {}
+        self.small_model = settings.get('small_model', default_model)
+        self.large_model = settings.get('large_model', default_model)
+        self.short_message_chars = settings.get('short_message_chars', 80)
+        self.long_history_messages = settings.get('long_history_messages', 8)
+        self.max_queue_depth = settings.get('max_queue_depth', 4)
+        # models tried, in order, after the routed one fails; by default just the other model
+        self.fallback_order = settings.get('fallback_order', [self.large_model, self.small_model])
+        self.stats = {}
+
+    @property
+    def enabled(self):
+        return self.small_model != self.large_model
+
+    def choose(self, message_length, history, queue_depth):
+        if not self.enabled:
+            return self.large_model, 'default'
+        if queue_depth >= self.max_queue_depth:
+            return self.small_model, 'load'
+        # the character prompt and recalled memories are system messages, not conversation
+        turns = sum(1 for message in history if message['role'] in ('user', 'assistant'))
+        if message_length <= self.short_message_chars and turns < self.long_history_messages:
+            return self.small_model, 'short'
+        return self.large_model, 'long'
+
+    def fallbacks(self, model):
+        return list(dict.fromkeys([model, *self.fallback_order]))
+
+    def record(self, model, elapsed, ok, reason):
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats()
+        stats.record(elapsed, ok, reason)
+
+    def report(self):
+        total = sum(s.requests for s in self.stats.values())
+        lines = []
+        for model, stats in sorted(self.stats.items(), key=lambda item: -item[1].requests):
+            share = stats.requests / total * 100 if total else 0
+            mean = f"{stats.mean:.2f}s" if stats.mean is not None else "n/a"
+            p95 = stats.percentile(0.95)
+            p95 = f"{p95:.2f}s" if p95 is not None else "n/a"
+            reasons = ", ".join(f"{reason} {count}" for reason, count in stats.reasons.most_common())
+            lines.append(
+                f"**{model}**: {stats.requests} requests ({share:.0f}%), {stats.errors} errors, "
+                f"mean {mean}, p95 {p95}\n  picked for: {reasons}"
+            )
+        return lines
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import time
+
+from utils.circuit_breaker import CircuitBreaker, AdaptiveTimeout, OPEN
+from utils.import_time import lazy_import
+
+# only pulled in once the first request goes out; it is the slowest import pikol has
+httpx = lazy_import('httpx')
+
+log = logging.getLogger(__name__)
+
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class NoHealthyBackendError(ConnectionError):
+    pass
+
+
+class OllamaBackend:
+    # Request timeouts and latency are kept per (model, path): a small model's
+    # turns and /api/embed calls finish far faster than a large model's, and
+    # mixing their samples would pull the large model's timeout down to the
+    # floor and open the breaker on a healthy backend.
+
+    def __init__(self, host, port=11434, timeouts=None):
+        timeouts = timeouts or {}
+        self.host = host
+        self.port = port
+        self.base_url = f"http://{host}:{port}"
+        self.in_flight = 0
+        self.latencies = {}
+        self.last_error = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=timeouts.get('failure_threshold', 3),
+            base_backoff=timeouts.get('probe_backoff_min', 1.0),
+            max_backoff=timeouts.get('probe_backoff_max', 30.0),
+        )
+        self.request_min = timeouts.get('request_min', 10.0)
+        self.request_max = timeouts.get('request_max', 60.0)
+        self.request_timeouts = {}
+        self.connect_timeout = AdaptiveTimeout(
+            minimum=timeouts.get('connect_min', 0.25),
+            maximum=timeouts.get('connect_max', 5.0),
+            multiplier=4.0,
+            min_samples=5,
+        )
+
+    @property
+    def name(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def healthy(self):
+        return self.breaker.closed
+
+    def request_timeout(self, key=None):
+        timeout = self.request_timeouts.get(key)
+        if timeout is None:
+            timeout = self.request_timeouts[key] = AdaptiveTimeout(minimum=self.request_min, maximum=self.request_max)
+        return timeout
+
+    def timeout(self, key=None):
+        return httpx.Timeout(self.request_timeout(key).value, connect=self.connect_timeout.value)
+
+    def latency(self, key=None):
+        return self.latencies.get(key)
+
+    def record_success(self, elapsed, key=None):
+        self.breaker.record_success()
+        self.last_error = None
+        self.request_timeout(key).observe(elapsed)
+        latency = self.latencies.get(key)
+        self.latencies[key] = elapsed if latency is None else latency + LATENCY_EWMA_ALPHA * (elapsed - latency)
+
+    def record_failure(self, error, hard=False):
+        self.last_error = error
+        if hard:
+            self.breaker.trip()
+        else:
+            self.breaker.record_failure()
+
+    def load_score(self, key=None):
+        # untried backends score 0 so they get a request and a real latency sample
+        latency = self.latencies.get(key)
+        return (self.in_flight + 1) * (latency if latency is not None else 0.0)
+
+
+def request_key(path, payload):
+    """What a backend's timeout and latency are tracked under for one request."""
+    return payload.get('model'), path
+
+
+class OllamaPool:
+    def __init__(self, backends):
+        self.backends = list(backends)
+        self.session_backends = {}
+        self.breaker_opened = asyncio.Event()
+        self._client = None
+
+    @property
+    def available(self):
+        return any(b.healthy for b in self.backends)
+
+    @property
+    def in_flight(self):
+        return sum(b.in_flight for b in self.backends)
+
+    def describe(self):
+        return ", ".join(b.base_url for b in self.backends)
+
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient()
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def forget(self, session_key):
+        self.session_backends.pop(session_key, None)
+
+    def candidates(self, session_key=None, key=None):
+        usable = [b for b in self.backends if b.healthy]
+        usable.sort(key=lambda b: b.load_score(key))
+        sticky = self.session_backends.get(session_key)
+        if sticky in usable:
+            usable.remove(sticky)
+            usable.insert(0, sticky)
+        return usable
+
+    def _failed(self, backend, error, hard=False):
+        was_open = backend.breaker.state == OPEN
+        backend.record_failure(error, hard=hard)
+        if not was_open and backend.breaker.state == OPEN:
+            log.warning("Ollama backend %s circuit opened (%s).", backend.name, type(error).__name__)
+            self.breaker_opened.set()
+
+    async def post(self, path, payload, session_key=None):
+        key = request_key(path, payload)
+        candidates = self.candidates(session_key, key)
+        if not candidates:
+            raise NoHealthyBackendError("No healthy Ollama backend is available.")
+
+        last_error = None
+        for backend in candidates:
+            backend.in_flight += 1
+            started = time.perf_counter()
+            try:
+                response = await self.client().post(backend.base_url + path, json=payload, timeout=backend.timeout(key))
+                response.raise_for_status()
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                log.warning("Ollama backend %s failed (%s), failing over.", backend.name, type(e).__name__)
+                self._failed(backend, e, hard=True)
+                last_error = e
+                continue
+            except httpx.ReadTimeout as e:
+                self._failed(backend, e)
+                raise
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code < 500:
+                    backend.record_success(time.perf_counter() - started, key)
+                    raise
+                log.warning("Ollama backend %s returned %s, failing over.", backend.name, e.response.status_code)
+                self._failed(backend, e)
+                last_error = e
+                continue
+            finally:
+                backend.in_flight -= 1
+
+            backend.record_success(time.perf_counter() - started, key)
+            if session_key is not None:
+                self.session_backends[session_key] = backend
+            return response, backend
+
+        raise last_error
+
+    async def probe(self, backend):
+        started = time.perf_counter()
+        try:
+            response = await self.client().get(
+                f"{backend.base_url}/api/version",
+                timeout=backend.connect_timeout.maximum,
+            )
+            response.raise_for_status()
+        except Exception as e:
+            backend.last_error = e
+            return False
+        backend.connect_timeout.observe(time.perf_counter() - started)
+        return True
+
+    async def check_all(self):
+        results = await asyncio.gather(*(self.probe(b) for b in self.backends))
+        for backend, ok in zip(self.backends, results):
+            if ok:
+                backend.breaker.record_success()
+            else:
+                self._failed(backend, backend.last_error, hard=True)
+        return self.available
+
+    def next_probe_delay(self):
+        pending = [b.breaker.next_probe_at for b in self.backends if b.breaker.state == OPEN]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - time.monotonic())
+
+    async def probe_forever(self):
+        while True:
+            self.breaker_opened.clear()
+            delay = self.next_probe_delay()
+            try:
+                await asyncio.wait_for(self.breaker_opened.wait(), timeout=delay)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            due = [b for b in self.backends if b.breaker.probe_due()]
+            for backend in due:
+                backend.breaker.begin_probe()
+            results = await asyncio.gather(*(self.probe(b) for b in due))
+            for backend, ok in zip(due, results):
+                if ok:
+                    backend.breaker.record_success()
+                    log.info("Ollama connection re-established (%s).", backend.base_url)
+                else:
+                    backend.breaker.trip()
+
+
+def backends_from_config(ollama_config):
+    default_port = ollama_config.get('port', 11434)
+    timeouts = ollama_config.get('timeouts', {})
+    entries = ollama_config.get('backends')
+    if not entries and ollama_config.get('host'):
+        entries = [{"host": ollama_config['host'], "port": default_port}]
+
+    backends = []
+    for entry in entries or []:
+        if isinstance(entry, str):
+            host, _, port = entry.partition(':')
+            backends.append(OllamaBackend(host, int(port) if port else default_port, timeouts))
+        elif entry.get('host'):
+            backends.append(OllamaBackend(entry['host'], entry.get('port', default_port), timeouts))
+    return backends
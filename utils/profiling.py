@@ -0,0 +1,331 @@
+import asyncio
+import cProfile
+import functools
+import gc
+import io
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+log = logging.getLogger(__name__)
+
+CPU = 'cpu'
+MEMORY = 'memory'
+TOP_N = 20
+TRACEMALLOC_FRAMES = 10
+DEEP_SIZE_LIMIT = 200_000
+
+# never walked into by deep_sizeof: shared by everything, so counting them says nothing about the owner
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+              types.CodeType, types.FrameType, asyncio.AbstractEventLoop, asyncio.Task, asyncio.Future)
+
+
+class Profiled:
+    """Awaitable that drives a coroutine with the profiler enabled only while that coroutine runs.
+
+    Other tasks interleaved on the loop between its steps stay out of the profile.
+    """
+
+    def __init__(self, coro, profile):
+        self.coro = coro
+        self.profile = profile
+
+    def __await__(self):
+        steps = self.coro.__await__()
+        value, error = None, None
+        while True:
+            self.profile.enable()
+            try:
+                yielded = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profile.disable()
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+def deep_sizeof(obj, stop=(), limit=DEEP_SIZE_LIMIT):
+    """Approximate retained size of obj; returns (bytes, objects walked)."""
+    skip = SKIP_TYPES + tuple(stop)
+    seen = set()
+    pending = [obj]
+    total = 0
+    while pending and len(seen) < limit:
+        current = pending.pop()
+        if id(current) in seen or (current is not obj and isinstance(current, skip)):
+            continue
+        seen.add(id(current))
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if isinstance(current, (str, bytes, bytearray, int, float, bool)) or current is None:
+            continue
+        if isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            pending.extend(current)
+        if hasattr(current, '__dict__'):
+            pending.append(vars(current))
+        for slot in getattr(type(current), '__slots__', ()):
+            if hasattr(current, slot):
+                pending.append(getattr(current, slot))
+    return total, len(seen)
+
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024 or unit == 'GiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where the OS doesn't say."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class ProfileSession:
+    def __init__(self, target, mode, invocations=None, seconds=None, requested_by=None):
+        self.target = target
+        self.mode = mode
+        self.invocations = invocations
+        self.seconds = seconds
+        self.requested_by = requested_by
+        self.started = time.monotonic()
+        self.runs = 0
+        self.busy = 0
+        self.finished = False
+        self.profile = cProfile.Profile() if mode == CPU else None
+        self.baseline = None
+        self.peaks = []
+        self.timer = None
+        if mode == MEMORY:
+            self.baseline = tracemalloc.take_snapshot()
+
+    @property
+    def done(self):
+        if self.invocations is not None and self.runs >= self.invocations:
+            return True
+        return self.seconds is not None and time.monotonic() - self.started >= self.seconds
+
+    async def run(self, coro):
+        self.busy += 1
+        try:
+            if self.mode == CPU:
+                return await Profiled(coro, self.profile)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                return await coro
+            finally:
+                self.peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            self.busy -= 1
+            self.runs += 1
+
+
+class ProfileResult:
+    def __init__(self, session, summary, paths):
+        self.session = session
+        self.summary = summary
+        self.paths = paths
+
+
+class Profiler:
+    """On-demand profiling of named targets: command:<name>, cog:<CogName> or task:<name>."""
+
+    def __init__(self, directory='profiles', max_results=10):
+        self.directory = directory
+        self.sessions = {}
+        self.results = deque(maxlen=max_results)
+        self.breakdowns = {}
+        self.stop_types = ()
+        self.tasks = set()
+        self.known = set()
+        self.owns_tracemalloc = False
+        self.on_finish = None
+
+    def add_breakdown(self, name, source):
+        """source() returns the object whose retained size is listed under name in memory reports."""
+        self.breakdowns[name] = source
+
+    def remove_breakdown(self, name):
+        self.breakdowns.pop(name, None)
+
+    def start(self, target, mode, invocations=None, seconds=None, requested_by=None):
+        if target in self.sessions:
+            raise ValueError(f"{target} is already being profiled")
+        if mode == CPU and any(s.mode == CPU for s in self.sessions.values()):
+            # cProfile hooks are per thread, two profilers on the loop would steal each other's events
+            raise ValueError("only one CPU profile can run at a time")
+        if mode == MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.owns_tracemalloc = True
+        session = self.sessions[target] = ProfileSession(target, mode, invocations, seconds, requested_by)
+        if seconds is not None:
+            session.timer = asyncio.get_running_loop().call_later(seconds, self._check, session)
+        log.info("Profiling %s (%s) for %s", target, mode,
+                 f"{invocations} invocations" if invocations is not None else f"{seconds}s")
+        return session
+
+    def stop(self, target):
+        session = self.sessions.get(target)
+        if session is None:
+            return None
+        return self._finish(session)
+
+    def _check(self, session):
+        if session.done and not session.busy and not session.finished:
+            self._finish(session)
+
+    def _finish(self, session):
+        session.finished = True
+        self.sessions.pop(session.target, None)
+        if session.timer is not None:
+            session.timer.cancel()
+        try:
+            result = self._write(session)
+        except Exception as e:
+            log.exception("Failed to write profile for %s: %s", session.target, e)
+            return None
+        finally:
+            if self.owns_tracemalloc and not any(s.mode == MEMORY for s in self.sessions.values()):
+                tracemalloc.stop()
+                self.owns_tracemalloc = False
+        self.results.append(result)
+        if self.on_finish is not None:
+            task = asyncio.create_task(self.on_finish(result))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return result
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(self.directory, f"{session.target.replace(':', '_')}-{session.mode}-{stamp}")
+        header = f"{session.target} ({session.mode}): {session.runs} invocations in {time.monotonic() - session.started:.1f}s\n"
+        paths = []
+
+        if session.mode == CPU:
+            stats_path = base + '.pstats'
+            session.profile.dump_stats(stats_path)
+            paths.append(stats_path)
+            out = io.StringIO()
+            stats = pstats.Stats(session.profile, stream=out)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(TOP_N)
+            summary = header + out.getvalue()
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            lines = [header]
+            if session.peaks:
+                lines.append(f"peak traced per invocation: max {format_bytes(max(session.peaks))}, "
+                             f"mean {format_bytes(sum(session.peaks) / len(session.peaks))}\n")
+            lines.append(f"top {TOP_N} allocation sites still alive since the session started:\n")
+            for stat in snapshot.compare_to(session.baseline, 'lineno')[:TOP_N]:
+                lines.append(f"  {stat}\n")
+            lines.append("\nmemory breakdown:\n")
+            lines.extend(f"  {line}\n" for line in self.memory_breakdown())
+            summary = ''.join(lines)
+
+            traces_path = base + '-traces.txt'
+            with open(traces_path, 'w', encoding='utf-8') as f:
+                f.write(summary)
+                f.write("\nlargest growth with full tracebacks:\n")
+                for stat in snapshot.compare_to(session.baseline, 'traceback')[:TOP_N]:
+                    f.write(f"\n{stat}\n")
+                    f.writelines(f"    {line}\n" for line in stat.traceback.format())
+            paths.append(traces_path)
+
+        summary_path = base + '-summary.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write(summary)
+        paths.insert(0, summary_path)
+        log.info("Profile for %s written to %s", session.target, ', '.join(paths))
+        return ProfileResult(session, summary, paths)
+
+    def memory_breakdown(self, view_type=None):
+        rows = []
+        for name, source in self.breakdowns.items():
+            try:
+                obj = source()
+                size, walked = deep_sizeof(obj, self.stop_types)
+                count = len(obj) if hasattr(obj, '__len__') else 1
+            except Exception as e:
+                rows.append((0, f"{name}: failed ({type(e).__name__}: {e})"))
+                continue
+            rows.append((size, f"{name}: {count} entries, ~{format_bytes(size)}" + (" (truncated)" if walked >= DEEP_SIZE_LIMIT else "")))
+        if view_type is not None:
+            views = [obj for obj in gc.get_objects() if isinstance(obj, view_type)]
+            size = sum(deep_sizeof(view, self.stop_types)[0] for view in views)
+            rows.append((size, f"live views: {len(views)}, ~{format_bytes(size)}"))
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            rows.append((current, f"traced python heap: {format_bytes(current)} (peak {format_bytes(peak)})"))
+        return [line for _, line in sorted(rows, key=lambda row: -row[0])]
+
+    def session_for(self, names):
+        for name in names:
+            session = self.sessions.get(name)
+            if session is not None and not session.finished:
+                return session
+        return None
+
+    async def call(self, names, coro):
+        session = self.session_for(names) if self.sessions else None
+        if session is None:
+            return await coro
+        try:
+            return await session.run(coro)
+        finally:
+            if session.done and not session.busy and not session.finished:
+                self._finish(session)
+
+    def profiled(self, *names):
+        """Decorator for coroutine functions (task loops) that can be profiled under the given names."""
+        self.known.update(names)
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await self.call(names, func(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def instrument_commands(self, tree):
+        """Wraps every app command callback so it can be targeted as command:<name> or cog:<CogName>."""
+        wrapped = 0
+        for command in tree.walk_commands():
+            callback = getattr(command, '_callback', None)
+            if callback is None or getattr(callback, '__profiled__', False):
+                continue
+            names = (f"command:{command.qualified_name}",)
+            if command.binding is not None:
+                names += (f"cog:{command.binding.qualified_name}",)
+            wrapper = self.profiled(*names)(callback)
+            wrapper.__profiled__ = True
+            command._callback = wrapper
+            wrapped += 1
+        return wrapped
+
+    def targets(self):
+        return sorted(self.known)
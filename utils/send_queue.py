@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+HIGH = 'high'
+LOW = 'low'
+
+# Discord allows 5 messages per 5 seconds per channel
+DEFAULT_CAPACITY = 5
+DEFAULT_PERIOD = 5.0
+
+
+class SendWindow:
+    # Sends (or edits) to one channel in the last period, counted the way
+    # Discord counts them. A token bucket refills continuously and lets up to
+    # twice the limit through in one window under sustained load, which
+    # Discord answers with 429s.
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.sent = deque()
+        self.updated = None
+
+    def expire(self, now):
+        while self.sent and now - self.sent[0] >= self.period:
+            self.sent.popleft()
+
+    def add(self, now):
+        self.expire(now)
+        self.sent.append(now)
+        self.updated = now
+
+    def try_add(self, now, reserve=0):
+        self.expire(now)
+        if len(self.sent) < self.limit - reserve:
+            self.add(now)
+            return True
+        return False
+
+    def wait_time(self, now, reserve=0):
+        self.expire(now)
+        allowed = self.limit - reserve
+        if len(self.sent) < allowed:
+            return 0.0
+        # until enough of the oldest sends expire to leave room for one more
+        return self.sent[len(self.sent) - allowed] + self.period - now
+
+
+class PendingSend:
+    def __init__(self, channel, content, now):
+        self.channel = channel
+        self.contents = [content]
+        self.enqueued_at = now
+        self.handle = None
+
+
+class OutboundSender:
+    # HIGH sends are never delayed or dropped here; they go straight to
+    # channel.send and count against the channel's window, so LOW sends back
+    # off behind them. LOW sends leave high_reserve slots of every window
+    # free, so a HIGH reply arriving in the middle of LOW chatter doesn't sit
+    # out a 429 behind it. The only wait left for HIGH is the one HIGH causes
+    # itself by sending more than high_reserve messages per window.
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, period=DEFAULT_PERIOD, max_merge=3, max_low_delay=3.0, idle_seconds=60.0,
+                 high_reserve=2):
+        self.capacity = capacity
+        self.period = period
+        self.max_merge = max_merge
+        self.max_low_delay = max_low_delay
+        self.idle_seconds = idle_seconds
+        self.high_reserve = high_reserve
+        self.buckets = {}
+        self.prune_at = 1024
+        self.pending = {}
+        self.tasks = set()
+        self.sent = {HIGH: 0, LOW: 0}
+        self.merged = 0
+        self.dropped = 0
+        self.errors = 0
+        self.queue_latency = deque(maxlen=1000)
+
+    def _bucket(self, channel_id, now):
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            if len(self.buckets) >= self.prune_at:
+                self._prune(now)
+            bucket = self.buckets[channel_id] = SendWindow(self.capacity, self.period)
+        return bucket
+
+    def _prune(self, now):
+        for channel_id, bucket in list(self.buckets.items()):
+            if (bucket.updated is None or now - bucket.updated > self.idle_seconds) and channel_id not in self.pending:
+                del self.buckets[channel_id]
+        # the next scan waits until the map has doubled, so churn through many live
+        # channels costs O(1) amortised per new bucket instead of a full scan each
+        self.prune_at = max(1024, 2 * len(self.buckets))
+
+    async def send(self, channel, content=None, priority=HIGH, **kwargs):
+        now = time.monotonic()
+        bucket = self._bucket(channel.id, now)
+
+        if priority == HIGH:
+            bucket.add(now)
+            self.sent[HIGH] += 1
+            return await channel.send(content, **kwargs)
+
+        pending = self.pending.get(channel.id)
+        if pending is None and not kwargs and bucket.try_add(now, self.high_reserve):
+            self.sent[LOW] += 1
+            self.queue_latency.append(0.0)
+            return await channel.send(content)
+
+        if kwargs:
+            # embeds/files can't be merged, so a saturated low priority one is dropped
+            self.dropped += 1
+            return None
+
+        if pending is not None:
+            if len(pending.contents) < self.max_merge and content not in pending.contents:
+                pending.contents.append(content)
+                self.merged += 1
+            else:
+                self.dropped += 1
+            return None
+
+        delay = bucket.wait_time(now, self.high_reserve)
+        if delay > self.max_low_delay:
+            # it would only be dropped once the timer fired
+            self.dropped += 1
+            return None
+        pending = self.pending[channel.id] = PendingSend(channel, content, now)
+        self._schedule_flush(pending, delay)
+        return None
+
+    def _schedule_flush(self, pending, delay):
+        loop = asyncio.get_running_loop()
+        pending.handle = loop.call_later(delay, self._start_flush, pending)
+
+    def _start_flush(self, pending):
+        task = asyncio.ensure_future(self._flush(pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def _drop(self, pending):
+        self.pending.pop(pending.channel.id, None)
+        self.dropped += len(pending.contents)
+
+    async def _flush(self, pending):
+        now = time.monotonic()
+        channel_id = pending.channel.id
+        deadline = pending.enqueued_at + self.max_low_delay
+        if now > deadline:
+            # the loop stalled past the deadline before the timer could fire
+            self._drop(pending)
+            return
+
+        bucket = self._bucket(channel_id, now)
+        if not bucket.try_add(now, self.high_reserve):
+            # HIGH sends took the slot in the meantime
+            delay = bucket.wait_time(now, self.high_reserve)
+            if now + delay > deadline:
+                self._drop(pending)
+            else:
+                self._schedule_flush(pending, delay)
+            return
+
+        self.pending.pop(channel_id, None)
+        self.sent[LOW] += 1
+        self.queue_latency.append(now - pending.enqueued_at)
+        try:
+            await pending.channel.send(" ".join(pending.contents))
+        except Exception as e:
+            self.errors += 1
+            log.error("Error sending queued message to channel %s: %s", channel_id, e)
+
+    def close(self):
+        for pending in self.pending.values():
+            if pending.handle is not None:
+                pending.handle.cancel()
+        self.pending.clear()
+        for task in list(self.tasks):
+            task.cancel()
+
+    def stats(self):
+        latencies = sorted(self.queue_latency)
+
+        def pct(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+
+        return {
+            "sent_high": self.sent[HIGH],
+            "sent_low": self.sent[LOW],
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending_channels": len(self.pending),
+            "low_queue_latency_p50": pct(0.5),
+            "low_queue_latency_p95": pct(0.95),
+        }
@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+ROLE_CODES = {"user": "u", "assistant": "a"}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+class SessionStore:
+    # One append-only JSON-lines file per channel plus a small index of which
+    # channels have a session and when each was last active. History is only
+    # read back when a channel speaks. The index is rewritten at most once per
+    # activity_slack seconds per channel, so a restart may expire a session up
+    # to that much early; older indexes without activity fall back to mtime.
+
+    def __init__(self, directory, keep_messages, compact_factor=4, activity_slack=60.0):
+        self.directory = directory
+        self.keep_messages = keep_messages
+        self.compact_after = keep_messages * compact_factor
+        self.activity_slack = activity_slack
+        self.index_path = os.path.join(directory, 'index.json')
+        self.line_counts = {}
+        # last activity per channel, so boot doesn't have to stat every session file
+        self.activity = {}
+        self.saved_activity = {}
+        os.makedirs(directory, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                entries = json.load(f)
+            index = {}
+            for channel_id, entry in entries.items():
+                channel_id = int(channel_id)
+                if isinstance(entry, list):
+                    index[channel_id], activity = entry
+                    self.activity[channel_id] = self.saved_activity[channel_id] = activity
+                else:
+                    # written before the index kept activity: last_activity() stats the file once
+                    index[channel_id] = entry
+            return index
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, ValueError, AttributeError, TypeError) as e:
+            log.error("Error reading session index %s: %s. Starting with no stored sessions.", self.index_path, e)
+            self.activity.clear()
+            self.saved_activity.clear()
+            return {}
+
+    def _save_index(self):
+        entries = {}
+        for channel_id, started in self.index.items():
+            activity = self.activity.get(channel_id)
+            entries[channel_id] = started if activity is None else [started, activity]
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except IOError as e:
+            log.error("Error saving session index %s: %s", self.index_path, e)
+            return
+        self.saved_activity = {channel_id: self.activity[channel_id] for channel_id in self.index
+                               if channel_id in self.activity}
+
+    def flush(self):
+        """Writes out activity that hasn't reached the index yet."""
+        if any(self.activity.get(channel_id) != self.saved_activity.get(channel_id) for channel_id in self.index):
+            self._save_index()
+
+    def _path(self, channel_id):
+        return os.path.join(self.directory, f'{channel_id}.jsonl')
+
+    @staticmethod
+    def _encode(message):
+        record = [ROLE_CODES.get(message["role"], message["role"]), message["content"]]
+        if message.get("user_name"):
+            record.append(message["user_name"])
+        return json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def _decode(line):
+        record = json.loads(line)
+        message = {"role": CODE_ROLES.get(record[0], record[0]), "content": record[1]}
+        if len(record) > 2:
+            message["user_name"] = record[2]
+        return message
+
+    def __contains__(self, channel_id):
+        return channel_id in self.index
+
+    def channels(self):
+        return list(self.index)
+
+    def last_activity(self, channel_id):
+        activity = self.activity.get(channel_id)
+        if activity is not None:
+            return activity
+        try:
+            activity = os.path.getmtime(self._path(channel_id))
+        except OSError:
+            activity = self.index.get(channel_id, time.time())
+        self.activity[channel_id] = activity
+        return activity
+
+    def metadata(self):
+        """What preload() needs to skip the per-file stat on the next boot."""
+        return {
+            'activity': {str(channel_id): self.last_activity(channel_id) for channel_id in self.index},
+            'line_counts': {str(channel_id): count for channel_id, count in self.line_counts.items()},
+        }
+
+    def preload(self, metadata):
+        for channel_id, activity in metadata.get('activity', {}).items():
+            if int(channel_id) in self.index:
+                self.activity[int(channel_id)] = activity
+        for channel_id, count in metadata.get('line_counts', {}).items():
+            if int(channel_id) in self.index:
+                self.line_counts[int(channel_id)] = count
+
+    def create(self, channel_id):
+        try:
+            open(self._path(channel_id), 'w', encoding='utf-8').close()
+        except IOError as e:
+            log.error("Error creating session file for channel %s: %s", channel_id, e)
+        self.index[channel_id] = time.time()
+        self.activity[channel_id] = self.index[channel_id]
+        self.line_counts[channel_id] = 0
+        self._save_index()
+
+    def append(self, channel_id, message, history):
+        try:
+            with open(self._path(channel_id), 'a', encoding='utf-8') as f:
+                f.write(self._encode(message))
+        except IOError as e:
+            log.error("Error appending to session file for channel %s: %s", channel_id, e)
+            return
+        now = time.time()
+        self.activity[channel_id] = now
+        if now - self.saved_activity.get(channel_id, 0.0) > self.activity_slack:
+            self._save_index()
+
+        count = self.line_counts.get(channel_id, 0) + 1
+        self.line_counts[channel_id] = count
+        if count > self.compact_after:
+            self.rewrite(channel_id, history)
+
+    def rewrite(self, channel_id, history):
+        path = self._path(channel_id)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(self._encode(message) for message in history)
+            os.replace(tmp_path, path)
+            self.line_counts[channel_id] = len(history)
+        except IOError as e:
+            log.error("Error compacting session file for channel %s: %s", channel_id, e)
+
+    def load(self, channel_id):
+        history = deque(maxlen=self.keep_messages)
+        lines = 0
+        try:
+            with open(self._path(channel_id), encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        history.append(self._decode(line))
+                    except (json.JSONDecodeError, IndexError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        self.line_counts[channel_id] = lines
+        return list(history)
+
+    def delete(self, channel_id):
+        self.line_counts.pop(channel_id, None)
+        self.activity.pop(channel_id, None)
+        if self.index.pop(channel_id, None) is None:
+            return
+        try:
+            os.remove(self._path(channel_id))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.error("Error deleting session file for channel %s: %s", channel_id, e)
+        self._save_index()
@@ -0,0 +1,182 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'PIKOLSNP'
+VERSION = 1
+# magic, version, offset and length of the JSON index at the end of the file
+HEADER = struct.Struct('<8sIQQ')
+
+
+def compact(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class Snapshot:
+    """One memory-mapped snapshot file; blobs are only decoded when someone asks for them."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, offset, length = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a version {VERSION} snapshot")
+            index = json.loads(self.map[offset:offset + length])
+        except Exception:
+            self.close()
+            raise
+        self.created = index.get('created')
+        self.guilds = {int(guild_id): tuple(entry) for guild_id, entry in index['guilds'].items()}
+        self.sections = {name: tuple(entry) for name, entry in index['sections'].items()}
+
+    def guild_bytes(self, guild_id):
+        entry = self.guilds.get(guild_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        return self.map[offset:offset + length]
+
+    def guild(self, guild_id):
+        blob = self.guild_bytes(guild_id)
+        return json.loads(blob) if blob is not None else None
+
+    def section(self, name):
+        entry = self.sections.get(name)
+        if entry is None:
+            return None
+        offset, length = entry
+        return json.loads(self.map[offset:offset + length])
+
+    def close(self):
+        if getattr(self, 'map', None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class SnapshotManager:
+    # Guild economy state and a few boot-time indexes in one file, written on
+    # graceful shutdown and mapped on the next boot. The per-guild JSON files
+    # stay the durable copy: every save still writes them and drops that guild
+    # from the snapshot, and the snapshot is only trusted when the previous run
+    # shut down cleanly (the marker file is removed as soon as it is opened).
+
+    def __init__(self, directory, filename='snapshot.bin'):
+        self.path = os.path.join(directory, filename)
+        self.marker = self.path + '.clean'
+        self.exports = {}
+        self.current = None
+        self.loaded_guilds = 0
+
+    def open(self):
+        if not os.path.exists(self.marker):
+            if os.path.exists(self.path):
+                log.info("Snapshot %s is from a run that didn't shut down cleanly, reading JSON files instead", self.path)
+            return False
+        # consumed from here on: if this run crashes, the next boot must not trust it
+        os.remove(self.marker)
+        started = time.perf_counter()
+        try:
+            self.current = Snapshot(self.path)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            log.error("Could not open snapshot %s: %s. Reading JSON files instead.", self.path, e)
+            return False
+        log.info("Mapped snapshot %s: %d guilds, sections %s (%.1f ms)", self.path, len(self.current.guilds),
+                 ', '.join(sorted(self.current.sections)) or 'none', (time.perf_counter() - started) * 1000)
+        return True
+
+    def add_section(self, name, export):
+        """export() returns JSON-serializable state to store under name on the next snapshot."""
+        self.exports[name] = export
+
+    def remove_section(self, name):
+        self.exports.pop(name, None)
+
+    def section(self, name):
+        if self.current is None:
+            return None
+        try:
+            return self.current.section(name)
+        except (ValueError, UnicodeDecodeError) as e:
+            log.error("Snapshot section %s is unreadable: %s", name, e)
+            return None
+
+    def load_guild(self, guild_id):
+        if self.current is None:
+            return None
+        try:
+            data = self.current.guild(guild_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            log.error("Snapshot entry for guild %s is unreadable: %s", guild_id, e)
+            data = None
+        if data is None:
+            self.discard(guild_id)
+        else:
+            self.loaded_guilds += 1
+        return data
+
+    def discard(self, guild_id):
+        if self.current is not None:
+            self.current.guilds.pop(guild_id, None)
+
+    def write(self, guild_ids, data_dir):
+        """Writes every guild in guild_ids, taking unchanged ones from the mapped snapshot and the rest from disk."""
+        started = time.perf_counter()
+        tmp_path = self.path + '.tmp'
+        from_snapshot = from_json = 0
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            guilds = {}
+            for guild_id in guild_ids:
+                blob = self.current.guild_bytes(guild_id) if self.current is not None else None
+                if blob is not None:
+                    from_snapshot += 1
+                else:
+                    try:
+                        with open(os.path.join(data_dir, f'{guild_id}.json'), 'rb') as source:
+                            blob = compact(json.load(source))
+                    except FileNotFoundError:
+                        continue
+                    except (ValueError, UnicodeDecodeError) as e:
+                        log.warning("Leaving guild %s out of the snapshot: %s", guild_id, e)
+                        continue
+                    from_json += 1
+                guilds[str(guild_id)] = [f.tell(), len(blob)]
+                f.write(blob)
+
+            sections = {}
+            for name, export in self.exports.items():
+                try:
+                    blob = compact(export())
+                except Exception as e:
+                    log.exception("Snapshot section %s failed: %s", name, e)
+                    continue
+                sections[name] = [f.tell(), len(blob)]
+                f.write(blob)
+
+            index = compact({'created': time.time(), 'guilds': guilds, 'sections': sections})
+            offset = f.tell()
+            f.write(index)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, offset, len(index)))
+            f.flush()
+            os.fsync(f.fileno())
+
+        # the old map has to go before the file under it can be replaced (windows won't allow it otherwise)
+        self.close()
+        os.replace(tmp_path, self.path)
+        open(self.marker, 'w').close()
+        log.info("Wrote snapshot %s: %d guilds (%d unchanged, %d from JSON), sections %s in %.2fs",
+                 self.path, len(guilds), from_snapshot, from_json, ', '.join(sorted(sections)) or 'none',
+                 time.perf_counter() - started)
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
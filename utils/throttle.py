@@ -0,0 +1,98 @@
+import time
+from collections import Counter
+
+from discord import app_commands
+
+# [tokens, seconds to refill them]; None disables that scope
+DEFAULT_LIMITS = {
+    "default": {"user": [5, 10], "guild": [60, 10]},
+    "shop": {"user": [3, 15], "guild": [30, 15]},
+    "shop_buy": {"user": [4, 10], "guild": [40, 10]},
+}
+SWEEP_INTERVAL = 60.0
+
+
+class Throttle:
+    # Token buckets keyed by (command, scope, id). Buckets are stored as
+    # (tokens, updated) tuples and swept once they would have refilled.
+
+    def __init__(self, limits=None):
+        merged = {name: dict(scopes) for name, scopes in DEFAULT_LIMITS.items()}
+        for name, scopes in (limits or {}).items():
+            merged.setdefault(name, {}).update(scopes)
+        self.limits = merged
+        self.buckets = {}
+        self.rejected = Counter()
+        self.allowed = Counter()
+        self.last_sweep = time.monotonic()
+
+    def limits_for(self, command):
+        scopes = dict(self.limits["default"])
+        scopes.update(self.limits.get(command, {}))
+        return scopes
+
+    def check(self, command, user_id, guild_id, now=None):
+        now = time.monotonic() if now is None else now
+        if now - self.last_sweep > SWEEP_INTERVAL:
+            self.sweep(now)
+
+        updates = []
+        for scope, key_id in (("user", user_id), ("guild", guild_id)):
+            limit = self.limits_for(command).get(scope)
+            if not limit or key_id is None:
+                continue
+            capacity, period = limit
+            key = (command, scope, key_id)
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * capacity / period)
+            if tokens < 1:
+                self.rejected[(command, scope)] += 1
+                return False, (1 - tokens) * period / capacity, scope
+            updates.append((key, tokens - 1))
+
+        for key, tokens in updates:
+            self.buckets[key] = (tokens, now)
+        self.allowed[command] += 1
+        return True, 0.0, None
+
+    def sweep(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.last_sweep = now
+        for key, (tokens, updated) in list(self.buckets.items()):
+            command, scope, _ = key
+            capacity, period = self.limits_for(command)[scope]
+            if tokens + (now - updated) * capacity / period >= capacity:
+                del self.buckets[key]
+
+    def report(self):
+        lines = []
+        for command, allowed in sorted(self.allowed.items()):
+            rejected_user = self.rejected[(command, "user")]
+            rejected_guild = self.rejected[(command, "guild")]
+            lines.append(f"/{command}: {allowed} allowed, {rejected_user} rejected (user), {rejected_guild} rejected (guild)")
+        for (command, scope), count in sorted(self.rejected.items()):
+            if command not in self.allowed:
+                lines.append(f"/{command}: 0 allowed, {count} rejected ({scope})")
+        return lines
+
+
+async def throttle_interaction(interaction, command):
+    throttle = getattr(interaction.client, 'throttle', None)
+    if throttle is None:
+        return True
+    ok, retry_after, scope = throttle.check(command, interaction.user.id, interaction.guild_id)
+    if ok:
+        return True
+    who = "this server is" if scope == "guild" else "you're"
+    await interaction.response.send_message(
+        f"slow down, {who} casting too fast! *swishes tail* try again in {max(1, round(retry_after))}s.",
+        ephemeral=True
+    )
+    return False
+
+
+class ThrottledCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        if interaction.command is None:
+            return True
+        return await throttle_interaction(interaction, interaction.command.qualified_name)
@@ -0,0 +1,65 @@
+from utils.import_time import lazy_import
+
+# numpy is only imported for real once the first embedding is stored
+np = lazy_import('numpy')
+
+AVAILABLE = np is not None
+INITIAL_CAPACITY = 64
+
+
+class VectorMemory:
+    # Unit-normalised embeddings in one growable float32 matrix, so cosine
+    # similarity against every stored turn is a single matrix-vector product.
+
+    def __init__(self, initial_capacity=INITIAL_CAPACITY):
+        if np is None:
+            raise RuntimeError("numpy is required for long-term memory.")
+        self.initial_capacity = initial_capacity
+        self.matrix = None
+        self.texts = []
+
+    def __len__(self):
+        return len(self.texts)
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.ndim != 1 or not norm:
+            return None
+        return vector / norm
+
+    def add(self, vector, text):
+        vector = self._normalise(vector)
+        if vector is None:
+            return False
+
+        count = len(self.texts)
+        if self.matrix is None or self.matrix.shape[1] != vector.shape[0]:
+            # embedding model changed dimensions, old vectors are not comparable
+            self.matrix = np.empty((self.initial_capacity, vector.shape[0]), dtype=np.float32)
+            self.texts = []
+            count = 0
+        elif count == self.matrix.shape[0]:
+            grown = np.empty((count * 2, self.matrix.shape[1]), dtype=np.float32)
+            grown[:count] = self.matrix
+            self.matrix = grown
+
+        self.matrix[count] = vector
+        self.texts.append(text)
+        return True
+
+    def search(self, query, k=3, min_score=0.0):
+        count = len(self.texts)
+        query = self._normalise(query)
+        if not count or query is None or query.shape[0] != self.matrix.shape[1]:
+            return []
+
+        scores = self.matrix[:count] @ query
+        k = min(k, count)
+        if k < count:
+            top = np.argpartition(scores, count - k)[count - k:]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(self.texts[i], float(scores[i])) for i in top if scores[i] >= min_score]
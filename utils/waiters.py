@@ -0,0 +1,38 @@
+import asyncio
+
+
+class WaiterRegistry:
+    # "Reply to me" waits keyed by (channel_id, user_id), resolved by the
+    # message router with one dict lookup instead of per-waiter predicates.
+
+    def __init__(self):
+        self.waiters = {}
+
+    def __len__(self):
+        return sum(len(futures) for futures in self.waiters.values())
+
+    def __bool__(self):
+        return bool(self.waiters)
+
+    async def wait_for_reply(self, channel_id, user_id, timeout):
+        key = (channel_id, user_id)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            futures = self.waiters.get(key)
+            if futures is not None:
+                if future in futures:
+                    futures.remove(future)
+                if not futures:
+                    del self.waiters[key]
+
+    def resolve(self, message):
+        futures = self.waiters.pop((message.channel.id, message.author.id), None)
+        if not futures:
+            return False
+        for future in futures:
+            if not future.done():
+                future.set_result(message)
+        return True
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+log = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STACK_DEPTH = 15
+
+
+def describe_task(task):
+    if task is None:
+        return 'callback'
+    name = task.get_name()
+    coro = task.get_coro()
+    qualname = getattr(coro, '__qualname__', None)
+    return f'{name} ({qualname})' if qualname and qualname not in name else name
+
+
+def culprit(stack):
+    # innermost frame in our own code: the line that called into the blocking library function
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(PROJECT_ROOT) and 'site-packages' not in path:
+            return f'{os.path.relpath(path, PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+    return f'{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}' if stack else 'unknown'
+
+
+class Offender:
+    def __init__(self, activity, location, stack):
+        self.activity = activity
+        self.location = location
+        self.stack = stack
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last_seen = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+        self.last_seen = time.time()
+
+
+class Stall:
+    def __init__(self, started, activity, stack):
+        self.started = started
+        self.activity = activity
+        self.stack = stack
+
+
+class LoopWatchdog:
+    """Flags event loop stalls from a helper thread and captures what the loop thread was running."""
+
+    def __init__(self, threshold=0.25, interval=0.1, max_offenders=50, lag_histogram=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_offenders = max_offenders
+        self.lag_histogram = lag_histogram
+        self.loop = None
+        self.loop_thread = None
+        self.thread = None
+        self.stopping = threading.Event()
+        self.last_beat = 0.0
+        self.expected = 0.0
+        self.handle = None
+        self.stall = None
+        self.offenders = {}
+        self.stalls = 0
+        self.worst_lag = 0.0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, loop=None):
+        if self.running:
+            return
+        self.loop = loop or asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.stopping.clear()
+        self.last_beat = time.monotonic()
+        self.expected = self.last_beat + self.interval
+        self.handle = self.loop.call_later(self.interval, self._beat)
+        self.thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self.thread.start()
+        log.info("Event loop watchdog running (threshold %.0f ms).", self.threshold * 1000)
+
+    def stop(self):
+        self.stopping.set()
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def _beat(self):
+        # runs on the loop: lateness of this callback is the loop lag
+        now = time.monotonic()
+        lag = max(0.0, now - self.expected)
+        self.last_beat = now
+        if self.lag_histogram is not None:
+            self.lag_histogram.observe(lag)
+        self.expected = now + self.interval
+        self.handle = self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self.stopping.wait(self.interval / 2):
+            try:
+                beat = self.last_beat
+                stalled_for = time.monotonic() - beat - self.interval
+                if self.stall is None:
+                    if stalled_for > self.threshold:
+                        self._capture(beat + self.interval)
+                elif self.stall.started < beat:
+                    self._finish(beat - self.stall.started)
+            except Exception as e:
+                log.exception("Watchdog check failed: %s", e)
+
+    def _capture(self, started):
+        frame = sys._current_frames().get(self.loop_thread)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)[-STACK_DEPTH:]
+        try:
+            # racy read from another thread, but the loop is blocked so the answer is stable
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        self.stall = Stall(started, describe_task(task), stack)
+        log.warning(
+            "Event loop blocked for over %.0f ms in %s at %s\n%s",
+            self.threshold * 1000, self.stall.activity, culprit(stack), ''.join(traceback.format_list(stack)).rstrip(),
+            extra={'activity': self.stall.activity},
+        )
+
+    def _finish(self, seconds):
+        stall, self.stall = self.stall, None
+        self.stalls += 1
+        self.worst_lag = max(self.worst_lag, seconds)
+        location = culprit(stall.stack)
+        key = (stall.activity, location)
+        offender = self.offenders.get(key)
+        if offender is None:
+            if len(self.offenders) >= self.max_offenders:
+                least = min(self.offenders, key=lambda k: self.offenders[k].total)
+                del self.offenders[least]
+            offender = self.offenders[key] = Offender(stall.activity, location, stall.stack)
+        offender.record(seconds)
+        log.warning("Event loop stall in %s lasted %.0f ms (%s).", stall.activity, seconds * 1000, location,
+                    extra={'activity': stall.activity, 'stall_seconds': round(seconds, 4)})
+
+    def top(self, limit=10):
+        return sorted(self.offenders.values(), key=lambda o: -o.total)[:limit]
+
+    def report(self, limit=10):
+        lines = []
+        for offender in self.top(limit):
+            lines.append(
+                f"**{offender.activity}** at `{offender.location}`\n"
+                f"  {offender.count} stalls, {offender.total * 1000:.0f} ms total, worst {offender.worst * 1000:.0f} ms"
+            )
+        return lines